@@ -0,0 +1,268 @@
+"""
+Indexed, transactional store for API configurations.
+
+Configs live in memory in a dict keyed by ``api_name``.  On disk they are
+``api_configs.json`` (the snapshot, same format as before) plus an
+append-only journal ``api_configs.json.journal`` with one JSON line per
+change::
+
+    {"op": "snapshot", "hash": "..."}
+    {"op": "put", "config": {...}}
+    {"op": "del", "api_name": "..."}
+
+The first line ties the journal to the snapshot it extends.  If
+``api_configs.json`` was replaced outside the store (edited by hand), its
+hash no longer matches: the journal is stale and is discarded instead of
+being replayed over the new snapshot.
+
+Each edit appends a single journal line under an exclusive file lock, so it
+costs O(1) regardless of how many APIs exist, and concurrent writers (the GUI
+and the running server) serialize instead of overwriting each other.  Before
+every write the store replays journal lines written by other processes.  Once
+the journal grows past ``compact_after`` lines it is folded into the snapshot
+with an atomic write-rename and truncated.
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger('universal_mcp')
+
+DEFAULT_COMPACT_AFTER = 200
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Exclusive inter-process lock on ``path`` (fcntl on POSIX, msvcrt on Windows)"""
+    with open(path, 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def atomic_write_json(path, data):
+    """Write JSON to a temp file next to ``path``, fsync it and rename it over ``path``"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class APIConfigStore:
+    def __init__(self, path='api_configs.json', compact_after=DEFAULT_COMPACT_AFTER):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.lock_path = f"{path}.lock"
+        self.compact_after = compact_after
+        self._configs = {}
+        self._snapshot_sig = None
+        self._snapshot_hash = None
+        self._journal_offset = 0
+        self._journal_lines = 0
+        self._changes = None  # None: everything may have changed
+        self._mutex = threading.RLock()
+
+    # -- reading -----------------------------------------------------------
+
+    def _stat_sig(self, path):
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size, st.st_ino)
+        except FileNotFoundError:
+            return None
+
+    def _load_snapshot(self):
+        self._snapshot_sig = self._stat_sig(self.path)
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b''
+        try:
+            configs = json.loads(data) if data.strip() else []
+        except ValueError as e:
+            logger.warning(f"api_configs.json 格式错误，按空配置处理: {e}")
+            configs = []
+        self._configs = {cfg["api_name"]: cfg for cfg in configs}
+        self._snapshot_hash = content_hash(data)
+        self._journal_offset = 0
+        self._journal_lines = 0
+        self._changes = None
+        return self._check_journal()
+
+    def _check_journal(self):
+        """Skip the header of a journal written for this snapshot, or discard a stale one"""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                first = f.readline()
+        except FileNotFoundError:
+            return False
+        if not first.endswith(b'\n'):
+            return False
+        try:
+            header = json.loads(first)
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get("op") != "snapshot":
+            return True  # journal from before headers existed: replay it and compact
+        if header.get("hash") == self._snapshot_hash:
+            self._journal_offset = len(first)
+            return False
+        logger.warning("api_configs.json 已被外部修改，丢弃旧的配置日志")
+        with open(self.journal_path, 'wb'):
+            pass
+        return False
+
+    def _replay_journal(self):
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._journal_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b'\n') + 1  # ignore a trailing partial line from an interrupted writer
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("忽略损坏的配置日志行")
+                continue
+            if entry.get("op") == "snapshot":
+                continue
+            self._apply(entry)
+            self._journal_lines += 1
+        self._journal_offset += end
+
+    def _apply(self, entry):
+        if entry.get("op") == "put":
+            config = entry["config"]
+            name = config["api_name"]
+            self._configs[name] = config
+        else:
+            name = entry.get("api_name")
+            self._configs.pop(name, None)
+        if self._changes is not None:
+            self._changes.add(name)
+
+    def _sync(self):
+        """Bring memory up to date with disk; caller holds the file lock"""
+        journal_size = os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else 0
+        legacy = False
+        if (self._snapshot_hash is None or self._stat_sig(self.path) != self._snapshot_sig
+                or journal_size < self._journal_offset):
+            legacy = self._load_snapshot()
+        self._replay_journal()
+        if legacy:
+            self._compact_locked()
+
+    def refresh(self):
+        """Pick up changes written by other processes"""
+        with self._mutex, file_lock(self.lock_path):
+            self._sync()
+
+    def take_changes(self):
+        """Return names changed since the last call, or None if a full reload happened"""
+        with self._mutex:
+            changes, self._changes = self._changes, set()
+            return changes
+
+    def get(self, api_name):
+        with self._mutex:
+            return self._configs.get(api_name)
+
+    def all(self):
+        with self._mutex:
+            return list(self._configs.values())
+
+    def as_dict(self):
+        with self._mutex:
+            return dict(self._configs)
+
+    def __contains__(self, api_name):
+        return api_name in self._configs
+
+    def __len__(self):
+        return len(self._configs)
+
+    # -- writing -----------------------------------------------------------
+
+    def _append(self, entry):
+        with self._mutex, file_lock(self.lock_path):
+            self._sync()
+            line = (json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8')
+            if not self._journal_offset:
+                # first entry after a compaction: start the journal with the snapshot it extends
+                line = self._header() + line
+            with open(self.journal_path, 'ab' if self._journal_offset else 'wb') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_offset += len(line)
+            self._journal_lines += 1
+            self._apply(entry)
+            if self._journal_lines >= self.compact_after:
+                self._compact_locked()
+
+    def put(self, config):
+        """Insert or replace a config by api_name"""
+        self._append({"op": "put", "config": config})
+
+    def delete(self, api_name):
+        """Remove a config; returns False if it did not exist"""
+        with self._mutex:
+            self.refresh()
+            if api_name not in self._configs:
+                return False
+            self._append({"op": "del", "api_name": api_name})
+            return True
+
+    def _header(self):
+        return (json.dumps({"op": "snapshot", "hash": self._snapshot_hash}) + "\n").encode('utf-8')
+
+    def _compact_locked(self):
+        atomic_write_json(self.path, list(self._configs.values()))
+        with open(self.path, 'rb') as f:
+            self._snapshot_hash = content_hash(f.read())
+        with open(self.journal_path, 'wb'):
+            pass
+        self._snapshot_sig = self._stat_sig(self.path)
+        self._journal_offset = 0
+        self._journal_lines = 0
+        logger.info(f"已压缩 API 配置日志，共 {len(self._configs)} 个 API")
+
+    def compact(self):
+        """Fold the journal into api_configs.json"""
+        with self._mutex, file_lock(self.lock_path):
+            self._sync()
+            if self._journal_lines:
+                self._compact_locked()
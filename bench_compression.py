@@ -0,0 +1,196 @@
+"""
+Bytes-on-wire benchmark for upstream content encoding and WebSocket permessage-deflate.
+
+Upstream: a local stub API answers with the same JSON document in every
+content encoding the tool layer can decode (gzip, deflate, and br / zstd when
+``brotli`` / ``zstandard`` are installed).  Each encoding is fetched through
+the tool's streaming reader (``read_json``) and the bytes the stub actually
+wrote are counted.
+
+WebSocket: tool results (JSON-RPC responses wrapping the same document, as
+the tool emits them) are sent through a byte-counting TCP relay to a local
+WebSocket server, once per ``PIPE_WS_COMPRESSION`` / level setting, using
+the options ``mcp_pipe.py`` passes to ``websockets.connect``.
+
+Usage:
+
+python bench_compression.py [--records N] [--requests N] [--messages N]
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+import websockets
+
+import mcp_pipe
+from http_pool import accept_encoding, sync_decoders
+from response_reader import read_json
+
+WORDS = ("sunny", "cloudy", "rain", "north", "south", "east", "west", "wind", "beijing", "shanghai",
+         "guangzhou", "shenzhen", "temperature", "humidity", "forecast", "alert", "level", "update")
+
+
+def make_document(records, seed=7):
+    """JSON resembling a typical list API response: repeated keys, mixed values"""
+    rnd = random.Random(seed)
+    items = [{
+        "id": 100000 + i,
+        "name": " ".join(rnd.choice(WORDS) for _ in range(3)),
+        "value": round(rnd.uniform(-40, 40), 2),
+        "updated_at": f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T{rnd.randint(0, 23):02d}:00:00Z",
+        "tags": rnd.sample(WORDS, 2),
+        "active": rnd.random() < 0.5,
+    } for i in range(records)]
+    return json.dumps({"code": 0, "total": records, "items": items}, ensure_ascii=False).encode("utf-8")
+
+
+def encoders():
+    """Content encodings the stub can produce, limited to what requests can decode here"""
+    available = {"identity": lambda data: data, "gzip": gzip.compress, "deflate": zlib.compress}
+    try:
+        import brotli
+        available["br"] = brotli.compress
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        available["zstd"] = zstandard.ZstdCompressor().compress
+    except ImportError:
+        pass
+    decoders = sync_decoders() | {"identity"}
+    return {name: encode for name, encode in available.items() if name in decoders}
+
+
+def start_stub_api(document, bodies):
+    sent = {"bytes": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+        def do_GET(self):
+            offered = [part.split(";")[0].strip() for part in self.headers.get("Accept-Encoding", "").split(",")]
+            encoding = next((name for name in offered if name in bodies), "identity")
+            body = bodies[encoding]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            if encoding != "identity":
+                self.send_header("Content-Encoding", encoding)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            sent["bytes"] += len(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api", sent
+
+
+def bench_upstream(document, count):
+    bodies = {name: encode(document) for name, encode in encoders().items()}
+    server, url, sent = start_stub_api(document, bodies)
+    print(f"upstream document : {len(document):,} bytes")
+    print(f"tool Accept-Encoding: {accept_encoding(None, sync_decoders())}")
+    print(f"{'encoding':10s} {'wire bytes':>12s} {'ratio':>7s} {'ms/request':>11s}")
+    try:
+        session = requests.Session()
+        for name in bodies:
+            sent["bytes"] = 0
+            session.headers["Accept-Encoding"] = name
+            started = time.perf_counter()
+            for _ in range(count):
+                response = session.get(url, stream=True)
+                value, _ = read_json(response)
+            elapsed = time.perf_counter() - started
+            assert value["total"] == json.loads(document)["total"]
+            wire = sent["bytes"] / count
+            print(f"{name:10s} {wire:12,.0f} {wire / len(document):7.1%} {elapsed / count * 1000:11.2f}")
+        session.close()
+    finally:
+        server.shutdown()
+
+
+async def start_relay(target_port):
+    """TCP relay in front of the WebSocket server counting bytes in both directions"""
+    counted = {"up": 0, "down": 0}
+
+    async def pump(reader, writer, key):
+        try:
+            while data := await reader.read(65536):
+                counted[key] += len(data)
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle(client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection("127.0.0.1", target_port)
+        await asyncio.gather(pump(client_reader, server_writer, "up"),
+                             pump(server_reader, client_writer, "down"))
+
+    relay = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return relay, relay.sockets[0].getsockname()[1], counted
+
+
+async def bench_websocket(document, count):
+    message = json.dumps({"jsonrpc": "2.0", "id": 1, "result": {
+        "content": [{"type": "text", "text": json.dumps({"success": True, "result": json.loads(document)},
+                                                        ensure_ascii=False)}],
+        "isError": False}}, ensure_ascii=False)
+    size = len(message.encode("utf-8"))
+
+    async def sink(websocket, *args):
+        received = 0
+        async for _ in websocket:
+            received += 1
+            if received == count:
+                await websocket.send("done")
+
+    print(f"\ntool result message: {size:,} bytes, {count} messages")
+    print(f"{'setting':18s} {'wire bytes/msg':>15s} {'ratio':>7s} {'ms/msg':>8s}")
+    async with websockets.serve(sink, "127.0.0.1", 0, max_size=None) as server:
+        relay, port, counted = await start_relay(server.sockets[0].getsockname()[1])
+        settings = [("none", None)] + [("deflate", level) for level in (1, 6, 9)]
+        for compression, level in settings:
+            options = mcp_pipe.websocket_options(compression=compression, level=level)
+            async with websockets.connect(f"ws://127.0.0.1:{port}", **options) as websocket:
+                await asyncio.sleep(0.05)  # let the handshake bytes settle before counting
+                counted["up"] = 0
+                started = time.perf_counter()
+                for _ in range(count):
+                    await websocket.send(message)
+                await websocket.recv()
+                elapsed = time.perf_counter() - started
+            wire = counted["up"] / count
+            label = compression if level is None else f"{compression} level {level}"
+            print(f"{label:18s} {wire:15,.0f} {wire / size:7.1%} {elapsed / count * 1000:8.2f}")
+        relay.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bytes-on-wire benchmark for upstream and WebSocket compression')
+    parser.add_argument('--records', type=int, default=500, help='Records in the JSON document')
+    parser.add_argument('--requests', type=int, default=50, help='Upstream requests per encoding')
+    parser.add_argument('--messages', type=int, default=50, help='WebSocket messages per setting')
+    args = parser.parse_args()
+    document = make_document(args.records)
+    bench_upstream(document, args.requests)
+    asyncio.run(bench_websocket(document, args.messages))
+
+
+if __name__ == "__main__":
+    main()
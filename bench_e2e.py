@@ -0,0 +1,321 @@
+"""
+End-to-end benchmark: MCP endpoint -> mcp_pipe.py -> universal_mcp_tool.py -> upstream API.
+
+Everything runs locally:
+
+* a stub HTTP API (configurable latency, payload size and error rate),
+* a WebSocket server standing in for the MCP endpoint, which performs the MCP
+  initialize handshake and then drives ``tools/call`` traffic,
+* ``mcp_pipe.py universal_mcp_tool.py`` started as a subprocess in a scratch
+  directory with its own base config (``XIAOZHI_MCP_CONFIG``) and
+  ``api_configs.json``, so the user's configuration is never touched.
+
+Reports throughput, p50/p95/p99 latency, failures and the peak RSS of the pipe
+and tool processes.
+
+Usage:
+
+python bench_e2e.py [--calls N] [--concurrency C] [--latency-ms MS] [--payload-bytes B]
+                    [--error-rate R] [--mode sync|async] [--set KEY=VALUE] [--api-option KEY=VALUE]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import websockets
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+API_NAME = "bench_api"
+
+
+def make_payload(size):
+    item = {"id": 0, "name": "item", "value": "x" * 32}
+    count = max(1, size // (len(json.dumps(item)) + 2))
+    return json.dumps({"items": [dict(item, id=i) for i in range(count)]}).encode("utf-8")
+
+
+def start_stub_api(latency, payload_bytes, error_rate):
+    """Serve a fixed JSON payload on a background thread; returns (server, url)"""
+    body = make_payload(payload_bytes)
+    failure = json.dumps({"error": "stub failure"}).encode("utf-8")
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so the connection pool is exercised
+        disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+        def do_GET(self):
+            self._reply()
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self._reply()
+
+        def _reply(self):
+            if latency:
+                time.sleep(latency)
+            status, data = (500, failure) if error_rate and random.random() < error_rate else (200, body)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api"
+
+
+class MCPEndpoint:
+    """Local stand-in for the MCP endpoint the pipe connects to"""
+
+    def __init__(self):
+        self.connected = asyncio.get_running_loop().create_future()
+        self.websocket = None
+        self.pending = {}
+        self.next_id = 0
+
+    async def handler(self, websocket, *args):
+        self.websocket = websocket
+        if not self.connected.done():
+            self.connected.set_result(websocket)
+        try:
+            async for message in websocket:
+                response = json.loads(message)
+                future = self.pending.pop(response.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def request(self, method, params=None, timeout=30):
+        self.next_id += 1
+        request_id = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            message["params"] = params
+        await self.websocket.send(json.dumps(message))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def notify(self, method):
+        await self.websocket.send(json.dumps({"jsonrpc": "2.0", "method": method}))
+
+    async def initialize(self):
+        await self.request("initialize", {
+            "protocolVersion": "2024-11-05",
+            "capabilities": {},
+            "clientInfo": {"name": "bench_e2e", "version": "0.1.0"},
+        })
+        await self.notify("notifications/initialized")
+        tools = await self.request("tools/list")
+        return {tool["name"]: tool.get("inputSchema", {}) for tool in tools.get("result", {}).get("tools", [])}
+
+
+def call_succeeded(response):
+    """A tools/call response counts as a success when the tool reported success"""
+    result = response.get("result")
+    if not isinstance(result, dict) or result.get("isError"):
+        return False
+    for content in result.get("content", []):
+        try:
+            payload = json.loads(content.get("text", ""))
+        except (TypeError, ValueError):
+            continue
+        if isinstance(payload, dict) and "success" in payload:
+            return bool(payload["success"])
+    return True
+
+
+def rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def child_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", encoding="ascii") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+async def sample_rss(pid, peaks, interval=0.25):
+    """Track peak RSS (kB) of the pipe process and of the tool process it spawned"""
+    while True:
+        for name, pids in (("pipe", [pid]), ("tool", child_pids(pid))):
+            total = sum(filter(None, (rss_kb(p) for p in pids)))
+            if total:
+                peaks[name] = max(peaks.get(name, 0), total)
+        await asyncio.sleep(interval)
+
+
+def parse_settings(pairs):
+    settings = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        try:
+            settings[key] = json.loads(value)
+        except ValueError:
+            settings[key] = value
+    return settings
+
+
+def make_arguments(schema, i):
+    """Typed arguments when the tool publishes its fields, the legacy kwargs string otherwise"""
+    if "kwargs" in schema.get("properties", {}):
+        return {"kwargs": f"query-{i % 100}"}
+    return {"q": f"query-{i % 100}"}
+
+
+async def drive(endpoint, schema, calls, concurrency, timeout):
+    """Issue `calls` tools/call requests with at most `concurrency` outstanding"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def one(i):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await endpoint.request("tools/call", {
+                    "name": API_NAME, "arguments": make_arguments(schema, i)}, timeout)
+                ok = call_succeeded(response)
+            except asyncio.TimeoutError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return time.perf_counter() - started, latencies, failures
+
+
+async def run(args):
+    server, api_url = start_stub_api(args.latency_ms / 1000, args.payload_bytes, args.error_rate)
+    endpoint = MCPEndpoint()
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    process = None
+    try:
+        async with websockets.serve(endpoint.handler, "127.0.0.1", 0) as ws_server:
+            uri = f"ws://127.0.0.1:{ws_server.sockets[0].getsockname()[1]}"
+
+            base_config = {"MCP_ENDPOINT": uri, "EXECUTION_MODE": args.mode, "CONFIG_WATCH": False}
+            base_config.update(parse_settings(args.set))
+            api_config = {
+                "api_name": API_NAME,
+                "api_url": api_url,
+                "method": args.method,
+                "request_format": {"q": "string"},
+                "response_format": {"items": [{"id": "number", "name": "string"}]},
+                "description": "bench_e2e stub API",
+            }
+            api_config.update(parse_settings(args.api_option))
+            config_path = os.path.join(workdir, "base_config.json")
+            with open(config_path, "w", encoding="utf-8") as f:
+                json.dump(base_config, f)
+            with open(os.path.join(workdir, "api_configs.json"), "w", encoding="utf-8") as f:
+                json.dump([api_config], f)
+
+            env = dict(os.environ, XIAOZHI_MCP_CONFIG=config_path)
+            output = None if args.verbose else asyncio.subprocess.DEVNULL
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.join(HERE, "mcp_pipe.py"), os.path.join(HERE, "universal_mcp_tool.py"),
+                "--endpoint", uri, cwd=workdir, env=env, stdout=output, stderr=output)
+
+            exited = asyncio.ensure_future(process.wait())
+            done, _ = await asyncio.wait({endpoint.connected, exited}, timeout=args.startup_timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if endpoint.connected not in done:
+                print(f"mcp_pipe did not connect (logs in {workdir})")
+                return 1
+            tools = await endpoint.initialize()
+            if API_NAME not in tools:
+                print(f"{API_NAME} was not registered, tools: {list(tools)} (logs in {workdir})")
+                return 1
+
+            if args.warmup:
+                await drive(endpoint, tools[API_NAME], args.warmup, args.concurrency, args.timeout)
+            peaks = {}
+            sampler = asyncio.create_task(sample_rss(process.pid, peaks))
+            elapsed, latencies, failures = await drive(endpoint, tools[API_NAME], args.calls,
+                                                       args.concurrency, args.timeout)
+            sampler.cancel()
+    finally:
+        if process is not None and process.returncode is None:
+            for pid in child_pids(process.pid):
+                try:
+                    os.kill(pid, 15)
+                except OSError:
+                    pass
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), 5)
+            except asyncio.TimeoutError:
+                process.kill()
+        server.shutdown()
+
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"mode          : {args.mode}, {args.method}, concurrency {args.concurrency}")
+    print(f"upstream      : {args.latency_ms:g} ms latency, {args.payload_bytes} bytes, "
+          f"{args.error_rate:.0%} errors")
+    print(f"calls         : {len(latencies)} ({failures} failed)")
+    print(f"elapsed       : {elapsed:.3f} s")
+    print(f"throughput    : {len(latencies) / elapsed:,.1f} calls/s")
+    print(f"latency p50   : {cuts[49] * 1000:8.2f} ms")
+    print(f"latency p95   : {cuts[94] * 1000:8.2f} ms")
+    print(f"latency p99   : {cuts[98] * 1000:8.2f} ms")
+    for name in ("pipe", "tool"):
+        peak = peaks.get(name)
+        print(f"peak RSS {name:5s}: {peak / 1024:8.1f} MB" if peak else f"peak RSS {name:5s}: n/a")
+    print(f"logs          : {workdir}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end MCP pipe + tool benchmark against local stubs')
+    parser.add_argument('--calls', type=int, default=1000, help='Number of measured tools/call requests')
+    parser.add_argument('--warmup', type=int, default=50, help='Unmeasured calls before the run')
+    parser.add_argument('--concurrency', type=int, default=8, help='Outstanding tools/call requests')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-call timeout in seconds')
+    parser.add_argument('--latency-ms', type=float, default=20, help='Stub upstream latency')
+    parser.add_argument('--payload-bytes', type=int, default=2048, help='Stub upstream response size')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of upstream 500 responses')
+    parser.add_argument('--method', choices=('GET', 'POST'), default='GET', help='Upstream HTTP method')
+    parser.add_argument('--mode', choices=('sync', 'async'), default='sync', help='EXECUTION_MODE of the tool')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help='Extra base config entry (value parsed as JSON when possible)')
+    parser.add_argument('--api-option', action='append', default=[], metavar='KEY=VALUE',
+                        help='Extra per-API config entry, e.g. cache_ttl=30')
+    parser.add_argument('--startup-timeout', type=float, default=30, help='Seconds to wait for the pipe to connect')
+    parser.add_argument('--verbose', action='store_true', help='Show pipe/tool output')
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Throughput benchmark for the mcp_pipe process pipes.
+
+Starts an echo child process (every stdin line is written back to stdout, the
+way an MCP stdio server answers one line per message) and pushes messages
+through ``pipe_websocket_to_process`` / ``pipe_process_to_websocket`` using
+an in-memory stand-in for the WebSocket.  Reports messages/sec and MB/sec for
+the round trip pipe -> child -> pipe.
+
+Usage:
+
+python bench_pipe.py [--messages N] [--size BYTES]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import mcp_pipe
+
+ECHO_CHILD = (
+    "import sys\n"
+    "for line in sys.stdin.buffer:\n"
+    "    sys.stdout.buffer.write(line)\n"
+    "    sys.stdout.buffer.flush()\n"
+)
+
+
+class MemoryWebSocket:
+    """Feeds prepared messages to the pipe and counts what comes back"""
+
+    def __init__(self, messages, expected):
+        self._messages = iter(messages)
+        self.expected = expected
+        self.received = 0
+        self.bytes = 0
+        self.done = asyncio.Event()
+
+    async def recv(self, decode=None):
+        message = next(self._messages, None)
+        if message is None:
+            await asyncio.Event().wait()  # idle like a quiet connection
+        return message
+
+    async def send(self, data, text=None):
+        self.received += 1
+        self.bytes += len(data)
+        if self.received >= self.expected:
+            self.done.set()
+
+
+def make_message(i, size):
+    message = {"jsonrpc": "2.0", "id": i, "method": "tools/call",
+               "params": {"name": "bench", "arguments": {"pad": ""}}}
+    pad = max(0, size - len(json.dumps(message)))
+    message["params"]["arguments"]["pad"] = "x" * pad
+    return json.dumps(message)
+
+
+async def run(count, size):
+    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as f:
+        f.write(ECHO_CHILD)
+        child = f.name
+    process = await mcp_pipe.start_mcp_process(child)
+    try:
+        websocket = MemoryWebSocket((make_message(i, size) for i in range(count)), count)
+        start = time.perf_counter()
+        tasks = [
+            asyncio.create_task(mcp_pipe.pipe_websocket_to_process(websocket, process)),
+            asyncio.create_task(mcp_pipe.pipe_process_to_websocket(process, websocket)),
+        ]
+        await websocket.done.wait()
+        elapsed = time.perf_counter() - start
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await mcp_pipe.terminate_process(process)
+        os.unlink(child)
+
+    print(f"messages      : {count} x ~{size} bytes")
+    print(f"elapsed       : {elapsed:.3f} s")
+    print(f"throughput    : {count / elapsed:,.0f} msg/s")
+    print(f"bandwidth     : {websocket.bytes / elapsed / 1e6:,.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='mcp_pipe process pipe throughput benchmark')
+    parser.add_argument('--messages', type=int, default=20000, help='Number of messages to send')
+    parser.add_argument('--size', type=int, default=256, help='Approximate size of each message in bytes')
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Microbenchmark: per-call request preparation, before and after request plans.
+
+Compares the per-call work the old ``api_caller`` did (re-deriving the field
+list, parsing ``kwargs``, rebuilding the auth header / query string and
+re-checking the method on every call) against ``RequestPlan.bind`` on a plan
+compiled once.
+
+Usage:
+
+python bench_request_plan.py [--calls N] [--repeat N]
+"""
+
+import argparse
+import timeit
+
+from request_plan import compile_plan
+
+API_CONFIG = {
+    "api_name": "bench",
+    "api_url": "https://api.example.com/weather?lang=zh",
+    "method": "GET",
+    "request_format": {"city": "string", "days": "number", "detail": "boolean"},
+    "response_format": {"temperature": "number"},
+    "description": "bench",
+    "api_key": "secret-key",
+    "key_location": "query",
+    "key_name": "api_key",
+}
+
+CALLS = [
+    {"kwargs": "beijing 3 true"},
+    {"kwargs": "shanghai,7"},
+    {"kwargs": {"city": "shenzhen", "days": 1}},
+    {},
+]
+
+
+def legacy_prepare(api_config, kwargs):
+    """The per-call preparation api_caller performed before request plans"""
+    api_url = api_config["api_url"]
+    method = api_config["method"].upper()
+    request_format = api_config.get("request_format", {})
+    api_key = api_config.get("api_key", "")
+    key_location = api_config.get("key_location", "header")
+    key_name = api_config.get("key_name", "Authorization")
+
+    fields = list(request_format.keys())
+    params = {}
+    if "kwargs" in kwargs:
+        value = kwargs["kwargs"]
+        if isinstance(value, str):
+            parts = [p.strip() for p in value.replace(",", " ").split()]
+            for i, field in enumerate(fields):
+                if i < len(parts):
+                    params[field] = parts[i]
+                else:
+                    params[field] = request_format.get(field, "")
+        elif isinstance(value, dict):
+            params.update(value)
+    for field in fields:
+        if field not in params:
+            params[field] = request_format.get(field, "")
+
+    headers = {}
+    url = api_url
+    if api_key:
+        if key_location == "header":
+            headers[key_name] = f"Bearer {api_key}" if key_name.lower() == "authorization" else api_key
+        elif key_location == "query":
+            url += f"?{key_name}={api_key}" if "?" not in url else f"&{key_name}={api_key}"
+        elif key_location == "body":
+            params[key_name] = api_key
+    if method not in ("GET", "POST"):
+        raise ValueError(method)
+    return url, params, headers
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-call request preparation microbenchmark')
+    parser.add_argument('--calls', type=int, default=40000, help='Simulated tool calls per measurement')
+    parser.add_argument('--repeat', type=int, default=25, help='Measurements of each path')
+    args = parser.parse_args()
+
+    plan = compile_plan(API_CONFIG)
+    rounds = max(1, args.calls // len(CALLS))
+
+    def run_legacy():
+        for kwargs in CALLS:
+            legacy_prepare(API_CONFIG, kwargs)
+
+    def run_plan():
+        for kwargs in CALLS:
+            plan.bind(kwargs)
+
+    # alternate the two paths so drift in machine load affects both alike, keep the best of each
+    legacy_times, plan_times = [], []
+    for _ in range(args.repeat):
+        legacy_times.append(timeit.timeit(run_legacy, number=rounds))
+        plan_times.append(timeit.timeit(run_plan, number=rounds))
+    legacy = min(legacy_times) / (rounds * len(CALLS))
+    planned = min(plan_times) / (rounds * len(CALLS))
+    print(f"legacy per-call prepare : {legacy * 1e6:8.3f} us")
+    print(f"request plan bind       : {planned * 1e6:8.3f} us")
+    print(f"speedup                 : {legacy / planned:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
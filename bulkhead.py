@@ -0,0 +1,113 @@
+"""
+Bounded execution of blocking tool calls with per-API bulkheads.
+
+In sync mode every API tool does blocking HTTP.  Instead of running it on the
+event loop (where one slow upstream stalls every other tool), the tool layer
+hands each call to a shared worker pool (``WORKER_THREADS`` in the base
+config) through the API's ``Bulkhead``:
+
+* at most ``bulkhead_max_concurrent`` calls of one API run at a time, so a
+  hung upstream can occupy only its own share of the workers;
+* at most ``bulkhead_max_queued`` further calls wait for a slot; beyond that a
+  call is rejected immediately with ``BulkheadFull`` instead of piling up;
+* the time each call spent waiting (for its bulkhead slot and for a worker)
+  is recorded for ``get_tool_stats``.
+
+Both limits fall back to ``BULKHEAD_MAX_CONCURRENT`` / ``BULKHEAD_MAX_QUEUED``
+in the base config.
+"""
+
+import asyncio
+import contextvars
+import time
+
+from tail_latency import LatencyTracker
+
+DEFAULT_WORKERS = 32
+DEFAULT_MAX_QUEUED = 32
+
+
+class BulkheadFull(Exception):
+    pass
+
+
+class Bulkhead:
+    """Concurrency and queue limits for the blocking calls of one API
+
+    ``run`` must be awaited from the event loop thread; the counters are only
+    touched there.
+    """
+
+    def __init__(self, name, max_concurrent=8, max_queued=DEFAULT_MAX_QUEUED):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+        self.queue_time = LatencyTracker()
+        self.queue_time_max = 0.0
+
+    @classmethod
+    def from_config(cls, api_config, base_config=None, workers=DEFAULT_WORKERS):
+        base_config = base_config or {}
+        # by default one API may occupy a quarter of the worker pool
+        max_concurrent = api_config.get("bulkhead_max_concurrent",
+                                        base_config.get("BULKHEAD_MAX_CONCURRENT", max(1, workers // 4)))
+        max_queued = api_config.get("bulkhead_max_queued",
+                                    base_config.get("BULKHEAD_MAX_QUEUED", DEFAULT_MAX_QUEUED))
+        return cls(api_config["api_name"], int(max_concurrent), int(max_queued))
+
+    async def run(self, executor, fn, *args, **kwargs):
+        """Run ``fn`` on ``executor`` within this bulkhead's limits; raises BulkheadFull when both are used up"""
+        if self._semaphore.locked() and self.queued >= self.max_queued:
+            self.rejected += 1
+            raise BulkheadFull(f"API '{self.name}' bulkhead full "
+                               f"({self.active} running, {self.queued} queued)")
+        enqueued = time.monotonic()
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.active += 1
+        loop = asyncio.get_running_loop()
+
+        def call():
+            waited = time.monotonic() - enqueued
+            self.queue_time.record(waited)
+            if waited > self.queue_time_max:
+                self.queue_time_max = waited
+            return fn(*args, **kwargs)
+
+        try:
+            # the copied context carries the call deadline into the worker
+            future = executor.submit(contextvars.copy_context().run, call)
+        except BaseException:
+            self._release()
+            raise
+        # the slot is freed when the worker finishes (or the queued call is cancelled),
+        # not when a caller gives up waiting, so abandoned calls still count
+        future.add_done_callback(lambda _: self._release_threadsafe(loop))
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def _release_threadsafe(self, loop):
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            pass  # event loop already closed
+
+    def stats(self):
+        p95 = self.queue_time.p95
+        return {
+            "bulkhead_active": self.active,
+            "bulkhead_queued": self.queued,
+            "bulkhead_rejected": self.rejected,
+            "queue_time_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "queue_time_max_ms": round(self.queue_time_max * 1000, 1),
+        }
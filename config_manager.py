@@ -2,7 +2,8 @@ import json
 import os
 from pathlib import Path
 
-CONFIG_PATH = Path.home() / ".xiaozhi_mcp_config.json"
+# XIAOZHI_MCP_CONFIG points at an alternative base config (e.g. for benchmarks)
+CONFIG_PATH = Path(os.environ.get("XIAOZHI_MCP_CONFIG") or Path.home() / ".xiaozhi_mcp_config.json")
 
 def load_config():
     try:
@@ -0,0 +1,60 @@
+"""
+Polling file watcher used to hot-reload ``api_configs.json``.
+
+The watcher compares the file's (mtime, size) every ``interval`` seconds and
+calls ``callback`` once the file has stopped changing for ``debounce``
+seconds, so a burst of saves from the GUI triggers a single reload.  Polling
+keeps it dependency-free and works the same on Windows and Linux.
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('universal_mcp')
+
+
+class ConfigWatcher:
+    def __init__(self, paths, callback, interval=1.0, debounce=0.5):
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.callback = callback
+        self.interval = interval
+        self.debounce = debounce
+        self._stop = threading.Event()
+        self._thread = None
+        self._last = self._snapshot()
+
+    def _snapshot(self):
+        snapshot = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                snapshot.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                snapshot.append(None)
+        return tuple(snapshot)
+
+    def _run(self):
+        pending_since = None
+        while not self._stop.wait(self.interval if pending_since is None else min(self.interval, self.debounce)):
+            current = self._snapshot()
+            if current != self._last:
+                self._last = current
+                pending_since = time.monotonic()
+                continue
+            if pending_since is not None and time.monotonic() - pending_since >= self.debounce:
+                pending_since = None
+                try:
+                    self.callback()
+                except Exception as e:
+                    logger.error(f"配置热加载失败: {e}", exc_info=True)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+            self._thread.start()
+            logger.info(f"已开始监听配置文件变更: {', '.join(self.paths)}")
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,301 @@
+"""
+Persistent response cache shared by tool processes.
+
+``mcp_pipe.py`` restarts the tool process with every reconnect, which empties
+the in-memory cache.  For APIs with ``cache_persist`` the in-memory partition
+is backed by a SQLite database (``CACHE_DB`` in the base config): a memory
+miss falls through to the database and every cached result is also written
+there, so a freshly started tool process -- or a second one serving another
+endpoint -- starts warm.
+
+* WAL journal with a busy timeout: several processes read and write the same
+  file safely, readers never block the writer.
+* Entries carry a wall-clock expiry (the API's ``cache_ttl``) and a fingerprint
+  of the API config, so a changed URL, format or key never serves old results.
+* Each API is bounded by ``cache_disk_max_bytes``; the least recently used
+  entries are evicted past that.
+* An expired entry that carries HTTP validators (ETag / Last-Modified) is kept
+  until its ``keep_until`` time so the next call can revalidate it with a
+  conditional request instead of downloading the body again.
+* In async mode the tool reads the database in a worker thread and hands its
+  writes to a single background writer thread (``defer``), so SQLite never
+  runs on the event loop.
+* A background compactor deletes rows past ``keep_until``, returns free pages to the
+  file system and truncates the WAL every ``CACHE_DB_COMPACT_INTERVAL`` seconds.
+
+Database errors never fail a tool call: the lookup is treated as a miss.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('universal_mcp')
+
+DEFAULT_DB_PATH = "response_cache.db"
+DEFAULT_DISK_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_COMPACT_INTERVAL = 300
+BUSY_TIMEOUT_MS = 5000
+EVICT_CHECK_EVERY = 16  # puts between size checks of a partition
+TOUCH_INTERVAL = 60  # seconds before a read refreshes an entry's LRU timestamp
+
+SCHEMA_VERSION = 2  # bumping it drops the cached rows of older versions
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS responses ("
+    " api TEXT NOT NULL, key TEXT NOT NULL, expires_at REAL NOT NULL, keep_until REAL NOT NULL,"
+    " accessed_at REAL NOT NULL, size INTEGER NOT NULL, value TEXT NOT NULL, validators TEXT,"
+    " UNIQUE (api, key))",
+    "CREATE INDEX IF NOT EXISTS responses_lru ON responses (api, accessed_at)",
+    "CREATE INDEX IF NOT EXISTS responses_keep ON responses (keep_until)",
+)
+
+
+def config_fingerprint(api_config):
+    """Short hash of an API config; entries written under another config are ignored"""
+    text = json.dumps(api_config, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class DiskCache:
+    """One SQLite cache file, with a connection per thread"""
+
+    def __init__(self, path=DEFAULT_DB_PATH, compact_interval=DEFAULT_COMPACT_INTERVAL):
+        self.path = os.path.abspath(path)
+        self.compact_interval = compact_interval
+        self.errors = 0
+        self._local = threading.local()
+        self._compactor = None
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._stop = threading.Event()
+        if not os.path.exists(self.path):
+            # cached responses may be sensitive: readable by the owner only
+            os.close(os.open(self.path, os.O_CREAT | os.O_WRONLY, 0o600))
+        # auto_vacuum only takes effect before the first table exists, so the schema is
+        # created on a plain connection before any connection switches the file to WAL
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        try:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS responses")
+                conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _failed(self, action, error):
+        self.errors += 1
+        logger.warning(f"磁盘缓存{action}失败: {error}")
+
+    def get(self, api, key):
+        """Look up an entry that is fresh or still kept for revalidation
+
+        Returns ``(value, expires_at, keep_until, size, validators)``, or None.
+        """
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT expires_at, keep_until, accessed_at, size, value, validators "
+                               "FROM responses WHERE api=? AND key=?", (api, key)).fetchone()
+            if row is None:
+                return None
+            expires_at, keep_until, accessed_at, size, text, validators = row
+            if keep_until <= now:
+                conn.execute("DELETE FROM responses WHERE api=? AND key=? AND keep_until<=?", (api, key, now))
+                return None
+            if now - accessed_at > TOUCH_INTERVAL:
+                conn.execute("UPDATE responses SET accessed_at=? WHERE api=? AND key=?", (now, api, key))
+            return json.loads(text), expires_at, keep_until, size, json.loads(validators) if validators else None
+        except (sqlite3.Error, ValueError) as e:
+            self._failed("读取", e)
+            return None
+
+    def put(self, api, key, text, size, ttl, validators=None, keep=0):
+        """Store an entry fresh for ``ttl`` seconds, kept ``keep`` seconds longer when it has validators"""
+        now = time.time()
+        expires_at = now + ttl
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO responses "
+                "(api, key, expires_at, keep_until, accessed_at, size, value, validators) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (api, key, expires_at, expires_at + keep if validators else expires_at, now, size, text,
+                 json.dumps(validators) if validators else None))
+            return True
+        except sqlite3.Error as e:
+            self._failed("写入", e)
+            return False
+
+    def refresh(self, api, key, ttl, validators, keep):
+        """Mark an entry fresh again after the upstream answered 304 Not Modified"""
+        now = time.time()
+        try:
+            return self._connection().execute(
+                "UPDATE responses SET expires_at=?, keep_until=?, accessed_at=?, validators=? "
+                "WHERE api=? AND key=?",
+                (now + ttl, now + ttl + keep, now, json.dumps(validators), api, key)).rowcount > 0
+        except sqlite3.Error as e:
+            self._failed("写入", e)
+            return False
+
+    def evict(self, api, max_bytes):
+        """Drop the least recently used entries of ``api`` until it fits in ``max_bytes``; returns the count"""
+        try:
+            conn = self._connection()
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses WHERE api=?", (api,)).fetchone()[0]
+            excess = total - max_bytes
+            if excess <= 0:
+                return 0
+            victims = []
+            for rowid, size in conn.execute(
+                    "SELECT rowid, size FROM responses WHERE api=? ORDER BY accessed_at", (api,)):
+                victims.append((rowid,))
+                excess -= size
+                if excess <= 0:
+                    break
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("DELETE FROM responses WHERE rowid=?", victims)
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+            return len(victims)
+        except sqlite3.Error as e:
+            self._failed("淘汰", e)
+            return 0
+
+    def compact(self):
+        """Delete entries past keep_until, release free pages and truncate the WAL; returns the rows deleted"""
+        try:
+            conn = self._connection()
+            deleted = conn.execute("DELETE FROM responses WHERE keep_until<=?", (time.time(),)).rowcount
+            conn.execute("PRAGMA incremental_vacuum").fetchall()  # frees pages as rows are stepped
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            self._failed("压缩", e)
+            return 0
+        if deleted:
+            logger.info(f"磁盘缓存已清理 {deleted} 条过期记录")
+        return deleted
+
+    def _compact_loop(self):
+        while not self._stop.wait(self.compact_interval):
+            self.compact()
+
+    def start_compactor(self):
+        """Start the background compactor (idempotent)"""
+        if self._compactor is None and self.compact_interval > 0:
+            self._compactor = threading.Thread(target=self._compact_loop, name="disk-cache-compactor", daemon=True)
+            self._compactor.start()
+
+    def defer(self, fn, *args):
+        """Run ``fn(*args)`` on the background writer thread, in submission order"""
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-cache-writer")
+            try:
+                self._writer.submit(fn, *args)
+            except RuntimeError:  # closed or shutting down: the write is only a cache update
+                pass
+
+    def entries(self, api):
+        try:
+            return self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE api=?", (api,)).fetchone()
+        except sqlite3.Error:
+            return None, None
+
+    def stats(self):
+        def size(path):
+            try:
+                return os.path.getsize(path)
+            except OSError:
+                return 0
+
+        return {
+            "path": self.path,
+            "file_bytes": size(self.path),
+            "wal_bytes": size(self.path + "-wal"),
+            "errors": self.errors,
+        }
+
+    def close(self):
+        self._stop.set()
+        with self._writer_lock:
+            writer = self._writer
+        if writer is not None:
+            writer.shutdown(wait=True)  # finish the pending writes
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class DiskPartition:
+    """The slice of a ``DiskCache`` belonging to one API"""
+
+    def __init__(self, disk, api_name, fingerprint, max_bytes=DEFAULT_DISK_MAX_BYTES):
+        self.disk = disk
+        self.api_name = api_name
+        self.fingerprint = fingerprint
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.evictions = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    def _key(self, key):
+        return hashlib.blake2b(f"{self.fingerprint}\0{key}".encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, key):
+        """Return ``(value, expires_at, keep_until, size, validators)`` with wall-clock times, or None"""
+        entry = self.disk.get(self.api_name, self._key(key))
+        if entry is not None and entry[1] > time.time():
+            with self._lock:
+                self.hits += 1
+        return entry
+
+    def refresh(self, key, ttl, validators, keep):
+        return self.disk.refresh(self.api_name, self._key(key), ttl, validators, keep)
+
+    def put(self, key, text, size, ttl, validators=None, keep=0):
+        if not self.disk.put(self.api_name, self._key(key), text, size, ttl, validators, keep):
+            return
+        with self._lock:
+            self._puts += 1
+            check = self._puts % EVICT_CHECK_EVERY == 0
+        if check:
+            evicted = self.disk.evict(self.api_name, self.max_bytes)
+            with self._lock:
+                self.evictions += evicted
+
+    def stats(self):
+        entries, size = self.disk.entries(self.api_name)
+        with self._lock:
+            return {
+                "disk_entries": entries,
+                "disk_bytes": size,
+                "disk_max_bytes": self.max_bytes,
+                "disk_hits": self.hits,
+                "disk_evictions": self.evictions,
+            }
@@ -0,0 +1,306 @@
+"""
+Shared HTTP connection pools for the generated API tools.
+
+Every registered API tool borrows a keep-alive ``requests.Session`` from a
+single ``SessionPool`` instead of calling ``requests.get``/``requests.post``
+directly, so repeated calls to the same upstream reuse TCP/TLS connections.
+In async execution mode the tools use ``AsyncClientPool`` instead, with
+``InflightLimiter`` bounding concurrent requests globally and per host.
+
+Per-API options (all optional, read from ``api_configs.json``):
+
+    pool_size      connections kept per host (default 10)
+    max_retries    retries for idempotent requests on connect errors / 5xx (default 0)
+    retry_backoff  urllib3 backoff factor between retries (default 0.3)
+    keep_alive     false to send ``Connection: close`` (default true)
+    idle_timeout   seconds a pooled session may stay unused before it is closed (default 60)
+    accept_encoding  Accept-Encoding sent upstream (default: every encoding the client
+                     can decode, preferring zstd and br when ``zstandard``/``brotli`` are installed;
+                     "identity" disables compression)
+"""
+
+import asyncio
+import contextlib
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger('universal_mcp')
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 0
+DEFAULT_RETRY_BACKOFF = 0.3
+DEFAULT_IDLE_TIMEOUT = 60
+RETRY_STATUS_CODES = (502, 503, 504)
+RETRY_METHODS = frozenset(["GET", "HEAD", "OPTIONS"])
+PREFERRED_ENCODINGS = ("zstd", "br", "gzip", "deflate")
+
+
+def sync_decoders():
+    """Content encodings urllib3 can decode in this environment"""
+    from urllib3.response import HTTPResponse
+
+    return set(getattr(HTTPResponse, "CONTENT_DECODERS", ("gzip", "deflate")))
+
+
+def async_decoders():
+    """Content encodings httpx can decode in this environment"""
+    try:
+        from httpx._decoders import SUPPORTED_DECODERS
+    except ImportError:
+        return {"gzip", "deflate"}
+    return set(SUPPORTED_DECODERS) - {"identity"}
+
+
+def accept_encoding(configured, decoders):
+    """Accept-Encoding header value: the configured one, or every supported encoding by preference"""
+    if configured:
+        return configured
+    return ", ".join(name for name in PREFERRED_ENCODINGS if name in decoders) or "identity"
+
+
+def pool_options(api_config):
+    """Return the hashable pool settings declared by an API config"""
+    return (
+        int(api_config.get("pool_size", DEFAULT_POOL_SIZE)),
+        int(api_config.get("max_retries", DEFAULT_MAX_RETRIES)),
+        float(api_config.get("retry_backoff", DEFAULT_RETRY_BACKOFF)),
+        bool(api_config.get("keep_alive", True)),
+        api_config.get("accept_encoding") or None,
+    )
+
+
+def _pool_key(url, options):
+    parts = urlsplit(url)
+    return (parts.scheme.lower(), parts.netloc.lower()) + options
+
+
+class SessionPool:
+    """Keep-alive sessions keyed by (scheme, host, pool settings), with idle reaping"""
+
+    def __init__(self, reap_interval=15):
+        self._sessions = {}  # key -> [session, last_used, idle_timeout, requests in progress]
+        self._lock = threading.Lock()
+        self._reap_interval = reap_interval
+        self._reaper = None
+        self._stop = threading.Event()
+
+    def _create_session(self, options):
+        pool_size, max_retries, retry_backoff, keep_alive, encoding = options
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=retry_backoff,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=RETRY_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=retry, pool_block=False)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if not keep_alive:
+            session.headers["Connection"] = "close"
+        # decoded transparently by iter_content; max_response_bytes caps the decoded size
+        session.headers["Accept-Encoding"] = accept_encoding(encoding, sync_decoders())
+        return session
+
+    def _entry(self, url, api_config):
+        """The pool entry for the host of ``url`` under the API's settings; caller holds the lock"""
+        options = pool_options(api_config)
+        idle_timeout = float(api_config.get("idle_timeout", DEFAULT_IDLE_TIMEOUT))
+        key = _pool_key(url, options)
+        entry = self._sessions.get(key)
+        if entry is None:
+            entry = [self._create_session(options), time.monotonic(), idle_timeout, 0]
+            self._sessions[key] = entry
+            logger.info(f"创建连接池: {key[0]}://{key[1]} (pool_size={options[0]})")
+        else:
+            entry[1] = time.monotonic()
+            entry[2] = max(entry[2], idle_timeout)
+        return entry
+
+    def get(self, url, api_config):
+        """Return the shared session for the host of ``url`` under the API's pool settings"""
+        with self._lock:
+            return self._entry(url, api_config)[0]
+
+    @contextlib.contextmanager
+    def use(self, url, api_config):
+        """Like ``get``, but the session is never reaped while the block runs; idle time starts after it"""
+        with self._lock:
+            entry = self._entry(url, api_config)
+            entry[3] += 1
+        try:
+            yield entry[0]
+        finally:
+            with self._lock:
+                entry[1] = time.monotonic()
+                entry[3] -= 1
+
+    def reap_idle(self):
+        """Close sessions that have been idle longer than their idle_timeout and have no request in progress"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, last_used, idle_timeout, in_use) in self._sessions.items()
+                       if not in_use and now - last_used > idle_timeout]
+            sessions = [self._sessions.pop(key)[0] for key in expired]
+        for session in sessions:
+            session.close()
+        if sessions:
+            logger.info(f"已回收 {len(sessions)} 个空闲连接池")
+        return len(sessions)
+
+    def _reap_loop(self):
+        while not self._stop.wait(self._reap_interval):
+            try:
+                self.reap_idle()
+            except Exception as e:
+                logger.error(f"回收空闲连接失败: {e}")
+
+    def start_reaper(self):
+        """Start the background idle-connection reaper (idempotent)"""
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=self._reap_loop, name="http-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {"host": f"{key[0]}://{key[1]}", "pool_size": key[2], "in_use": in_use,
+                 "idle_seconds": round(now - last_used, 1) if not in_use else 0.0}
+                for key, (_, last_used, _, in_use) in self._sessions.items()
+            ]
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            sessions = [entry[0] for entry in self._sessions.values()]
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+class AsyncClientPool:
+    """Shared ``httpx.AsyncClient`` instances keyed by pool settings for async tools
+
+    httpx pools connections per host inside one client, so only the pool
+    settings need to be part of the key.  Idle keep-alive connections are
+    dropped by httpx after ``idle_timeout`` seconds.  Clients whose settings
+    no API uses any more are closed by ``retain`` once their requests finish.
+    """
+
+    def __init__(self):
+        self._clients = {}
+        self._users = {}  # client -> requests running on it
+        self._retired = set()  # dropped clients closed when their last request ends
+
+    def get(self, api_config):
+        import httpx
+
+        options = pool_options(api_config)
+        client = self._clients.get(options)
+        if client is None:
+            pool_size, max_retries, _, keep_alive, encoding = options
+            limits = httpx.Limits(
+                max_connections=None,
+                max_keepalive_connections=pool_size if keep_alive else 0,
+                keepalive_expiry=float(api_config.get("idle_timeout", DEFAULT_IDLE_TIMEOUT)),
+            )
+            transport = httpx.AsyncHTTPTransport(retries=max_retries, limits=limits)
+            client = httpx.AsyncClient(transport=transport, timeout=None,
+                                       headers={"Accept-Encoding": accept_encoding(encoding, async_decoders())})
+            self._clients[options] = client
+            logger.info(f"创建异步连接池 (pool_size={pool_size})")
+        return client
+
+    @contextlib.asynccontextmanager
+    async def use(self, api_config):
+        """The client for ``api_config``, kept open while the block runs"""
+        client = self.get(api_config)
+        self._users[client] = self._users.get(client, 0) + 1
+        try:
+            yield client
+        finally:
+            self._users[client] -= 1
+            if not self._users[client]:
+                del self._users[client]
+                if client in self._retired:
+                    self._retired.discard(client)
+                    await client.aclose()
+
+    async def retain(self, api_configs):
+        """Close the clients whose pool settings none of ``api_configs`` uses"""
+        wanted = {pool_options(api_config) for api_config in api_configs}
+        for options in [options for options in self._clients if options not in wanted]:
+            client = self._clients.pop(options)
+            if client in self._users:
+                self._retired.add(client)
+            else:
+                await client.aclose()
+            logger.info(f"关闭不再使用的异步连接池 (pool_size={options[0]})")
+
+    async def aclose(self):
+        clients = list(self._clients.values()) + list(self._retired)
+        self._clients.clear()
+        self._retired.clear()
+        for client in clients:
+            await client.aclose()
+
+    def stats(self):
+        return {"clients": len(self._clients), "retiring": len(self._retired)}
+
+
+class InflightLimiter:
+    """Global and per-host caps on concurrent upstream requests for async tools"""
+
+    def __init__(self, max_inflight=64, max_per_host=8):
+        self.max_inflight = max_inflight
+        self.max_per_host = max_per_host
+        self._global = asyncio.Semaphore(max_inflight)
+        self._hosts = {}
+        self._inflight = {}
+
+    @contextlib.asynccontextmanager
+    async def limit(self, url, timeout=None):
+        """Hold a slot for ``url``; waiting longer than ``timeout`` seconds raises TimeoutError"""
+        host = urlsplit(url).netloc.lower()
+        host_sem = self._hosts.get(host)
+        if host_sem is None:
+            host_sem = self._hosts[host] = asyncio.Semaphore(self.max_per_host)
+        give_up = None if timeout is None else time.monotonic() + timeout
+        # wait for the host slot before taking a global one, so callers queued behind a
+        # saturated host do not hold global slots and starve requests to other hosts
+        await self._acquire(host_sem, give_up)
+        try:
+            await self._acquire(self._global, give_up)
+        except BaseException:
+            host_sem.release()
+            raise
+        self._inflight[host] = self._inflight.get(host, 0) + 1
+        try:
+            yield
+        finally:
+            self._inflight[host] -= 1
+            self._global.release()
+            host_sem.release()
+
+    @staticmethod
+    async def _acquire(semaphore, give_up):
+        if give_up is None:
+            await semaphore.acquire()
+        else:
+            await asyncio.wait_for(semaphore.acquire(), give_up - time.monotonic())
+
+    def stats(self):
+        return {
+            "max_inflight": self.max_inflight,
+            "max_per_host": self.max_per_host,
+            "inflight": {host: n for host, n in self._inflight.items() if n},
+        }
@@ -0,0 +1,118 @@
+"""
+Non-blocking logging shared by universal_mcp_tool.py and mcp_pipe.py.
+
+``setup_logging`` installs a ``QueueHandler`` on the root logger and moves the
+file/terminal handlers onto a background ``QueueListener``, so a log call on
+the hot path only enqueues the record.  Message formatting happens in the
+listener thread, where ``RedactingFormatter`` also masks secrets (registered
+API keys, bearer tokens, ``token=``/``api_key=`` query values) and truncates
+oversized messages.  Wrap large payloads in ``brief`` so even the deferred
+formatting is bounded.  The per-request INFO lines of ``httpx``/``httpcore``
+are silenced so they neither bypass the tool's log sampling nor fill the queue.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import re
+import reprlib
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DEFAULT_MAX_CHARS = 4000
+DEFAULT_QUEUE_SIZE = 10000
+# HTTP client libraries that log every request at INFO; the tool logs its requests itself, sampled
+QUIET_LOGGERS = ("httpx", "httpcore")
+
+_SECRET_PATTERNS = [
+    (re.compile(r'(?i)(bearer\s+)[^\s\'",}]+'), r'\1***'),
+    (re.compile(r'(?i)([?&](?:token|access_token|api_?key|apikey|key|secret|password|sign)=)[^&\s\'"]+'), r'\1***'),
+    (re.compile(r'(?i)([\'"](?:authorization|x-api-key|api_?key|token|secret|password)[\'"]\s*:\s*[\'"])[^\'"]+'),
+     r'\1***'),
+]
+
+_brief_repr = reprlib.Repr()
+_brief_repr.maxlevel = 4
+_brief_repr.maxdict = 20
+_brief_repr.maxlist = 20
+_brief_repr.maxstring = 300
+_brief_repr.maxother = 300
+
+
+class brief:
+    """Lazily rendered, size-bounded repr of a payload for log arguments"""
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        return _brief_repr.repr(self.obj)
+
+    __repr__ = __str__
+
+
+class RedactingFormatter(logging.Formatter):
+    def __init__(self, fmt=DEFAULT_FORMAT, max_chars=DEFAULT_MAX_CHARS):
+        super().__init__(fmt)
+        self.max_chars = max_chars
+        self.secrets = set()
+
+    def formatMessage(self, record):
+        if len(record.message) > self.max_chars:
+            record.message = (f"{record.message[:self.max_chars]}"
+                              f"... [truncated {len(record.message) - self.max_chars} chars]")
+        return super().formatMessage(record)
+
+    def format(self, record):
+        text = super().format(record)
+        for secret in tuple(self.secrets):
+            text = text.replace(secret, "***")
+        for pattern, replacement in _SECRET_PATTERNS:
+            text = pattern.sub(replacement, text)
+        return text
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records without formatting them and drop records when the queue is full"""
+
+    dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DeferredQueueHandler.dropped += 1
+
+
+_formatter = RedactingFormatter()
+
+
+def add_secret(secret):
+    """Mask every occurrence of ``secret`` in formatted log output"""
+    if secret and len(secret) >= 4:
+        _formatter.secrets.add(secret)
+
+
+def setup_logging(log_file, level=logging.INFO, max_chars=DEFAULT_MAX_CHARS, queue_size=DEFAULT_QUEUE_SIZE):
+    """Route all logging through a bounded queue to a file and the terminal (stderr)"""
+    _formatter.max_chars = max_chars
+    handlers = [logging.FileHandler(log_file, encoding='utf-8'), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(_formatter)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(max(level, logging.WARNING))
+    return listener
@@ -7,155 +7,751 @@ Usage:
 export MCP_ENDPOINT=<mcp_endpoint>
 python mcp_pipe.py <mcp_script>
 
+Supervisor mode (many endpoint/script pairs in one process):
+
+python mcp_pipe.py --config pipes.json
+
 """
 
 
 from config_manager import load_config
+from log_utils import setup_logging, DEFAULT_MAX_CHARS
+from pipe_metrics import RPCMetrics, render_prometheus, serve_metrics, write_snapshot
 import os
 import sys
 import logging
 import argparse
 
 config = load_config()
-# 设置 MCP_ENDPOINT 环境变量
-# 如果通过命令行传递了MCP_ENDPOINT，则优先使用命令行的值
-if "MCP_ENDPOINT" not in os.environ:
-    os.environ["MCP_ENDPOINT"] = config["MCP_ENDPOINT"]
-    
 
 import asyncio
+import collections
+import functools
+import inspect
+import json
+import re
+import time
 import websockets
-import subprocess
+from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory
 import signal
 import random
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("mcp_pipe.log", encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger('MCP_PIPE')
 
+def setup():
+    """Process-wide setup when run as a script; importing the module has no side effects"""
+    # 设置 MCP_ENDPOINT 环境变量
+    # 如果通过命令行传递了MCP_ENDPOINT，则优先使用命令行的值
+    if "MCP_ENDPOINT" not in os.environ and config.get("MCP_ENDPOINT"):
+        os.environ["MCP_ENDPOINT"] = config["MCP_ENDPOINT"]
+
+    # Load environment variables from .env file
+    load_dotenv()
+
+    # Configure logging (queue-based, endpoint tokens redacted)
+    setup_logging("mcp_pipe.log", max_chars=int(config.get("LOG_MAX_CHARS", DEFAULT_MAX_CHARS)))
+
 # Reconnection settings
 INITIAL_BACKOFF = 1  # Initial wait time in seconds
 MAX_BACKOFF = 600  # Maximum wait time in seconds
-reconnect_attempt = 0
-backoff = INITIAL_BACKOFF
 
-async def connect_with_retry(uri):
-    """Connect to WebSocket server with retry mechanism"""
-    global reconnect_attempt, backoff
-    while True:  # Infinite reconnection
+# Keepalive and link health: one ping per interval (0 disables), the link is
+# replaced on a ping timeout or when RTT stays above the threshold for
+# RTT_DEGRADED_COUNT pings in a row
+PING_INTERVAL = float(config.get("PIPE_PING_INTERVAL", 20))
+PING_TIMEOUT = float(config.get("PIPE_PING_TIMEOUT", 20))
+RTT_DEGRADED_MS = float(config.get("PIPE_RTT_DEGRADED_MS", 5000))  # 0 disables RTT checks
+RTT_DEGRADED_COUNT = int(config.get("PIPE_RTT_DEGRADED_COUNT", 3))
+# Open the replacement connection before closing a degraded one (needs a persistent child)
+MAKE_BEFORE_BREAK = bool(config.get("PIPE_MAKE_BEFORE_BREAK", False))
+# A connection that stayed up this long gets an immediate first retry when it drops
+STABLE_CONNECTION_SECONDS = float(config.get("PIPE_STABLE_SECONDS", 10))
+CLOSE_TIMEOUT = 5  # Longest wait for a closing handshake on a connection being replaced
+
+# Supervisor mode: how often per-pair stats are logged (0 disables)
+STATS_INTERVAL = float(config.get("PIPE_STATS_INTERVAL", 60))
+
+# JSON-RPC metrics: Prometheus text on http://METRICS_HOST:METRICS_PORT/metrics (0 disables)
+# and/or a JSON snapshot rewritten every METRICS_INTERVAL seconds (empty path disables)
+METRICS_PORT = int(config.get("PIPE_METRICS_PORT", 0))
+METRICS_HOST = config.get("PIPE_METRICS_HOST", "127.0.0.1")
+METRICS_FILE = config.get("PIPE_METRICS_FILE", "")
+METRICS_INTERVAL = float(config.get("PIPE_METRICS_INTERVAL", 15))
+# JSON-RPC lines are only parsed when an exporter is configured
+METRICS_ENABLED = bool(METRICS_PORT or METRICS_FILE)
+
+# Longest JSON-RPC line accepted from the child process; longer lines are dropped and
+# answered with a JSON-RPC error when their request id can be recovered
+MAX_LINE_BYTES = int(config.get("PIPE_MAX_LINE_BYTES", 16 * 1024 * 1024))
+
+# WebSocket transport: permessage-deflate ("deflate" or "none") with its zlib level and
+# window bits, the largest incoming message (0 for no limit) and the write buffer size
+# above which sends wait for the network to drain
+WS_COMPRESSION = config.get("PIPE_WS_COMPRESSION", "deflate")
+WS_COMPRESSION_LEVEL = int(config.get("PIPE_WS_COMPRESSION_LEVEL", 6))
+WS_MAX_WINDOW_BITS = int(config.get("PIPE_WS_MAX_WINDOW_BITS", 15))
+WS_MAX_SIZE = int(config.get("PIPE_WS_MAX_SIZE", MAX_LINE_BYTES))
+WS_WRITE_LIMIT = int(config.get("PIPE_WS_WRITE_LIMIT", 64 * 1024))
+
+# Persistent child mode: keep the MCP child alive across WebSocket reconnects
+PERSISTENT_CHILD = bool(config.get("PIPE_PERSISTENT_CHILD", False))
+BUFFER_MAX_MESSAGES = int(config.get("PIPE_BUFFER_MAX_MESSAGES", 1000))  # child output kept while disconnected
+BUFFER_TTL = float(config.get("PIPE_BUFFER_TTL", 30))  # seconds buffered output stays deliverable
+CHILD_RESTART_DELAY = 1  # Initial wait before restarting a crashed child
+CHILD_MAX_RESTART_DELAY = 60
+CHILD_STABLE_SECONDS = 60  # A child that ran this long restarts the backoff sequence when it exits
+
+class MCPChild:
+    """MCP child process owned independently of any WebSocket connection
+
+    Output produced while no WebSocket is attached (e.g. responses still in
+    flight during a reconnect) is buffered and flushed to the next connection.
+    The child is restarted only when it actually exits, after a backoff; the
+    attached connection is then closed so the endpoint reconnects and runs the
+    MCP initialize handshake again with the new process.
+    """
+
+    def __init__(self, script, buffer_max=BUFFER_MAX_MESSAGES, buffer_ttl=BUFFER_TTL):
+        self.script = script
+        self.buffer_max = buffer_max
+        self.buffer_ttl = buffer_ttl
+        self.process = None
+        self.websocket = None
+        self.buffer = collections.deque()  # (buffered_at, line)
+        self.restarts = 0
+        self.dropped = 0
+        self.stats = None  # PipeStats of the owning session, if any
+        self._tasks = []
+        self._stopping = False
+        self._start_lock = asyncio.Lock()
+        self._started_at = 0.0
+        self._restart_at = 0.0  # no start before this time (crash backoff)
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def ensure_running(self):
+        async with self._start_lock:
+            if not self.running:
+                wait = self._restart_at - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self.process = await start_mcp_process(self.script)
+                self._started_at = time.monotonic()
+                logger.info(f"Started {self.script} process (pid {self.process.pid})")
+                pump = asyncio.create_task(self._pump_stdout(self.process))
+                pump.add_done_callback(functools.partial(self._pump_done, self.process))
+                self._tasks = [pump, asyncio.create_task(pipe_process_stderr_to_terminal(self.process))]
+
+    async def _pump_stdout(self, process):
+        """Forward child stdout to the attached WebSocket, buffering while detached"""
+        while True:
+            try:
+                data = await read_line(process.stdout)
+            except LineTooLong as e:
+                logger.error(f"Dropped output of {self.script}: {e}")
+                data = oversize_reply(e)
+                if data is not None:
+                    await self._deliver(data)
+                continue
+            if not data:
+                break
+            await self._deliver(data)
+        await self._restart(process)
+
+    def _pump_done(self, process, task):
+        if task.cancelled() or task.exception() is None or self._stopping:
+            return
+        # Nothing reads the child's output any more: replace the child rather than hang every call
+        logger.error(f"Output pump of {self.script} failed: {task.exception()!r}, restarting it")
+        recovery = asyncio.create_task(self._recover(process))
+        recovery.add_done_callback(functools.partial(self._pump_done, process))
+        self._tasks.append(recovery)
+
+    async def _recover(self, process):
+        await terminate_process(process)
+        await self._restart(process)
+
+    async def _restart(self, process):
+        returncode = await process.wait()
+        if self.stats is not None and self.stats.rpc is not None:
+            self.stats.rpc.abandon_all()  # requests the dead child never answered
+        if self._stopping:
+            return
+        if time.monotonic() - self._started_at >= CHILD_STABLE_SECONDS:
+            self.restarts = 0
+        self.restarts += 1
+        delay = min(CHILD_RESTART_DELAY * 2 ** (self.restarts - 1), CHILD_MAX_RESTART_DELAY)
+        self._restart_at = time.monotonic() + delay
+        logger.warning(f"{self.script} exited with code {returncode}, restarting in {delay}s")
+        # The endpoint's MCP session lived in the dead process: drop its output and the
+        # connection, so the endpoint reconnects and initializes the new process
+        self.dropped += len(self.buffer)
+        self.buffer.clear()
+        websocket = self.websocket
+        if websocket is not None:
+            self.websocket = None
+            await close_quietly(websocket, 1012, "MCP server restarted")
+        if not self._stopping:
+            await self.ensure_running()
+
+    async def _deliver(self, data):
+        logger.debug(">> %.120r...", data)
+        websocket = self.websocket
+        if websocket is not None:
+            try:
+                await send_text(websocket, data)
+                if self.stats is not None:
+                    self.stats.count_out(data)
+                return
+            except Exception as e:
+                logger.warning(f"WebSocket send failed, buffering child output: {e}")
+                self.detach(websocket)
+        self.buffer.append((time.monotonic(), data))
+        while len(self.buffer) > self.buffer_max:
+            self.buffer.popleft()
+            self.dropped += 1
+
+    async def attach(self, websocket):
+        """Make `websocket` the destination of child output, flushing what was buffered"""
+        await self.ensure_running()
+        flushed = 0
+        while self.buffer:
+            buffered_at, data = self.buffer.popleft()
+            if time.monotonic() - buffered_at > self.buffer_ttl:
+                self.dropped += 1
+                continue
+            await send_text(websocket, data)
+            if self.stats is not None:
+                self.stats.count_out(data)
+            flushed += 1
+        self.websocket = websocket
+        if flushed:
+            logger.info(f"Flushed {flushed} buffered message(s) to the new connection")
+
+    def detach(self, websocket):
+        if self.websocket is websocket:
+            self.websocket = None
+
+    async def write(self, data):
+        await self.ensure_running()
+        self.process.stdin.write(data + b'\n')
+        await self.process.stdin.drain()
+
+    async def stop(self):
+        self._stopping = True
+        self.websocket = None
+        for task in self._tasks:
+            task.cancel()
+        if self.process is not None:
+            logger.info(f"Terminating {self.script} process")
+            await terminate_process(self.process)
+            logger.info(f"{self.script} process terminated")
+
+async def pipe_websocket_to_child(websocket, child, stats=None):
+    """Read data from WebSocket and write to the persistent child's stdin"""
+    try:
+        while True:
+            message = await recv_bytes(websocket)
+            logger.debug("<< %.120r...", message)
+            if stats is not None:
+                stats.count_in(message)
+            await child.write(message)
+    except Exception as e:
+        logger.error(f"Error in WebSocket to process pipe: {e}")
+        raise  # Re-throw exception to trigger reconnection
+
+class PipeStats:
+    """Traffic and connection counters for one endpoint/script pair"""
+
+    COUNTERS = ("connects", "disconnects", "replacements", "messages_in", "messages_out",
+                "bytes_in", "bytes_out", "rtt_ms", "last_error", "connected_at")
+    __slots__ = COUNTERS + ("rpc",)
+
+    def __init__(self, rpc_metrics=METRICS_ENABLED):
+        self.connects = 0
+        self.disconnects = 0
+        self.replacements = 0  # degraded links swapped make-before-break
+        self.messages_in = 0  # WebSocket -> child
+        self.messages_out = 0  # child -> WebSocket
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.rtt_ms = None  # last keepalive round trip
+        self.last_error = None
+        self.connected_at = None
+        # Per-tool latency/error metrics from the JSON-RPC traffic
+        self.rpc = RPCMetrics() if rpc_metrics else None
+
+    def count_in(self, data):
+        self.messages_in += 1
+        self.bytes_in += len(data)
+        if self.rpc is not None:
+            self.rpc.request(data)
+
+    def count_out(self, data):
+        self.messages_out += 1
+        self.bytes_out += len(data)
+        if self.rpc is not None:
+            self.rpc.response(data)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.COUNTERS}
+
+class LinkDegraded(ConnectionError):
+    """The health monitor gave up on a connection"""
+
+class PipeSession:
+    """One endpoint/script pair with its own reconnect state, child and stats"""
+
+    def __init__(self, endpoint, script, name=None, persistent_child=PERSISTENT_CHILD,
+                 make_before_break=MAKE_BEFORE_BREAK, ping_interval=PING_INTERVAL,
+                 ping_timeout=PING_TIMEOUT, rtt_degraded_ms=RTT_DEGRADED_MS):
+        self.endpoint = endpoint
+        self.script = script
+        self.name = name or os.path.splitext(os.path.basename(script))[0]
+        self.stats = PipeStats()
+        self.reconnect_attempt = 0
+        self.backoff = INITIAL_BACKOFF
+        self.make_before_break = make_before_break
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.rtt_degraded_ms = rtt_degraded_ms
+        self._connected_since = None
+        # Make-before-break hands the running child to the replacement connection
+        self.child = MCPChild(script) if persistent_child or make_before_break else None
+        if self.child is not None:
+            self.child.stats = self.stats
+
+    async def run(self):
+        """Keep the pair connected until cancelled"""
         try:
-            if reconnect_attempt > 0:
-                wait_time = backoff * (1 + random.random() * 0.1)  # Add some random jitter
-                logger.info(f"Waiting {wait_time:.2f} seconds before reconnection attempt {reconnect_attempt}...")
-                await asyncio.sleep(wait_time)
-                
-            # Attempt to connect
-            await connect_to_server(uri)
-        
+            await self.connect_with_retry()
+        finally:
+            if self.child is not None:
+                await self.child.stop()
+
+    async def connect_with_retry(self):
+        """Connect to WebSocket server with retry mechanism"""
+        while True:  # Infinite reconnection
+            try:
+                if self.reconnect_attempt > 1:
+                    wait_time = self.backoff * (1 + random.random() * 0.1)  # Add some random jitter
+                    logger.info(f"[{self.name}] Waiting {wait_time:.2f} seconds before reconnection attempt {self.reconnect_attempt}...")
+                    await asyncio.sleep(wait_time)
+                    # Calculate wait time for next reconnection (exponential backoff)
+                    self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+                elif self.reconnect_attempt == 1:
+                    logger.info(f"[{self.name}] Reconnecting immediately")
+                    
+                # Attempt to connect
+                await self.connect()
+            
+            except Exception as e:
+                self.stats.last_error = str(e)
+                logger.warning(f"[{self.name}] Connection closed: {e}")
+            finally:
+                self._disconnected()
+
+    def _disconnected(self):
+        if self.stats.connected_at is not None:
+            self.stats.disconnects += 1
+            self.stats.connected_at = None
+        # Only a connection that stayed up restarts the sequence with an immediate retry;
+        # one that keeps dropping right after connecting stays on the backoff
+        if self._connected_since is not None and time.monotonic() - self._connected_since >= STABLE_CONNECTION_SECONDS:
+            self.reconnect_attempt = 0
+            self.backoff = INITIAL_BACKOFF
+        self._connected_since = None
+        self.reconnect_attempt += 1
+
+    async def _open(self):
+        logger.info(f"[{self.name}] Connecting to WebSocket server: {self.endpoint}")
+        # Keepalive pings are sent by _monitor, which also measures RTT
+        websocket = await websockets.connect(self.endpoint, ping_interval=None, **websocket_options())
+        logger.info(f"[{self.name}] Successfully connected to WebSocket server")
+        self.stats.connects += 1
+        self.stats.connected_at = time.time()
+        self._connected_since = time.monotonic()
+        return websocket
+
+    async def connect(self):
+        """Connect to WebSocket server and establish bidirectional communication with the script"""
+        websocket = await self._open()
+        try:
+            if self.child is not None:
+                # Persistent child: reuse the running process across connections
+                await self.child.attach(websocket)
+                while True:
+                    websocket = await self._serve_child(websocket)
+            else:
+                await self._serve_process(websocket)
+        except websockets.exceptions.ConnectionClosed as e:
+            logger.error(f"[{self.name}] WebSocket connection closed: {e}")
+            raise  # Re-throw exception to trigger reconnection
         except Exception as e:
-            reconnect_attempt += 1
-            logger.warning(f"Connection closed (attempt: {reconnect_attempt}): {e}")            
-            # Calculate wait time for next reconnection (exponential backoff)
-            backoff = min(backoff * 2, MAX_BACKOFF)
-
-async def connect_to_server(uri):
-    """Connect to WebSocket server and establish bidirectional communication with `mcp_script`"""
-    global reconnect_attempt, backoff
+            logger.error(f"[{self.name}] Connection error: {e}")
+            raise  # Re-throw exception
+        finally:
+            if self.child is not None:
+                self.child.detach(websocket)
+            await close_quietly(websocket)
+
+    async def _serve_child(self, websocket):
+        """Pipe `websocket` into the persistent child; return its replacement when the link degrades"""
+        reader = asyncio.create_task(pipe_websocket_to_child(websocket, self.child, self.stats))
+        try:
+            reason = await self._watch(websocket, reader)
+            if reason is None:
+                raise ConnectionError("WebSocket reader stopped")
+            logger.warning(f"[{self.name}] Link degraded: {reason}")
+
+            # The degraded link keeps feeding the child until the replacement has taken over
+            replacement = None
+            if self.make_before_break:
+                try:
+                    replacement = await self._open()
+                except Exception as e:
+                    logger.warning(f"[{self.name}] Replacement connection failed: {e}")
+            if replacement is None:
+                raise LinkDegraded(reason)
+            try:
+                # Responses go to the new link from here on
+                await self.child.attach(replacement)
+            except BaseException:
+                await close_quietly(replacement)
+                raise
+        finally:
+            if not reader.done():
+                reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+        await close_quietly(websocket)
+        self.stats.replacements += 1
+        logger.info(f"[{self.name}] Switched to the replacement connection")
+        return replacement
+
+    async def _serve_process(self, websocket):
+        """Run a fresh child for the lifetime of `websocket`"""
+        # Start the script process with binary asyncio pipes
+        process = await start_mcp_process(self.script)
+        logger.info(f"[{self.name}] Started {self.script} process")
+        
+        # Create two tasks: read from WebSocket and write to process, read from process and write to WebSocket
+        pipes = asyncio.gather(
+            pipe_websocket_to_process(websocket, process, self.stats),
+            pipe_process_to_websocket(process, websocket, self.stats),
+            pipe_process_stderr_to_terminal(process)
+        )
+        try:
+            reason = await self._watch(websocket, pipes)
+            if reason is not None:
+                raise LinkDegraded(reason)
+        finally:
+            if not pipes.done():
+                pipes.cancel()
+                await asyncio.gather(pipes, return_exceptions=True)
+            if self.stats.rpc is not None:
+                self.stats.rpc.abandon_all()  # this process is going away with its pending requests
+            # Ensure the child process is properly terminated
+            logger.info(f"[{self.name}] Terminating {self.script} process")
+            await terminate_process(process)
+            logger.info(f"[{self.name}] {self.script} process terminated")
+
+    async def _watch(self, websocket, work):
+        """Wait for `work`; return a reason instead if the link goes unhealthy first"""
+        if self.ping_interval <= 0:
+            await work
+            return None
+        monitor = asyncio.create_task(self._monitor(websocket))
+        try:
+            done, _ = await asyncio.wait({work, monitor}, return_when=asyncio.FIRST_COMPLETED)
+            if work in done:
+                work.result()
+                return None
+            return monitor.result()
+        finally:
+            monitor.cancel()
+
+    async def _monitor(self, websocket):
+        """Ping every `ping_interval`; return why the link should be replaced"""
+        slow = 0
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            started = time.perf_counter()
+            pong_waiter = await websocket.ping()
+            try:
+                await asyncio.wait_for(pong_waiter, self.ping_timeout)
+            except asyncio.TimeoutError:
+                return f"keepalive ping timeout ({self.ping_timeout:g}s)"
+            rtt_ms = (time.perf_counter() - started) * 1000
+            self.stats.rtt_ms = round(rtt_ms, 1)
+            slow = slow + 1 if self.rtt_degraded_ms > 0 and rtt_ms > self.rtt_degraded_ms else 0
+            if slow >= RTT_DEGRADED_COUNT:
+                return f"RTT {rtt_ms:.0f}ms above {self.rtt_degraded_ms:g}ms for {slow} pings"
+
+    def snapshot(self):
+        snapshot = {
+            "name": self.name,
+            "script": self.script,
+            "connected": self.stats.connected_at is not None,
+            "reconnect_attempt": self.reconnect_attempt,
+        }
+        snapshot.update(self.stats.as_dict())
+        if self.child is not None:
+            snapshot.update(child_restarts=self.child.restarts,
+                            buffered=len(self.child.buffer),
+                            buffer_dropped=self.child.dropped)
+        return snapshot
+
+def websocket_options(compression=None, level=None, window_bits=None, max_size=None, write_limit=None):
+    """Keyword arguments for websockets.connect; unset arguments come from the PIPE_WS_* settings"""
+    compression = WS_COMPRESSION if compression is None else compression
+    level = WS_COMPRESSION_LEVEL if level is None else level
+    window_bits = WS_MAX_WINDOW_BITS if window_bits is None else window_bits
+    max_size = WS_MAX_SIZE if max_size is None else max_size
+    options = {
+        "max_size": max_size or None,
+        "write_limit": WS_WRITE_LIMIT if write_limit is None else write_limit,
+        "compression": None,
+    }
+    if compression == "deflate":
+        # Offered explicitly so the level and window apply to what we send (tool results);
+        # a server that does not support the extension just declines it
+        options["extensions"] = [ClientPerMessageDeflateFactory(
+            client_max_window_bits=True if window_bits >= 15 else window_bits,
+            compress_settings={"memLevel": 5, "level": level},
+        )]
+    elif compression not in ("none", "", None):
+        raise ValueError(f"Unknown PIPE_WS_COMPRESSION: {compression!r}")
+    return options
+
+
+async def close_quietly(websocket, code=1000, reason=""):
+    """Close a WebSocket without waiting long on a dead link"""
     try:
-        logger.info(f"Connecting to WebSocket server: {uri}")
-        async with websockets.connect(uri) as websocket:
-            logger.info(f"Successfully connected to WebSocket server")
-            
-            # Reset reconnection counter if connection closes normally
-            reconnect_attempt = 0
-            backoff = INITIAL_BACKOFF
-            
-            # Start mcp_script process
-            process = subprocess.Popen(
-                ['python', mcp_script],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                encoding='utf-8',  # Add encoding parameter
-                errors='replace'   # Handle decoding errors gracefully
-            )
-            logger.info(f"Started {mcp_script} process")
-            
-            # Create two tasks: read from WebSocket and write to process, read from process and write to WebSocket
-            await asyncio.gather(
-                pipe_websocket_to_process(websocket, process),
-                pipe_process_to_websocket(process, websocket),
-                pipe_process_stderr_to_terminal(process)
-            )
-    except websockets.exceptions.ConnectionClosed as e:
-        logger.error(f"WebSocket connection closed: {e}")
-        raise  # Re-throw exception to trigger reconnection
-    except Exception as e:
-        logger.error(f"Connection error: {e}")
-        raise  # Re-throw exception
+        await asyncio.wait_for(websocket.close(code, reason), CLOSE_TIMEOUT)
+    except Exception:
+        pass
+
+async def run_pipe(uri, script, persistent_child=PERSISTENT_CHILD, make_before_break=MAKE_BEFORE_BREAK):
+    """Run a single endpoint/script pair until cancelled"""
+    session = PipeSession(uri, script, persistent_child=persistent_child, make_before_break=make_before_break)
+    await run_supervisor([session], stats_interval=0)
+
+def load_pipe_config(path):
+    """Read a supervisor config file into PipeSessions
+
+    Format: {"stats_interval": 60, "pipes": [{"script": "...", "endpoint": "...",
+    "name": "...", "persistent_child": true, "make_before_break": false}, ...]}.  ``endpoint`` defaults to
+    MCP_ENDPOINT; relative script paths are resolved against the config file.
+    Returns ``(sessions, stats_interval)``.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {"pipes": data}
+    base_dir = os.path.dirname(os.path.abspath(path))
+    sessions = []
+    names = set()
+    for entry in data.get("pipes", []):
+        script = entry.get("script")
+        if not script:
+            raise ValueError(f"Pipe entry without script: {entry}")
+        script = os.path.join(base_dir, script)
+        endpoint = entry.get("endpoint") or os.environ.get("MCP_ENDPOINT")
+        if not endpoint:
+            raise ValueError(f"No endpoint for {script} and MCP_ENDPOINT is not set")
+        session = PipeSession(endpoint, script, name=entry.get("name"),
+                              persistent_child=bool(entry.get("persistent_child", PERSISTENT_CHILD)),
+                              make_before_break=bool(entry.get("make_before_break", MAKE_BEFORE_BREAK)))
+        if session.name in names:
+            raise ValueError(f"Duplicate pipe name: {session.name}")
+        names.add(session.name)
+        sessions.append(session)
+    if not sessions:
+        raise ValueError(f"No pipes configured in {path}")
+    return sessions, float(data.get("stats_interval", STATS_INTERVAL))
+
+async def report_stats(sessions, interval):
+    """Log a stats line per pair every `interval` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        for session in sessions:
+            logger.info(f"[{session.name}] stats: {json.dumps(session.snapshot(), ensure_ascii=False)}")
+
+def render_metrics(sessions):
+    return render_prometheus((s.name, s.snapshot(), s.stats.rpc) for s in sessions)
+
+def metrics_snapshot(sessions):
+    return {
+        "time": time.time(),
+        "pipes": {s.name: dict(s.snapshot(), rpc=s.stats.rpc.snapshot()) for s in sessions},
+    }
+
+async def write_metrics(sessions, path, interval):
+    """Rewrite the metrics snapshot file every `interval` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            write_snapshot(path, metrics_snapshot(sessions))
+        except OSError as e:
+            logger.warning(f"Failed to write metrics snapshot {path}: {e}")
+
+async def run_supervisor(sessions, stats_interval=STATS_INTERVAL):
+    """Run every pair concurrently in this process, each reconnecting independently"""
+    tasks = [asyncio.create_task(session.run()) for session in sessions]
+    if stats_interval > 0:
+        tasks.append(asyncio.create_task(report_stats(sessions, stats_interval)))
+    if METRICS_FILE:
+        tasks.append(asyncio.create_task(write_metrics(sessions, METRICS_FILE, METRICS_INTERVAL)))
+    server = None
+    if METRICS_PORT:
+        server = await serve_metrics(lambda: render_metrics(sessions), METRICS_HOST, METRICS_PORT)
+        logger.info(f"Serving metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    logger.info(f"Supervising {len(sessions)} pipe(s): {', '.join(s.name for s in sessions)}")
+    try:
+        await asyncio.gather(*tasks)
     finally:
-        # Ensure the child process is properly terminated
-        if 'process' in locals():
-            logger.info(f"Terminating {mcp_script} process")
-            try:
-                process.terminate()
-                process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                process.kill()
-            logger.info(f"{mcp_script} process terminated")
+        if server is not None:
+            server.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def start_mcp_process(script):
+    """Start `script` with the current interpreter, wired to binary asyncio pipes"""
+    return await asyncio.create_subprocess_exec(
+        sys.executable, script,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        limit=MAX_LINE_BYTES,
+    )
+
+async def terminate_process(process, timeout=5):
+    """Terminate the child process, killing it if it does not exit within `timeout` seconds"""
+    if process.returncode is not None:
+        return
+    try:
+        process.terminate()
+        await asyncio.wait_for(process.wait(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+    except ProcessLookupError:
+        pass
+
+class LineTooLong(Exception):
+    """A child output line exceeded MAX_LINE_BYTES; it was read and discarded"""
+
+    def __init__(self, size, head):
+        super().__init__(f"line of {size} bytes exceeds the {MAX_LINE_BYTES}-byte limit")
+        self.size = size
+        self.head = head  # first bytes of the line, to recover a JSON-RPC id
+
+async def read_line(stream):
+    """Read one line like StreamReader.readline, but consume an oversize line and raise LineTooLong"""
+    try:
+        return await stream.readuntil(b'\n')
+    except asyncio.IncompleteReadError as e:
+        return e.partial  # EOF
+    except asyncio.LimitOverrunError as e:
+        head = await stream.readexactly(min(e.consumed, 256))
+    size = len(head)
+    while True:
+        try:
+            size += len(await stream.readuntil(b'\n'))
+            break
+        except asyncio.IncompleteReadError as e:
+            size += len(e.partial)
+            break
+        except asyncio.LimitOverrunError as e:
+            size += len(await stream.readexactly(e.consumed))
+    raise LineTooLong(size, head)
+
+# The id of a JSON-RPC message as the MCP SDK serializes it (first or after "jsonrpc")
+_RPC_ID = re.compile(rb'\{\s*(?:"jsonrpc"\s*:\s*"2\.0"\s*,\s*)?"id"\s*:\s*("(?:[^"\\]|\\.)*"|-?\d+)\s*,')
+
+def oversize_reply(error):
+    """JSON-RPC error answering the request whose response was too long, or None without an id"""
+    match = _RPC_ID.match(error.head)
+    if match is None:
+        return None
+    reply = {"jsonrpc": "2.0", "id": json.loads(match.group(1)),
+             "error": {"code": -32603, "message": f"Response too large: {error}"}}
+    return json.dumps(reply).encode('utf-8') + b'\n'
+
+@functools.lru_cache(maxsize=None)
+def _accepts_keyword(func, name):
+    try:
+        return name in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+
+async def recv_bytes(websocket):
+    """Receive the next message as UTF-8 bytes, without a decode round-trip when websockets supports it"""
+    if _accepts_keyword(type(websocket).recv, 'decode'):
+        message = await websocket.recv(decode=False)
+    else:
+        message = await websocket.recv()
+    return message.encode('utf-8') if isinstance(message, str) else message
 
-async def pipe_websocket_to_process(websocket, process):
+async def send_text(websocket, data):
+    """Send UTF-8 bytes as a text frame, without a decode round-trip when websockets supports it"""
+    if _accepts_keyword(type(websocket).send, 'text'):
+        await websocket.send(data, text=True)
+    else:
+        await websocket.send(data.decode('utf-8', errors='replace'))
+
+async def pipe_websocket_to_process(websocket, process, stats=None):
     """Read data from WebSocket and write to process stdin"""
     try:
         while True:
             # Read message from WebSocket
-            message = await websocket.recv()
-            logger.debug(f"<< {message[:120]}...")
+            message = await recv_bytes(websocket)
+            logger.debug("<< %.120r...", message)
+            if stats is not None:
+                stats.count_in(message)
             
-            # Write to process stdin (in text mode)
-            if isinstance(message, bytes):
-                message = message.decode('utf-8')
-            process.stdin.write(message + '\n')
-            process.stdin.flush()
+            # Write to process stdin; drain() applies backpressure when the child falls behind
+            process.stdin.write(message + b'\n')
+            await process.stdin.drain()
     except Exception as e:
         logger.error(f"Error in WebSocket to process pipe: {e}")
         raise  # Re-throw exception to trigger reconnection
     finally:
         # Close process stdin
-        if not process.stdin.closed:
+        if not process.stdin.is_closing():
             process.stdin.close()
 
-async def pipe_process_to_websocket(process, websocket):
+async def pipe_process_to_websocket(process, websocket, stats=None):
     """Read data from process stdout and send to WebSocket"""
     try:
         while True:
             # Read data from process stdout
-            data = await asyncio.get_event_loop().run_in_executor(
-                None, process.stdout.readline
-            )
+            try:
+                data = await read_line(process.stdout)
+            except LineTooLong as e:
+                # Drop the line instead of the session; answer the request when its id is known
+                logger.error(f"Dropped child output: {e}")
+                data = oversize_reply(e)
+                if data is None:
+                    continue
             
             if not data:
                 logger.info("Process has ended output")
                 break
                 
             # 新增日志转发功能
-            if data.startswith("[GUI_LOG]"):
-                await websocket.send(data)
+            if data.startswith(b"[GUI_LOG]"):
+                await send_text(websocket, data)
                 continue
                 
-            logger.debug(f">> {data[:120]}...")
-            await websocket.send(data)
+            logger.debug(">> %.120r...", data)
+            await send_text(websocket, data)
+            if stats is not None:
+                stats.count_out(data)
     except Exception as e:
         logger.error(f"Error in process to WebSocket pipe: {e}")
         raise  # Re-throw exception to trigger reconnection
@@ -165,16 +761,22 @@ async def pipe_process_stderr_to_terminal(process):
     try:
         while True:
             # Read data from process stderr
-            data = await asyncio.get_event_loop().run_in_executor(
-                None, process.stderr.readline
-            )
+            try:
+                data = await read_line(process.stderr)
+            except LineTooLong as e:
+                logger.warning(f"Dropped child stderr output: {e}")
+                continue
             
             if not data:  # If no data, the process may have ended
                 logger.info("Process has ended stderr output")
                 break
                 
-            # Print stderr data to terminal (in text mode, data is already a string)
-            sys.stderr.write(data)
+            # Print stderr data to terminal as raw bytes
+            stderr_buffer = getattr(sys.stderr, 'buffer', None)
+            if stderr_buffer is not None:
+                stderr_buffer.write(data)
+            else:
+                sys.stderr.write(data.decode('utf-8', errors='replace'))
             sys.stderr.flush()
     except Exception as e:
         logger.error(f"Error in process stderr pipe: {e}")
@@ -190,29 +792,52 @@ def signal_handler(sig, frame):
     sys.exit(0)
 
 if __name__ == "__main__":
+    setup()
+
     # Register signal handler
     signal.signal(signal.SIGINT, signal_handler)
     
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='MCP Pipe for connecting MCP scripts to WebSocket server')
-    parser.add_argument('mcp_script', help='Path to the MCP script to run')
+    parser.add_argument('mcp_script', nargs='?', help='Path to the MCP script to run')
     parser.add_argument('--endpoint', help='MCP WebSocket endpoint URL (overrides env variable)')
+    parser.add_argument('--config', help='Supervisor config file listing endpoint/script pairs to run in this process')
+    parser.add_argument('--persistent-child', action='store_true', default=PERSISTENT_CHILD,
+                        help='Keep the MCP script running across WebSocket reconnects')
+    parser.add_argument('--make-before-break', action='store_true', default=MAKE_BEFORE_BREAK,
+                        help='Open a replacement connection before closing a degraded one')
     args = parser.parse_args()
-    
-    # Set MCP script
-    mcp_script = args.mcp_script
-    
-    # Get endpoint URL from arguments or environment
-    endpoint_url = args.endpoint or os.environ.get('MCP_ENDPOINT')
-    if not endpoint_url:
-        logger.error("MCP_ENDPOINT not found. Please set the MCP_ENDPOINT environment variable or use --endpoint")
+
+    try:
+        websocket_options()
+    except ValueError as e:
+        logger.error(str(e))
         sys.exit(1)
     
-    logger.info(f"使用MCP端点: {endpoint_url}")
+    if args.config:
+        # Supervisor mode: all pairs come from the config file
+        try:
+            sessions, stats_interval = load_pipe_config(args.config)
+        except (OSError, ValueError) as e:
+            logger.error(f"Invalid supervisor config {args.config}: {e}")
+            sys.exit(1)
+        main_coro = run_supervisor(sessions, stats_interval)
+    else:
+        if not args.mcp_script:
+            parser.error("mcp_script is required unless --config is given")
+        
+        # Get endpoint URL from arguments or environment
+        endpoint_url = args.endpoint or os.environ.get('MCP_ENDPOINT')
+        if not endpoint_url:
+            logger.error("MCP_ENDPOINT not found. Please set the MCP_ENDPOINT environment variable or use --endpoint")
+            sys.exit(1)
+        
+        logger.info(f"使用MCP端点: {endpoint_url}")
+        main_coro = run_pipe(endpoint_url, args.mcp_script, args.persistent_child, args.make_before_break)
     
     # Start main loop
     try:
-        asyncio.run(connect_with_retry(endpoint_url))
+        asyncio.run(main_coro)
     except KeyboardInterrupt:
         logger.info("Program interrupted by user")
     except Exception as e:
@@ -0,0 +1,303 @@
+"""
+JSON-RPC aware metrics for mcp_pipe.py.
+
+``RPCMetrics`` watches the lines flowing through a pipe: requests coming from
+the WebSocket are parsed for their ``id``/``method`` (and the tool name of a
+``tools/call``), responses coming back from the child are matched by ``id``.
+Per tool it keeps a latency histogram, request/error/abandoned counters, the
+number of requests in flight and the bytes in each direction.
+
+Responses larger than ``FULL_PARSE_LIMIT`` are not decoded: the id is taken
+from the head of the line and errors are detected by substring, so a large
+tool result costs a memchr-style scan rather than a full ``json.loads``.
+
+``render_prometheus`` produces the Prometheus text exposition format,
+``serve_metrics`` serves it on a local HTTP port and ``write_snapshot``
+atomically writes the same data as JSON for setups without a scraper.
+"""
+
+import asyncio
+import bisect
+import json
+import os
+import re
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+FULL_PARSE_LIMIT = 64 * 1024
+MAX_PENDING = 10000  # unanswered requests tracked per pipe
+MAX_TOOLS = 500  # distinct tool labels per pipe; the rest are reported as "other"
+
+_HEAD_BYTES = 256
+_ID = re.compile(rb'"id"\s*:\s*("(?:[^"\\]|\\.)*"|-?\d+)')
+_ERROR = re.compile(rb'"error"\s*:\s*\{')
+_IS_ERROR = re.compile(rb'"isError"\s*:\s*true')
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(LATENCY_BUCKETS, value)
+        if index < len(LATENCY_BUCKETS):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            total += count
+            yield bound, total
+
+    def quantile(self, q):
+        """Upper bucket bound containing quantile ``q``
+
+        None without samples or when the quantile lies beyond the largest bucket.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+        return None
+
+
+class ToolMetrics:
+    __slots__ = ("requests", "errors", "abandoned", "inflight", "bytes_in", "bytes_out", "latency")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.abandoned = 0  # never answered (child exited or connection torn down)
+        self.inflight = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latency = Histogram()
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "abandoned": self.abandoned,
+            "inflight": self.inflight,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "latency_count": self.latency.count,
+            "latency_sum": round(self.latency.sum, 6),
+            "latency_p50": self.latency.quantile(0.5),
+            "latency_p95": self.latency.quantile(0.95),
+            "latency_p99": self.latency.quantile(0.99),
+        }
+
+
+def _decode(data):
+    if not data or data.lstrip()[:1] not in (b"{", b"["):
+        return None
+    try:
+        return json.loads(data)
+    except ValueError:
+        return None
+
+
+def _messages(value):
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, dict)]
+    return [value] if isinstance(value, dict) else []
+
+
+def _id_key(value):
+    return value if isinstance(value, (str, int)) and not isinstance(value, bool) else None
+
+
+class RPCMetrics:
+    """Request/response correlation and per-tool metrics for one pipe"""
+
+    def __init__(self):
+        self.tools = {}
+        self.pending = {}  # id -> (started, tool)
+        self.unmatched = 0  # responses whose request was not seen
+
+    def _tool(self, name):
+        tool = self.tools.get(name)
+        if tool is None:
+            if len(self.tools) >= MAX_TOOLS:
+                name = "other"
+                tool = self.tools.get(name)
+            if tool is None:
+                tool = self.tools[name] = ToolMetrics()
+        return tool
+
+    def request(self, data):
+        """Record a line sent to the child (WebSocket -> child)"""
+        messages = _messages(_decode(data))
+        if not messages:
+            return
+        share = len(data) // len(messages)
+        now = time.perf_counter()
+        for message in messages:
+            method = message.get("method")
+            if not isinstance(method, str):
+                continue  # a response to a request the child made
+            name = method
+            if method == "tools/call":
+                params = message.get("params")
+                if isinstance(params, dict) and isinstance(params.get("name"), str):
+                    name = params["name"]
+            tool = self._tool(name)
+            tool.bytes_in += share
+            key = _id_key(message.get("id"))
+            if key is None:
+                continue  # notification, nothing comes back
+            tool.requests += 1
+            tool.inflight += 1
+            if len(self.pending) >= MAX_PENDING:
+                self._abandon(next(iter(self.pending)))
+            self.pending[key] = (now, name)
+
+    def response(self, data):
+        """Record a line received from the child (child -> WebSocket)"""
+        if len(data) > FULL_PARSE_LIMIT:
+            match = _ID.search(data, 0, _HEAD_BYTES)
+            if match is None:
+                return
+            key = json.loads(match.group(1))
+            failed = bool(_ERROR.search(data, 0, _HEAD_BYTES) or _IS_ERROR.search(data))
+            self._complete(key, failed, len(data))
+            return
+        messages = _messages(_decode(data))
+        if not messages:
+            return
+        share = len(data) // len(messages)
+        for message in messages:
+            if "method" in message:
+                continue  # a request or notification from the child
+            result = message.get("result")
+            failed = "error" in message or (isinstance(result, dict) and result.get("isError") is True)
+            self._complete(_id_key(message.get("id")), failed, share)
+
+    def _complete(self, key, failed, size):
+        entry = self.pending.pop(key, None)
+        if entry is None:
+            self.unmatched += 1
+            return
+        started, name = entry
+        tool = self._tool(name)
+        tool.inflight -= 1
+        tool.bytes_out += size
+        if failed:
+            tool.errors += 1
+        tool.latency.observe(time.perf_counter() - started)
+
+    def _abandon(self, key):
+        started, name = self.pending.pop(key)
+        tool = self._tool(name)
+        tool.inflight -= 1
+        tool.abandoned += 1
+
+    def abandon_all(self):
+        """Give up on every unanswered request, e.g. when the child that held them exits"""
+        for key in list(self.pending):
+            self._abandon(key)
+
+    def snapshot(self):
+        return {
+            "inflight": len(self.pending),
+            "unmatched": self.unmatched,
+            "tools": {name: tool.as_dict() for name, tool in self.tools.items()},
+        }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+_TOOL_SERIES = (
+    ("requests", "counter", "mcp_pipe_requests_total", "JSON-RPC requests sent to the child"),
+    ("errors", "counter", "mcp_pipe_errors_total", "Responses carrying an error or isError result"),
+    ("abandoned", "counter", "mcp_pipe_abandoned_total", "Requests that never got a response"),
+    ("inflight", "gauge", "mcp_pipe_inflight", "Requests awaiting a response"),
+    ("bytes_in", "counter", "mcp_pipe_request_bytes_total", "Request bytes (WebSocket -> child)"),
+    ("bytes_out", "counter", "mcp_pipe_response_bytes_total", "Response bytes (child -> WebSocket)"),
+)
+
+
+def render_prometheus(pipes):
+    """Render ``(name, session_stats, rpc_metrics)`` triples in Prometheus text format
+
+    Numeric entries of ``session_stats`` become ``mcp_pipe_<key>`` gauges.
+    """
+    pipes = list(pipes)
+    lines = []
+    session_keys = sorted({key for _, stats, _ in pipes for key, value in stats.items()
+                           if isinstance(value, (int, float))})
+    for key in session_keys:
+        lines.append(f"# TYPE mcp_pipe_{key} gauge")
+        for name, stats, _ in pipes:
+            value = stats.get(key)
+            if isinstance(value, (int, float)):
+                lines.append(f"mcp_pipe_{key}{_labels(pipe=name)} {float(value):g}")
+
+    for attr, kind, metric, help_text in _TOOL_SERIES:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, _, rpc in pipes:
+            for tool_name, tool in rpc.tools.items():
+                lines.append(f"{metric}{_labels(pipe=name, tool=tool_name)} {getattr(tool, attr)}")
+
+    metric = "mcp_pipe_request_duration_seconds"
+    lines.append(f"# HELP {metric} Time from request to matching response")
+    lines.append(f"# TYPE {metric} histogram")
+    for name, _, rpc in pipes:
+        for tool_name, tool in rpc.tools.items():
+            histogram = tool.latency
+            for bound, total in histogram.cumulative():
+                lines.append(f"{metric}_bucket{_labels(pipe=name, tool=tool_name, le=f'{bound:g}')} {total}")
+            lines.append(f"{metric}_bucket{_labels(pipe=name, tool=tool_name, le='+Inf')} {histogram.count}")
+            lines.append(f"{metric}_sum{_labels(pipe=name, tool=tool_name)} {histogram.sum:.6f}")
+            lines.append(f"{metric}_count{_labels(pipe=name, tool=tool_name)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+async def serve_metrics(render, host="127.0.0.1", port=9464):
+    """Serve ``render()`` as Prometheus text on ``http://host:port/metrics``"""
+
+    async def handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()).strip():
+                pass  # skip headers
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/", "/metrics"):
+                status, body = "200 OK", render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(f"HTTP/1.1 {status}\r\n"
+                         f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                         f"Content-Length: {len(body)}\r\n"
+                         f"Connection: close\r\n\r\n".encode("latin-1") + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def write_snapshot(path, data):
+    """Atomically replace ``path`` with ``data`` as JSON"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,240 @@
+"""
+Precompiled request plans for the generated API tools.
+
+``compile_plan`` turns an API config into an immutable ``RequestPlan`` once,
+at registration time: the field order and defaults from ``request_format``,
+a coercer per declared field type, the request URL with a query-string API
+key merged in properly, the header template and the HTTP method dispatch.
+A tool call then only has to bind its arguments (``RequestPlan.bind``) and
+send.
+
+Each ``request_format`` entry is either a type name (``"city": "string"``) or
+a field spec (``"days": {"type": "number", "default": 3, "description": "..."}``).
+The plan also carries a typed ``inspect.Signature`` for the fields, which the
+tool layer attaches to the generated tool so FastMCP publishes a real input
+schema.  The GUI test dialog binds its form values through the same plan.
+"""
+
+import inspect
+import json
+import keyword
+from collections import namedtuple
+from types import MappingProxyType
+from typing import Any, Annotated, Dict, List, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+try:
+    from pydantic import Field
+except ImportError:  # 无 pydantic 时签名不带字段说明
+    Field = None
+
+SUPPORTED_METHODS = {"GET": "params", "POST": "json"}
+
+
+def _to_number(value):
+    if isinstance(value, str):
+        return float(value) if any(c in value for c in ".eE") else int(value)
+    return value
+
+
+def _to_boolean(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', 'yes', '1', 'y')
+    return bool(value)
+
+
+def _to_json(value):
+    if isinstance(value, str) and value:
+        return json.loads(value)
+    return value
+
+
+COERCERS = {
+    "number": _to_number,
+    "integer": _to_number,
+    "boolean": _to_boolean,
+    "object": _to_json,
+    "array": _to_json,
+}
+
+TYPE_ALIASES = {
+    "str": "string", "text": "string",
+    "float": "number", "double": "number",
+    "int": "integer",
+    "bool": "boolean",
+    "dict": "object", "list": "array",
+}
+
+# 字段未提供时使用的默认值（与 GUI 测试对话框一致）
+TYPE_DEFAULTS = {
+    "string": "",
+    "number": 0,
+    "integer": 0,
+    "boolean": False,
+    "object": {},
+    "array": [],
+}
+
+PARAM_TYPES = {
+    "string": str,
+    "number": Union[int, float],
+    "integer": int,
+    "boolean": bool,
+    "object": Dict[str, Any],
+    "array": List[Any],
+}
+
+FieldSpec = namedtuple("FieldSpec", "name type default required description")
+
+
+def field_specs(request_format):
+    """Normalize ``request_format`` into FieldSpecs
+
+    Fields are optional and default to the type's empty value, as omitted
+    fields always were; a spec dict may set its own ``default``.  Only a spec
+    dict with ``"required": true`` makes a required parameter.
+    """
+    specs = []
+    for name, spec in (request_format or {}).items():
+        if isinstance(spec, dict):
+            field_type = spec.get("type", "string")
+            has_default = "default" in spec
+            required = spec.get("required") is True
+            description = spec.get("description", "")
+        else:
+            field_type, has_default, required, description = spec, False, False, ""
+        field_type = TYPE_ALIASES.get(field_type, field_type) if isinstance(field_type, str) else None
+        default = spec["default"] if has_default else TYPE_DEFAULTS.get(field_type)
+        specs.append(FieldSpec(name, field_type, default, required, description))
+    return tuple(specs)
+
+
+def _is_parameter_name(name):
+    return name.isidentifier() and not keyword.iskeyword(name) and not name.startswith("_")
+
+
+def build_signature(specs):
+    """Typed keyword-only signature for the fields, or None when a field name cannot be a parameter"""
+    if not all(_is_parameter_name(spec.name) for spec in specs):
+        return None
+    parameters = []
+    for spec in specs:
+        annotation = PARAM_TYPES.get(spec.type, Any)
+        if spec.description and Field is not None:
+            annotation = Annotated[annotation, Field(description=spec.description)]
+        parameters.append(inspect.Parameter(
+            spec.name, inspect.Parameter.KEYWORD_ONLY, annotation=annotation,
+            default=inspect.Parameter.empty if spec.required else spec.default))
+    return inspect.Signature(parameters)
+
+
+def coerce_value(field_type, value):
+    """Convert a string argument to the declared field type; unknown types pass through"""
+    coercer = COERCERS.get(TYPE_ALIASES.get(field_type, field_type))
+    return coercer(value) if coercer is not None else value
+
+
+def merge_query(url, extra):
+    """Add query parameters to ``url``, keeping any it already has"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True) + list(extra.items())
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class RequestPlan:
+    __slots__ = ("api_name", "method", "url", "payload_arg", "headers",
+                 "specs", "fields", "defaults", "coercers", "body_extra", "signature")
+
+    def __init__(self, **attrs):
+        for name in self.__slots__:
+            object.__setattr__(self, name, attrs[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RequestPlan is immutable")
+
+    def bind(self, kwargs, strict=False):
+        """Map tool-call arguments to request parameters
+
+        Accepts typed keyword arguments (one per field, as published in
+        ``signature``; string values are coerced to the declared types), or the
+        legacy forms under a single ``kwargs`` argument: a positional string
+        (``"a b"`` / ``"a,b"``, matched to fields in declaration order) or a
+        dict.  With ``strict`` a value that cannot be coerced raises
+        ValueError instead of being passed through.  Returns ``(params, extra)``
+        where ``extra`` holds surplus positional values.
+        """
+        params = {}
+        extra = ()
+        if "kwargs" in kwargs and "kwargs" not in self.fields:
+            value = kwargs["kwargs"]
+            if isinstance(value, str):
+                parts = value.replace(",", " ").split()
+                for field, part, coercer in zip(self.fields, parts, self.coercers):
+                    if coercer is not None:
+                        try:
+                            part = coercer(part)
+                        except (ValueError, json.JSONDecodeError):
+                            pass
+                    params[field] = part
+                extra = parts[len(self.fields):]
+            elif isinstance(value, dict):
+                params.update(value)
+            else:
+                raise ValueError(f"Unsupported kwargs type: {type(value).__name__}")
+        else:
+            for field, coercer in zip(self.fields, self.coercers):
+                if field not in kwargs:
+                    continue
+                value = kwargs[field]
+                if coercer is not None and isinstance(value, str):
+                    try:
+                        value = coercer(value)
+                    except (ValueError, json.JSONDecodeError) as e:
+                        if strict:
+                            raise ValueError(f"{field}: {e}") from e
+                params[field] = value
+
+        # 补全剩余字段
+        for field, default in self.defaults:
+            if field not in params:
+                params[field] = default
+        if self.body_extra:
+            params.update(self.body_extra)
+        return params, extra
+
+
+def compile_plan(api_config):
+    """Build the RequestPlan for an API config; raises ValueError for unsupported methods"""
+    method = api_config["method"].upper()
+    if method not in SUPPORTED_METHODS:
+        raise ValueError(f"Unsupported method: {method}")
+
+    specs = field_specs(api_config.get("request_format"))
+    url = api_config["api_url"]
+    headers = {}
+    body_extra = {}
+
+    api_key = api_config.get("api_key", "")
+    if api_key:
+        key_location = api_config.get("key_location", "header")
+        key_name = api_config.get("key_name", "Authorization")
+        if key_location == "header":
+            headers[key_name] = f"Bearer {api_key}" if key_name.lower() == "authorization" else api_key
+        elif key_location == "query":
+            url = merge_query(url, {key_name: api_key})
+        elif key_location == "body":
+            body_extra[key_name] = api_key
+
+    return RequestPlan(
+        api_name=api_config["api_name"],
+        method=method,
+        url=url,
+        payload_arg=SUPPORTED_METHODS[method],
+        headers=MappingProxyType(headers),
+        specs=specs,
+        fields=tuple(spec.name for spec in specs),
+        defaults=tuple((spec.name, spec.default) for spec in specs),
+        coercers=tuple(COERCERS.get(spec.type) for spec in specs),
+        body_extra=MappingProxyType(body_extra),
+        signature=build_signature(specs),
+    )
@@ -0,0 +1,228 @@
+"""
+Upstream protection for the generated API tools: token-bucket rate limiting
+and a circuit breaker, combined per API in ``APIGuard``.
+
+Per-API options (read from ``api_configs.json``):
+
+    rate_limit                 sustained requests per second; 0 disables (default 0)
+    rate_burst                 bucket capacity (default max(1, rate_limit))
+    rate_limit_wait            seconds a call may wait for a token before being rejected (default 0)
+    breaker_failure_threshold  consecutive failures that open the circuit; 0 disables (default 0)
+    breaker_slow_call_ms       calls slower than this count as failures (default: off)
+    breaker_reset_timeout      seconds the circuit stays open before a half-open probe (default 30)
+"""
+
+import asyncio
+import threading
+import time
+
+from tail_latency import DeadlineExceeded
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def is_upstream_failure(error):
+    """Whether an exception says the upstream is unhealthy (5xx, network, bad body)
+
+    4xx responses are caused by the request itself and do not count.
+    """
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status is None or status >= 500
+
+
+class TokenBucket:
+    """Thread-safe token bucket; reservations are granted in arrival order"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=0.0):
+        """Take one token and return how long the caller must wait before using it
+
+        Raises RateLimitExceeded without taking a token when the wait would
+        exceed ``max_wait``.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if wait > max_wait:
+                raise RateLimitExceeded(f"rate limit exceeded, next slot in {wait:.2f}s")
+            self._tokens -= 1
+            return wait
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing"""
+
+    def __init__(self, failure_threshold, reset_timeout=30.0, slow_call_seconds=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call_seconds = slow_call_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            retry_in = self._opened_at + self.reset_timeout - time.monotonic()
+            if self.state == OPEN and retry_in <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            if self.state == HALF_OPEN:
+                raise CircuitOpenError("circuit half-open, probe request to upstream in progress")
+            raise CircuitOpenError(
+                f"circuit open after {self.failures} consecutive upstream failures, "
+                f"retry in {max(retry_in, 0):.1f}s")
+
+    def release_probe(self):
+        """Give back a half-open probe slot that was admitted but never sent"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record(self, success, elapsed):
+        if success and self.slow_call_seconds is not None and elapsed > self.slow_call_seconds:
+            success = False
+        with self._lock:
+            self._probe_in_flight = False
+            if success:
+                self.state = CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opened += 1
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+
+class APIGuard:
+    """Rate limiter and circuit breaker for a single API"""
+
+    def __init__(self, api_name, bucket=None, breaker=None, max_wait=0.0):
+        self.api_name = api_name
+        self.bucket = bucket
+        self.breaker = breaker
+        self.max_wait = max_wait
+        self.rate_limited = 0
+        self.short_circuited = 0
+
+    @classmethod
+    def from_config(cls, api_config):
+        """Build the guard declared by an API config, or None when nothing is enabled"""
+        rate = float(api_config.get("rate_limit", 0) or 0)
+        threshold = int(api_config.get("breaker_failure_threshold", 0) or 0)
+        if rate <= 0 and threshold <= 0:
+            return None
+        bucket = TokenBucket(rate, api_config.get("rate_burst")) if rate > 0 else None
+        breaker = None
+        if threshold > 0:
+            slow_ms = api_config.get("breaker_slow_call_ms")
+            breaker = CircuitBreaker(
+                threshold,
+                reset_timeout=float(api_config.get("breaker_reset_timeout", 30)),
+                slow_call_seconds=float(slow_ms) / 1000 if slow_ms else None,
+            )
+        return cls(api_config["api_name"], bucket, breaker,
+                   max_wait=float(api_config.get("rate_limit_wait", 0)))
+
+    def admit(self):
+        """Check the breaker and take a rate-limit token; return the delay to wait before sending"""
+        if self.breaker is not None:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError as e:
+                self.short_circuited += 1
+                raise CircuitOpenError(f"API '{self.api_name}' unavailable: {e}") from None
+        if self.bucket is None:
+            return 0.0
+        try:
+            return self.bucket.reserve(self.max_wait)
+        except RateLimitExceeded as e:
+            self.rate_limited += 1
+            if self.breaker is not None:
+                self.breaker.release_probe()
+            raise RateLimitExceeded(f"API '{self.api_name}': {e}") from None
+
+    def record(self, success, elapsed):
+        if self.breaker is not None:
+            self.breaker.record(success, elapsed)
+
+    def _finish(self, outcome, start):
+        if outcome is None:
+            # no answer from the upstream (cancelled, interrupted or out of time): give the probe slot back
+            if self.breaker is not None:
+                self.breaker.release_probe()
+        else:
+            self.record(outcome, time.monotonic() - start)
+
+    def call(self, fn):
+        """Admit, wait for the rate-limit slot, run ``fn()`` and record its outcome"""
+        delay = self.admit()
+        start = time.monotonic()
+        outcome = None
+        try:
+            if delay:
+                time.sleep(delay)
+            start = time.monotonic()
+            result = fn()
+            outcome = True
+            return result
+        except DeadlineExceeded:
+            raise  # the caller ran out of time; says nothing about the upstream
+        except Exception as e:
+            outcome = not is_upstream_failure(e)
+            raise
+        finally:
+            self._finish(outcome, start)
+
+    async def acall(self, coro_fn):
+        """Async ``call``; a cancelled call releases its half-open probe slot"""
+        delay = self.admit()
+        start = time.monotonic()
+        outcome = None
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            start = time.monotonic()
+            result = await coro_fn()
+            outcome = True
+            return result
+        except DeadlineExceeded:
+            raise  # the caller ran out of time; says nothing about the upstream
+        except Exception as e:
+            outcome = not is_upstream_failure(e)
+            raise
+        finally:
+            self._finish(outcome, start)
+
+    def stats(self):
+        stats = {"rate_limited": self.rate_limited, "short_circuited": self.short_circuited}
+        if self.breaker is not None:
+            stats.update(breaker_state=self.breaker.state,
+                         consecutive_failures=self.breaker.failures,
+                         breaker_opened=self.breaker.opened)
+        return stats
@@ -0,0 +1,306 @@
+"""
+In-memory response cache for the generated API tools.
+
+Results are cached per API under a key built from the normalized request
+parameters.  Each API gets its own partition with a TTL and LRU eviction
+bounded by entry count and approximate serialized size.
+
+Per-API options (read from ``api_configs.json``):
+
+    cache_ttl          seconds a result may be reused; 0 disables caching (default 0)
+    cache_max_entries  entries kept for the API (default 128)
+    cache_max_bytes    approximate JSON size kept for the API (default 1 MiB)
+    cache_persist      true to back the partition with the on-disk cache (default: CACHE_PERSIST
+                       in the base config, else false); see ``disk_cache``
+    cache_disk_max_bytes  size of the API's share of the on-disk cache (default 16 MiB)
+    revalidate         false to never send conditional requests (default true)
+    revalidate_window  seconds an expired entry with an ETag / Last-Modified is kept for
+                       revalidation (default 3600)
+
+When the upstream sends ``ETag`` or ``Last-Modified``, an expired entry is
+revalidated with ``If-None-Match`` / ``If-Modified-Since``; on 304 the cached
+(already parsed and projected) value is reused and fresh for another TTL.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from disk_cache import DiskCache, DiskPartition, config_fingerprint, DEFAULT_DB_PATH, DEFAULT_DISK_MAX_BYTES, \
+    DEFAULT_COMPACT_INTERVAL
+
+logger = logging.getLogger('universal_mcp')
+
+DEFAULT_MAX_ENTRIES = 128
+DEFAULT_MAX_BYTES = 1024 * 1024
+DEFAULT_REVALIDATE_WINDOW = 3600
+
+
+NOT_MODIFIED = object()  # returned by the tool layer's send when the upstream answered 304
+
+
+def response_validators(headers):
+    """ETag / Last-Modified of a response, or None when the upstream sent neither"""
+    validators = {}
+    etag = headers.get("ETag")
+    if etag:
+        validators["etag"] = etag
+    last_modified = headers.get("Last-Modified")
+    if last_modified:
+        validators["last_modified"] = last_modified
+    return validators or None
+
+
+def conditional_headers(validators):
+    """Request headers revalidating a cached response"""
+    headers = {}
+    if "etag" in validators:
+        headers["If-None-Match"] = validators["etag"]
+    if "last_modified" in validators:
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def normalize_params(params):
+    """Canonical string form of request parameters, independent of key order"""
+    return json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class CachePartition:
+    """TTL + LRU cache for a single API, optionally backed by a ``DiskPartition``
+
+    With a ``revalidate_window`` an expired entry that carries HTTP validators
+    stays available to ``stale`` for that many seconds, so the caller can send
+    a conditional request and keep the cached value on 304 Not Modified.
+    """
+
+    def __init__(self, api_name, ttl, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, disk=None,
+                 revalidate_window=0):
+        self.api_name = api_name
+        self.disk = disk
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.revalidate_window = revalidate_window
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0  # conditional requests prepared from stale entries
+        self.revalidated = 0  # 304 answers that reused the cached value
+        self.bytes = 0
+        self._entries = OrderedDict()  # key -> (expires_at, keep_until, size, value, validators)
+        self._lock = threading.Lock()
+
+    def settings(self):
+        disk = None if self.disk is None else (self.disk.fingerprint, self.disk.max_bytes)
+        return (self.ttl, self.max_entries, self.max_bytes, disk, self.revalidate_window)
+
+    def _lookup(self, key):
+        """Memory part of ``get``; None when the disk tier has to be asked"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[3]
+                if entry[1] <= now:
+                    self._remove(key)
+            if self.disk is None:
+                self.misses += 1
+                return False, None
+        return None
+
+    def _load(self, key, found):
+        with self._lock:
+            if found is None:
+                self.misses += 1
+                return False, None
+            value, expires_at, keep_until, size, validators = found
+            offset = time.monotonic() - time.time()
+            if size <= self.max_bytes:
+                self._insert(key, expires_at + offset, keep_until + offset, size, value, validators)
+            if expires_at + offset <= time.monotonic():
+                self.misses += 1  # only kept for revalidation
+                return False, None
+            self.hits += 1
+        return True, value
+
+    def get(self, params):
+        """Return ``(True, value)`` for a fresh entry, otherwise ``(False, None)``"""
+        key = normalize_params(params)
+        result = self._lookup(key)
+        if result is None:
+            # memory miss: another process (or this one before a restart) may have cached it
+            result = self._load(key, self.disk.get(key))
+        return result
+
+    async def aget(self, params):
+        """``get`` for the event loop: a memory miss reads the disk tier in a worker thread"""
+        key = normalize_params(params)
+        result = self._lookup(key)
+        if result is None:
+            result = self._load(key, await asyncio.to_thread(self.disk.get, key))
+        return result
+
+    def stale(self, params):
+        """``(value, validators)`` of an expired entry that may be revalidated, or None"""
+        if not self.revalidate_window:
+            return None
+        key = normalize_params(params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[4] is None or entry[1] <= time.monotonic():
+                return None
+            self.revalidations += 1
+            return entry[3], entry[4]
+
+    def put(self, params, value, validators=None, background=False):
+        """Store a result; with ``background`` the disk tier is written on the disk cache's writer thread"""
+        try:
+            text = json.dumps(value, ensure_ascii=False, default=str)
+        except (TypeError, ValueError):
+            return
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        key = normalize_params(params)
+        keep = self.revalidate_window if validators else 0
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._insert(key, expires_at, expires_at + keep, size, value, validators)
+        if self.disk is not None:
+            if background:
+                self.disk.disk.defer(self.disk.put, key, text, size, self.ttl, validators, keep)
+            else:
+                self.disk.put(key, text, size, self.ttl, validators, keep)
+
+    def refresh(self, params, value, validators, background=False):
+        """Record a 304 Not Modified: the cached value is fresh for another TTL"""
+        key = normalize_params(params)
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self.revalidated += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (expires_at, expires_at + self.revalidate_window, entry[2], entry[3], validators)
+                self._entries.move_to_end(key)
+        if entry is None:
+            self.put(params, value, validators, background)  # evicted meanwhile: store it again
+        elif self.disk is not None:
+            if background:
+                self.disk.disk.defer(self._refresh_disk, params, key, value, validators)
+            else:
+                self._refresh_disk(params, key, value, validators)
+
+    def _refresh_disk(self, params, key, value, validators):
+        if not self.disk.refresh(key, self.ttl, validators, self.revalidate_window):
+            self.put(params, value, validators)  # evicted from disk meanwhile: store it again
+
+    def _insert(self, key, expires_at, keep_until, size, value, validators):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, keep_until, size, value, validators)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        size = self._entries.pop(key)[2]
+        self.bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        disk = self.disk.stats() if self.disk is not None else {}
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                **disk,
+                "ttl": self.ttl,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "revalidations": self.revalidations,
+                "revalidated": self.revalidated,
+            }
+
+
+class ResponseCache:
+    """Registry of per-API cache partitions
+
+    The on-disk cache at ``disk_path`` is opened the first time an API asks
+    for persistence; if it cannot be opened, caching stays in memory only.
+    """
+
+    def __init__(self, disk_path=DEFAULT_DB_PATH, persist=False, compact_interval=DEFAULT_COMPACT_INTERVAL):
+        self._partitions = {}
+        self._lock = threading.Lock()
+        self.disk_path = disk_path
+        self.persist = persist
+        self.compact_interval = compact_interval
+        self.disk = None
+        self._disk_failed = False
+
+    def _disk(self):
+        if self.disk is None and not self._disk_failed:
+            try:
+                self.disk = DiskCache(self.disk_path, self.compact_interval)
+            except (OSError, sqlite3.Error) as e:
+                self._disk_failed = True
+                logger.error(f"无法打开磁盘缓存 {self.disk_path}，仅使用内存缓存: {e}")
+                return None
+            self.disk.start_compactor()
+            logger.info(f"已启用磁盘缓存: {self.disk.path}")
+        return self.disk
+
+    def partition(self, api_config):
+        """Return the cache partition for an API, or None when caching is disabled"""
+        api_name = api_config["api_name"]
+        ttl = float(api_config.get("cache_ttl", 0) or 0)
+        with self._lock:
+            if ttl <= 0:
+                self._partitions.pop(api_name, None)
+                return None
+            max_entries = int(api_config.get("cache_max_entries", DEFAULT_MAX_ENTRIES))
+            max_bytes = int(api_config.get("cache_max_bytes", DEFAULT_MAX_BYTES))
+            disk = None
+            if api_config.get("cache_persist", self.persist) and self._disk() is not None:
+                disk = DiskPartition(self.disk, api_name, config_fingerprint(api_config),
+                                     int(api_config.get("cache_disk_max_bytes", DEFAULT_DISK_MAX_BYTES)))
+            revalidate_window = 0.0
+            if api_config.get("revalidate", True):
+                revalidate_window = float(api_config.get("revalidate_window", DEFAULT_REVALIDATE_WINDOW))
+            partition = self._partitions.get(api_name)
+            if partition is None or partition.settings() != (ttl, max_entries, max_bytes,
+                                                             disk and (disk.fingerprint, disk.max_bytes),
+                                                             revalidate_window):
+                partition = CachePartition(api_name, ttl, max_entries, max_bytes, disk, revalidate_window)
+                self._partitions[api_name] = partition
+            return partition
+
+    def drop(self, api_name):
+        with self._lock:
+            self._partitions.pop(api_name, None)
+
+    def stats(self):
+        with self._lock:
+            partitions = dict(self._partitions)
+        return {name: partition.stats() for name, partition in partitions.items()}
+
+    def disk_stats(self):
+        return self.disk.stats() if self.disk is not None else None
@@ -0,0 +1,152 @@
+"""
+Bounded, streaming reads of upstream JSON bodies.
+
+Instead of ``response.json()`` on the whole body, the tool layer reads the
+body in chunks (``read_json`` for requests, ``aread_json`` for httpx) and
+stops as soon as ``max_response_bytes`` (per API, falling back to
+``MAX_RESPONSE_BYTES`` in the base config) have been read, closing the
+connection early.  A body cut off at the cap is decoded member by member, so
+the caller still gets every top-level array item / object member that
+arrived in full, flagged as truncated.  Peak memory per call is bounded by
+the cap regardless of what the upstream sends.
+"""
+
+import codecs
+import json
+import re
+import time
+
+DEFAULT_MAX_RESPONSE_BYTES = 8 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_CHARSET = re.compile(r'charset=["\']?([\w.:-]+)', re.I)
+
+
+def response_charset(content_type):
+    """Charset declared in a Content-Type header, or None to let json detect UTF-8/16/32"""
+    match = _CHARSET.search(content_type or "")
+    if match:
+        try:
+            name = codecs.lookup(match.group(1)).name
+        except LookupError:
+            return None
+        return None if name == "utf-8" else name
+    return None
+
+
+def _skip(text, pos):
+    return _WHITESPACE.match(text, pos).end()
+
+
+def salvage_json_prefix(text):
+    """Decode the complete top-level members of a cut-off JSON array or object
+
+    Members are decoded one at a time from the start of ``text``; the first one
+    that does not parse (the member the cut went through) ends the scan.
+    Returns the partial list/dict, or None when the document is not a container.
+    """
+    raw_decode = json.JSONDecoder().raw_decode
+    pos = _skip(text, 0)
+    if pos >= len(text) or text[pos] not in "[{":
+        return None
+    is_array = text[pos] == "["
+    close = "]" if is_array else "}"
+    value = [] if is_array else {}
+    pos += 1
+    expect_member = True
+    try:
+        while True:
+            pos = _skip(text, pos)
+            if pos >= len(text) or text[pos] == close:
+                break
+            if not expect_member:
+                if text[pos] != ",":
+                    break
+                pos += 1
+                expect_member = True
+                continue
+            if is_array:
+                item, end = raw_decode(text, pos)
+            else:
+                key, end = raw_decode(text, pos)
+                end = _skip(text, end)
+                if not isinstance(key, str) or end >= len(text) or text[end] != ":":
+                    break
+                item, end = raw_decode(text, _skip(text, end + 1))
+            if end >= len(text):
+                break  # a number or literal may have been cut short
+            if is_array:
+                value.append(item)
+            else:
+                value[key] = item
+            pos = end
+            expect_member = False
+    except json.JSONDecodeError:
+        pass
+    return value
+
+
+class JSONBodyReader:
+    """Collects a bounded JSON body chunk by chunk
+
+    A complete body is decoded in one pass by the C JSON decoder; a body cut
+    off at the byte cap is salvaged member by member with ``salvage_json_prefix``.
+    """
+
+    def __init__(self, charset=None):
+        self.charset = charset
+        self._body = bytearray()
+
+    def feed(self, chunk):
+        self._body += chunk
+
+    def finish(self, truncated=False):
+        data = bytes(self._body)
+        self._body = bytearray()
+        if not truncated:
+            return json.loads(data if self.charset is None else data.decode(self.charset))
+        return salvage_json_prefix(data.decode(self.charset or "utf-8", errors="ignore"))
+
+
+def read_json(response, max_bytes=DEFAULT_MAX_RESPONSE_BYTES, chunk_size=CHUNK_SIZE, deadline=None):
+    """Decode a streamed ``requests`` response, reading at most ``max_bytes``
+
+    ``deadline`` (a ``time.monotonic()`` value) bounds the whole read; the
+    socket timeout of ``requests`` only bounds the gap between chunks.
+    Returns ``(value, truncated)``.
+    """
+    reader = JSONBodyReader(response_charset(response.headers.get("Content-Type")))
+    received = 0
+    truncated = False
+    try:
+        for chunk in response.iter_content(chunk_size):
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("response body not received before the deadline")
+            if received + len(chunk) > max_bytes:
+                reader.feed(chunk[:max_bytes - received])
+                truncated = True
+                break
+            received += len(chunk)
+            reader.feed(chunk)
+    finally:
+        response.close()
+    return reader.finish(truncated), truncated
+
+
+async def aread_json(response, max_bytes=DEFAULT_MAX_RESPONSE_BYTES, chunk_size=CHUNK_SIZE):
+    """Decode a streamed ``httpx`` response, reading at most ``max_bytes``
+
+    Returns ``(value, truncated)``.
+    """
+    reader = JSONBodyReader(response_charset(response.headers.get("Content-Type")))
+    received = 0
+    truncated = False
+    async for chunk in response.aiter_bytes(chunk_size):
+        if received + len(chunk) > max_bytes:
+            reader.feed(chunk[:max_bytes - received])
+            truncated = True
+            break
+        received += len(chunk)
+        reader.feed(chunk)
+    return reader.finish(truncated), truncated
@@ -0,0 +1,271 @@
+"""
+Compilers for the ``response_format`` declared by each API config.
+
+``compile_validator`` turns a response_format into a checker that reports
+where a response deviates from it (missing fields, wrong types), again
+recursing into nested objects and arrays; ``get_validator`` caches compiled
+checkers by format.  ``ResponseValidator`` runs it on a sample of live
+responses and counts schema drift per field path.
+
+``compile_extractor`` turns a response_format into a projection function that
+keeps only the declared fields (recursing into nested objects and arrays
+such as ``{"data": {"title": "string"}}`` or ``{"items": [{"id": "number"}]}``)
+and optionally caps array lengths and string lengths.  The format is walked
+once at compile time; the returned closures only touch the response.
+
+Per-API options (read from ``api_configs.json``):
+
+    project_response   true to return only the declared fields (default false)
+    max_items          keep at most this many items of every array (default: no cap)
+    max_string_length  truncate longer strings to this many characters (default: no cap)
+    validate_response  fraction of responses checked against response_format
+                       (0~1, default: VALIDATE_SAMPLE_RATE in the base config, else 0)
+"""
+
+import functools
+import json
+import random
+import threading
+
+
+def _size(value):
+    return len(json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"))
+
+
+def _compile_limiter(max_items, max_string_length):
+    """Cap arrays and strings anywhere inside an undeclared (leaf) value"""
+    if max_items is None and max_string_length is None:
+        return lambda value: value
+
+    def limit(value):
+        if isinstance(value, str):
+            if max_string_length is not None and len(value) > max_string_length:
+                return value[:max_string_length]
+            return value
+        if isinstance(value, list):
+            items = value if max_items is None else value[:max_items]
+            return [limit(item) for item in items]
+        if isinstance(value, dict):
+            return {key: limit(item) for key, item in value.items()}
+        return value
+
+    return limit
+
+
+def compile_extractor(response_format, max_items=None, max_string_length=None):
+    """Return a function projecting a decoded response onto ``response_format``"""
+    limit = _compile_limiter(max_items, max_string_length)
+
+    def build(spec):
+        if isinstance(spec, dict) and spec:
+            children = tuple((key, build(child)) for key, child in spec.items())
+
+            def extract_object(value):
+                if not isinstance(value, dict):
+                    return limit(value)
+                return {key: extract(value[key]) for key, extract in children if key in value}
+
+            return extract_object
+
+        if isinstance(spec, list) and spec:
+            extract_item = build(spec[0])
+
+            def extract_array(value):
+                if not isinstance(value, list):
+                    return limit(value)
+                items = value if max_items is None else value[:max_items]
+                return [extract_item(item) for item in items]
+
+            return extract_array
+
+        return limit
+
+    return build(response_format)
+
+
+_TYPE_CHECKS = {
+    "string": lambda value: isinstance(value, str),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+}
+
+VALIDATE_ARRAY_ITEMS = 3  # array items checked against the item format
+
+
+def _type_name(value):
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list):
+        return "array"
+    if isinstance(value, dict):
+        return "object"
+    return type(value).__name__
+
+
+def compile_validator(response_format, array_items=VALIDATE_ARRAY_ITEMS):
+    """Return a function listing ``(path, expected, actual)`` deviations of a response
+
+    ``actual`` is None for a missing field, otherwise the JSON type found.
+    Nulls are accepted for any declared type; only the first ``array_items``
+    items of each array are checked.  Unknown type names accept anything.
+    """
+
+    def build(spec):
+        if isinstance(spec, dict) and spec:
+            children = tuple((key, build(child)) for key, child in spec.items())
+
+            def check_object(value, path, issues):
+                if not isinstance(value, dict):
+                    issues.append((path or "$", "object", _type_name(value)))
+                    return
+                for key, check in children:
+                    child_path = f"{path}.{key}" if path else key
+                    if key not in value:
+                        issues.append((child_path, "present", None))
+                    elif value[key] is not None:
+                        check(value[key], child_path, issues)
+
+            return check_object
+
+        if isinstance(spec, list) and spec:
+            check_item = build(spec[0])
+
+            def check_array(value, path, issues):
+                if not isinstance(value, list):
+                    issues.append((path or "$", "array", _type_name(value)))
+                    return
+                for index, item in enumerate(value[:array_items]):
+                    if item is not None:
+                        check_item(item, f"{path}[{index}]", issues)
+
+            return check_array
+
+        type_check = _TYPE_CHECKS.get(spec) if isinstance(spec, str) else None
+        if type_check is None:
+            return lambda value, path, issues: None
+
+        def check_value(value, path, issues):
+            if not type_check(value):
+                issues.append((path or "$", spec, _type_name(value)))
+
+        return check_value
+
+    check = build(response_format)
+
+    def validate(value):
+        issues = []
+        check(value, "", issues)
+        return issues
+
+    return validate
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_validator(format_key):
+    return compile_validator(json.loads(format_key))
+
+
+def get_validator(response_format):
+    """Compiled validator for ``response_format``, shared by every caller with the same format"""
+    return _cached_validator(json.dumps(response_format, sort_keys=True, ensure_ascii=False))
+
+
+def describe_issue(issue):
+    path, expected, actual = issue
+    if actual is None:
+        return f"{path}: 缺少字段"
+    return f"{path}: 期望 {expected}，实际为 {actual}"
+
+
+class ResponseValidator:
+    """Sampled runtime validation with schema-drift counters per field path"""
+
+    MAX_PATHS = 50
+
+    def __init__(self, response_format, sample_rate):
+        self._validate = get_validator(response_format)
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self.validated = 0
+        self.drifted = 0
+        self.paths = {}
+
+    @classmethod
+    def from_config(cls, api_config, default_rate=0.0):
+        """Build the validator for an API config, or None when validation is off"""
+        sample_rate = float(api_config.get("validate_response", default_rate) or 0)
+        if sample_rate <= 0:
+            return None
+        return cls(api_config.get("response_format", {}) or {}, min(sample_rate, 1.0))
+
+    def __call__(self, value):
+        """Validate ``value`` if it falls in the sample; returns the issues found (empty when skipped)"""
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return []
+        issues = self._validate(value)
+        with self._lock:
+            self.validated += 1
+            if issues:
+                self.drifted += 1
+                for issue in issues:
+                    key = describe_issue(issue)
+                    if key in self.paths or len(self.paths) < self.MAX_PATHS:
+                        self.paths[key] = self.paths.get(key, 0) + 1
+        return issues
+
+    def stats(self):
+        with self._lock:
+            return {
+                "validated": self.validated,
+                "schema_drift": self.drifted,
+                "drift_fields": dict(self.paths),
+            }
+
+
+class ResponseProjector:
+    """Per-API projection stage with bytes-saved accounting"""
+
+    def __init__(self, response_format, max_items=None, max_string_length=None):
+        self._extract = compile_extractor(response_format, max_items, max_string_length)
+        self._lock = threading.Lock()
+        self.projected = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @classmethod
+    def from_config(cls, api_config):
+        """Build the projector for an API config, or None when projection is off"""
+        if not api_config.get("project_response"):
+            return None
+        max_items = api_config.get("max_items")
+        max_string_length = api_config.get("max_string_length")
+        return cls(api_config.get("response_format", {}) or {},
+                   max_items=int(max_items) if max_items is not None else None,
+                   max_string_length=int(max_string_length) if max_string_length is not None else None)
+
+    def __call__(self, value):
+        projected = self._extract(value)
+        size_in, size_out = _size(value), _size(projected)
+        with self._lock:
+            self.projected += 1
+            self.bytes_in += size_in
+            self.bytes_out += size_out
+        return projected
+
+    def stats(self):
+        with self._lock:
+            return {
+                "projected": self.projected,
+                "projection_bytes_in": self.bytes_in,
+                "projection_bytes_out": self.bytes_out,
+                "projection_bytes_saved": self.bytes_in - self.bytes_out,
+            }
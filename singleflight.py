@@ -0,0 +1,105 @@
+"""
+Request coalescing for the generated API tools.
+
+Concurrent calls with the same key share one in-flight upstream request:
+the first caller (the leader) runs it and every caller that arrives while it
+is in flight waits for and receives the same result or exception.  Keys are
+``(api_name, normalized params)`` tuples, so counters are kept per API.
+"""
+
+import asyncio
+import threading
+from collections import defaultdict
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce identical concurrent calls made from threads"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = defaultdict(int)
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced[key[0]] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """Coalesce identical concurrent calls made from coroutines on one event loop
+
+    The shared call runs as its own task, so cancelling one caller (the first
+    one included) never cancels the others; it is only cancelled once every
+    caller has given up.  ``context`` is the contextvars context it runs in
+    (default: a copy of the first caller's).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.coalesced = defaultdict(int)
+
+    def _forget(self, key, flight):
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+
+    def _finished(self, key, flight):
+        self._forget(key, flight)
+        if not flight.task.cancelled():
+            flight.task.exception()  # mark retrieved when every waiter has left
+
+    async def do(self, key, coro_fn, context=None):
+        flight = self._calls.get(key)
+        if flight is None:
+            task = asyncio.get_running_loop().create_task(coro_fn(), context=context)
+            flight = self._calls[key] = _Flight(task)
+            task.add_done_callback(lambda _: self._finished(key, flight))
+        else:
+            self.coalesced[key[0]] += 1
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # nobody is waiting any more: stop the shared call, later callers start a new one
+                self._forget(key, flight)
+                flight.task.cancel()
@@ -0,0 +1,253 @@
+"""
+Per-API request timeouts, deadline propagation and hedged requests.
+
+Every upstream request gets a timeout from ``TimeoutPolicy``: the static
+``timeout`` of the API, or, with ``adaptive_timeout``, a multiple of the
+rolling p95 of recent successful calls (never above the static value).  A
+tool call may also carry a deadline (``deadline_scope``, e.g. the per-item
+timeout of ``call_many`` or ``TOOL_CALL_TIMEOUT``); the request timeout is
+cut to the time left, and a call whose deadline has already passed fails
+without contacting the upstream.
+
+With ``hedge`` enabled, an idempotent GET that has not answered after the
+hedge delay (``hedge_delay_ms``, or the rolling p95) is sent a second time
+and whichever copy answers first wins.  Hedges are capped at ``hedge_ratio``
+of the calls so a slow upstream is not flooded with duplicates.
+
+Per-API options (read from ``api_configs.json``):
+
+    timeout              request timeout in seconds (default: REQUEST_TIMEOUT in the base config, else 30)
+    adaptive_timeout     true to derive the timeout from the rolling p95 (default false)
+    timeout_multiplier   adaptive timeout = p95 * multiplier (default 3)
+    min_timeout          lower bound of the adaptive timeout in seconds (default 1)
+    hedge                true to hedge slow GET requests (default false)
+    hedge_delay_ms       fixed hedge delay (default: rolling p95)
+    hedge_ratio          maximum fraction of calls that may be hedged (default 0.1)
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+DEFAULT_TIMEOUT = 30.0
+LATENCY_WINDOW = 200  # recent samples kept per API
+MIN_SAMPLES = 20  # samples needed before the p95 is trusted
+REFRESH_EVERY = 10  # recompute the p95 after this many new samples
+
+_deadline = contextvars.ContextVar("tool_call_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+@contextlib.contextmanager
+def deadline_scope(seconds):
+    """Bound everything called inside the block to ``seconds`` from now (nested scopes only tighten)"""
+    if not seconds or seconds <= 0:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_left():
+    """Seconds until the current deadline, or None without one"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def deadline_passed():
+    """Whether the current call's deadline has passed (False without one)"""
+    left = time_left()
+    return left is not None and left <= 0
+
+
+def without_deadline():
+    """Copy of the current context without a deadline, for work shared by several calls"""
+    context = contextvars.copy_context()
+    context.run(_deadline.set, None)
+    return context
+
+
+async def within_deadline(awaitable):
+    """Await ``awaitable`` for at most the time left; raises DeadlineExceeded when the deadline passes first"""
+    left = time_left()
+    if left is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, max(left, 0))
+    except asyncio.TimeoutError:
+        if time_left() > 0:
+            raise  # a timeout of the awaited call itself
+        raise DeadlineExceeded("deadline exceeded while waiting for the response") from None
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies with a periodically refreshed p95"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = [0.0] * window
+        self._count = 0
+        self._since_refresh = 0
+        self._p95 = None
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples[self._count % len(self._samples)] = seconds
+            self._count += 1
+            self._since_refresh += 1
+            if self._count >= MIN_SAMPLES and (self._p95 is None or self._since_refresh >= REFRESH_EVERY):
+                samples = sorted(self._samples[:min(self._count, len(self._samples))])
+                self._p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+                self._since_refresh = 0
+
+    @property
+    def p95(self):
+        """Seconds, or None until MIN_SAMPLES calls have been recorded"""
+        return self._p95
+
+
+class TimeoutPolicy:
+    """Per-API request timeout and hedging decisions"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, adaptive=False, multiplier=3.0, min_timeout=1.0,
+                 hedge=False, hedge_delay=None, hedge_ratio=0.1):
+        self.static_timeout = timeout
+        self.adaptive = adaptive
+        self.multiplier = multiplier
+        self.min_timeout = min_timeout
+        self.hedge = hedge
+        self.hedge_delay_fixed = hedge_delay
+        self.hedge_ratio = hedge_ratio
+        self.latency = LatencyTracker()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.deadline_exceeded = 0
+
+    @classmethod
+    def from_config(cls, api_config, base_config=None):
+        base_config = base_config or {}
+        hedge_delay_ms = api_config.get("hedge_delay_ms")
+        return cls(
+            timeout=float(api_config.get("timeout", base_config.get("REQUEST_TIMEOUT", DEFAULT_TIMEOUT))),
+            adaptive=bool(api_config.get("adaptive_timeout", False)),
+            multiplier=float(api_config.get("timeout_multiplier", 3.0)),
+            min_timeout=float(api_config.get("min_timeout", 1.0)),
+            hedge=bool(api_config.get("hedge", False)),
+            hedge_delay=float(hedge_delay_ms) / 1000 if hedge_delay_ms is not None else None,
+            hedge_ratio=float(api_config.get("hedge_ratio", 0.1)),
+        )
+
+    def timeout(self):
+        """Current per-request timeout, before any deadline is applied"""
+        p95 = self.latency.p95
+        if not self.adaptive or p95 is None:
+            return self.static_timeout
+        return min(self.static_timeout, max(self.min_timeout, p95 * self.multiplier))
+
+    def budget(self):
+        """Timeout for a request starting now; raises DeadlineExceeded when the call has no time left"""
+        timeout = self.timeout()
+        left = time_left()
+        if left is not None:
+            if left <= 0:
+                raise self.exceeded("deadline exceeded before the request was sent")
+            timeout = min(timeout, left)
+        return timeout
+
+    def exceeded(self, message):
+        """Count a call that ran out of time; returns the DeadlineExceeded to raise"""
+        with self._lock:
+            self.deadline_exceeded += 1
+        return DeadlineExceeded(message)
+
+    def record(self, seconds):
+        self.latency.record(seconds)
+
+    def hedge_delay(self, timeout):
+        """Delay after which to hedge this call, or None to send it once"""
+        with self._lock:
+            self.calls += 1
+            if not self.hedge or self.hedged >= self.calls * self.hedge_ratio:
+                return None
+        delay = self.hedge_delay_fixed if self.hedge_delay_fixed is not None else self.latency.p95
+        if delay is None or delay >= timeout:
+            return None
+        return delay
+
+    def _hedge_started(self):
+        with self._lock:
+            self.hedged += 1
+
+    def _hedge_won(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def run_hedged(self, fn, delay, executor):
+        """Run ``fn`` on ``executor``; if it is still running after ``delay``, race a second copy"""
+        primary = executor.submit(fn)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        self._hedge_started()
+        secondary = executor.submit(fn)
+        pending = {primary, secondary}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is secondary:
+                        self._hedge_won()
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def arun_hedged(self, coro_fn, delay):
+        """Await ``coro_fn()``; if it is still running after ``delay``, race a second copy and cancel the loser"""
+        primary = asyncio.ensure_future(coro_fn())
+        pending = {primary}
+        error = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+            self._hedge_started()
+            secondary = asyncio.ensure_future(coro_fn())
+            pending = {primary, secondary}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            self._hedge_won()
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # also reached when the caller is cancelled, before or after the hedge was sent
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        p95 = self.latency.p95
+        with self._lock:
+            return {
+                "timeout_seconds": round(self.timeout(), 3),
+                "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "deadline_exceeded": self.deadline_exceeded,
+            }
@@ -0,0 +1,64 @@
+import json
+
+from api_store import APIConfigStore
+
+
+def config(name):
+    return {"api_name": name, "api_url": f"http://example.com/{name}"}
+
+
+def edit_snapshot(path, configs):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(configs, f)
+
+
+def names(path):
+    store = APIConfigStore(str(path))
+    store.refresh()
+    return sorted(cfg["api_name"] for cfg in store.all())
+
+
+def test_hand_edit_is_not_undone_by_an_old_delete(tmp_path):
+    path = tmp_path / "api_configs.json"
+    store = APIConfigStore(str(path))
+    store.put(config("w"))
+    store.put(config("k"))
+    store.delete("w")
+    edit_snapshot(path, [config("w"), config("k")])
+    assert names(path) == ["k", "w"]
+
+
+def test_hand_written_snapshot_replaces_journaled_configs(tmp_path):
+    path = tmp_path / "api_configs.json"
+    store = APIConfigStore(str(path))
+    store.put(config("c"))
+    store.put(config("d"))
+    edit_snapshot(path, [config("z")])
+    assert names(path) == ["z"]
+    # the running store sees the edit too and keeps journaling on top of it
+    store.refresh()
+    store.put(config("y"))
+    assert names(path) == ["y", "z"]
+
+
+def test_journal_without_header_is_replayed(tmp_path):
+    path = tmp_path / "api_configs.json"
+    edit_snapshot(path, [config("a")])
+    with open(f"{path}.journal", "w", encoding="utf-8") as f:
+        f.write(json.dumps({"op": "put", "config": config("b")}) + "\n")
+        f.write(json.dumps({"op": "del", "api_name": "a"}) + "\n")
+    assert names(path) == ["b"]
+    assert names(path) == ["b"]  # folded into the snapshot, not replayed twice
+
+
+def test_writers_share_the_journal_and_compaction(tmp_path):
+    path = tmp_path / "api_configs.json"
+    gui, server = APIConfigStore(str(path), compact_after=3), APIConfigStore(str(path), compact_after=3)
+    gui.put(config("a"))
+    server.put(config("b"))  # replays the GUI's line before appending its own
+    gui.put(config("c"))  # third line: folded into the snapshot
+    assert len(json.loads(path.read_text())) == 3
+    server.refresh()
+    assert sorted(cfg["api_name"] for cfg in server.all()) == ["a", "b", "c"]
+    assert server.delete("a") and not server.delete("a")
+    assert names(path) == ["b", "c"]
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bulkhead import Bulkhead, BulkheadFull
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(4)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def test_calls_beyond_the_queue_are_rejected(executor):
+    bulkhead = Bulkhead("a", max_concurrent=1, max_queued=1)
+    release = threading.Event()
+
+    async def scenario():
+        calls = [asyncio.ensure_future(bulkhead.run(executor, release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(BulkheadFull, match="1 running, 1 queued"):
+            await bulkhead.run(executor, release.wait, 5)
+        release.set()
+        return await asyncio.gather(*calls)
+
+    assert asyncio.run(scenario()) == [True, True]
+    stats = bulkhead.stats()
+    assert stats["bulkhead_rejected"] == 1 and stats["bulkhead_active"] == 0 and stats["bulkhead_queued"] == 0
+
+
+def test_abandoned_call_keeps_its_slot_until_the_worker_finishes(executor):
+    bulkhead = Bulkhead("a", max_concurrent=1, max_queued=0)
+    release = threading.Event()
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(bulkhead.run(executor, release.wait, 5), 0.05)
+        with pytest.raises(BulkheadFull):
+            await bulkhead.run(executor, lambda: None)
+        release.set()
+        await asyncio.sleep(0.05)
+        return await bulkhead.run(executor, lambda: "ok")
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+def test_limits_fall_back_to_the_base_config():
+    bulkhead = Bulkhead.from_config({"api_name": "a", "bulkhead_max_queued": 0},
+                                    {"BULKHEAD_MAX_CONCURRENT": 2, "BULKHEAD_MAX_QUEUED": 5})
+    assert (bulkhead.max_concurrent, bulkhead.max_queued) == (2, 0)
+    assert Bulkhead.from_config({"api_name": "a"}, workers=16).max_concurrent == 4
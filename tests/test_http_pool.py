@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("requests")
+
+from http_pool import AsyncClientPool, InflightLimiter, SessionPool
+
+
+def test_saturated_host_does_not_starve_other_hosts():
+    async def scenario():
+        limiter = InflightLimiter(max_inflight=2, max_per_host=1)
+
+        async def request(url, seconds):
+            async with limiter.limit(url):
+                await asyncio.sleep(seconds)
+
+        # one slow request holds the slow host's only slot, more queue behind it
+        slow = [asyncio.create_task(request("http://slow.example/api", 0.5)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        await request("http://fast.example/api", 0)
+        waited = time.monotonic() - started
+        for task in slow:
+            task.cancel()
+        await asyncio.gather(*slow, return_exceptions=True)
+        return waited
+
+    assert asyncio.run(scenario()) < 0.2
+
+
+def test_per_host_cap():
+    async def scenario():
+        limiter = InflightLimiter(max_inflight=8, max_per_host=2)
+        peak = 0
+
+        async def request():
+            nonlocal peak
+            async with limiter.limit("http://api.example/x"):
+                peak = max(peak, limiter.stats()["inflight"]["api.example"])
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(request() for _ in range(6)))
+        return peak
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_slot_wait_timeout_leaks_no_slot():
+    async def scenario():
+        limiter = InflightLimiter(max_inflight=1, max_per_host=1)
+        async with limiter.limit("http://api.example/x"):
+            with pytest.raises(TimeoutError):
+                async with limiter.limit("http://api.example/x", timeout=0.05):
+                    pass
+            with pytest.raises(TimeoutError):
+                async with limiter.limit("http://other.example/x", timeout=0.05):  # global slot taken
+                    pass
+        # both slots were given back
+        for url in ("http://api.example/x", "http://other.example/x"):
+            async with limiter.limit(url, timeout=0.05):
+                pass
+        return limiter.stats()["inflight"]
+
+    assert asyncio.run(scenario()) == {}
+
+
+def test_retain_closes_unused_clients_after_their_requests():
+    pytest.importorskip("httpx")
+
+    async def scenario():
+        pool = AsyncClientPool()
+        old, new = {"pool_size": 2}, {"pool_size": 4}
+        async with pool.use(old) as busy:
+            idle = pool.get(new)
+            await pool.retain([{"pool_size": 8}])
+            assert idle.is_closed and not busy.is_closed  # still serving a request
+        assert busy.is_closed
+        kept = pool.get(new)
+        await pool.retain([new])
+        assert not kept.is_closed
+        await pool.aclose()
+        return kept.is_closed, pool.stats()
+
+    assert asyncio.run(scenario()) == (True, {"clients": 0, "retiring": 0})
+
+
+def test_sessions_in_use_are_not_reaped():
+    pool = SessionPool()
+    config = {"idle_timeout": 0.05}
+    with pool.use("http://api.example/x", config) as session:
+        time.sleep(0.1)  # a request running longer than idle_timeout
+        assert pool.reap_idle() == 0
+        assert pool.stats()[0]["in_use"] == 1
+    assert pool.reap_idle() == 0  # idle time starts when the request finishes
+    time.sleep(0.1)
+    assert pool.reap_idle() == 1
+    assert pool.get("http://api.example/x", config) is not session
+    pool.close()
@@ -0,0 +1,26 @@
+import atexit
+import logging
+
+from log_utils import setup_logging
+
+
+def test_http_client_request_lines_are_not_logged(tmp_path):
+    root = logging.getLogger()
+    before = list(root.handlers)
+    log_file = tmp_path / "tool.log"
+    listener = setup_logging(str(log_file))
+    try:
+        logging.getLogger("httpx").info("HTTP Request: GET http://api.example/x?appid=secret123")
+        logging.getLogger("httpcore.http11").info("send_request_headers.started")
+        logging.getLogger("httpx").warning("HTTP warning for http://api.example/x?api_key=secret123")
+        logging.getLogger("universal_mcp").info("请求 URL: http://api.example/x")
+    finally:
+        listener.stop()
+        atexit.unregister(listener.stop)
+        for handler in root.handlers[:]:
+            if handler not in before:
+                root.removeHandler(handler)
+    text = log_file.read_text(encoding="utf-8")
+    assert "HTTP Request" not in text and "send_request_headers" not in text
+    assert "api_key=***" in text and "secret123" not in text
+    assert "请求 URL" in text
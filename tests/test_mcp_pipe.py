@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("websockets")
+pytest.importorskip("dotenv")
+
+
+@pytest.fixture
+def mcp_pipe(monkeypatch):
+    import mcp_pipe
+    monkeypatch.setattr(mcp_pipe, "MAX_LINE_BYTES", 1024)
+    return mcp_pipe
+
+
+def test_import_has_no_side_effects(tmp_path):
+    env = {key: value for key, value in os.environ.items() if key != "MCP_ENDPOINT"}
+    env["XIAOZHI_MCP_CONFIG"] = str(tmp_path / "missing.json")
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = ("import logging, os, mcp_pipe; "
+            "print('MCP_ENDPOINT' in os.environ, len(logging.getLogger().handlers))")
+    output = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    assert output.split() == ["False", "0"]
+    assert not (tmp_path / "mcp_pipe.log").exists()
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, data, text=False):
+        self.sent.append(json.loads(data))
+
+
+def child_script(tmp_path, lines):
+    """A child printing ``lines`` (JSON values) and exiting"""
+    script = tmp_path / "child.py"
+    script.write_text("import json, sys\n"
+                      f"for line in {lines!r}:\n"
+                      "    sys.stdout.write(json.dumps(line) + '\\n')\n"
+                      "sys.stdout.flush()\n")
+    return str(script)
+
+
+def big_response(request_id):
+    return {"jsonrpc": "2.0", "id": request_id, "result": {"text": "x" * 5000}}
+
+
+def test_read_line_drops_an_oversize_line(mcp_pipe):
+    async def scenario():
+        reader = asyncio.StreamReader(limit=1024)
+        lines = []
+
+        async def feed():
+            # the oversize line arrives in pieces, so its newline is not buffered yet
+            line = json.dumps(big_response(1)).encode() + b"\n"
+            for start in range(0, len(line), 700):
+                reader.feed_data(line[start:start + 700])
+                await asyncio.sleep(0)
+            reader.feed_data(b'{"jsonrpc": "2.0", "id": 2, "result": {}}\n')
+            reader.feed_eof()
+
+        feeder = asyncio.create_task(feed())
+        while True:
+            try:
+                line = await mcp_pipe.read_line(reader)
+            except mcp_pipe.LineTooLong as e:
+                lines.append(mcp_pipe.oversize_reply(e))
+                continue
+            if not line:
+                break
+            lines.append(line)
+        await feeder
+        return [json.loads(line) for line in lines]
+
+    reply, response = asyncio.run(scenario())
+    assert reply["id"] == 1 and reply["error"]["code"] == -32603
+    assert response == {"jsonrpc": "2.0", "id": 2, "result": {}}
+
+
+def test_oversize_response_does_not_end_the_session(mcp_pipe, tmp_path):
+    notification = {"jsonrpc": "2.0", "method": "notifications/message", "params": {"data": "y" * 5000}}
+    script = child_script(tmp_path, [big_response(1), notification, {"jsonrpc": "2.0", "id": 2, "result": {}}])
+
+    async def scenario():
+        process = await mcp_pipe.start_mcp_process(script)
+        websocket = FakeWebSocket()
+        await mcp_pipe.pipe_process_to_websocket(process, websocket)
+        await process.wait()
+        return websocket.sent
+
+    error, response = asyncio.run(scenario())
+    assert error["id"] == 1 and "too large" in error["error"]["message"]
+    assert response["id"] == 2
+
+
+def echo_script(tmp_path, first):
+    """A child printing ``first`` and then echoing its stdin"""
+    script = tmp_path / "echo.py"
+    script.write_text("import json, sys\n"
+                      f"sys.stdout.write(json.dumps({first!r}) + '\\n')\n"
+                      "sys.stdout.flush()\n"
+                      "for line in sys.stdin:\n"
+                      "    sys.stdout.write(line)\n"
+                      "    sys.stdout.flush()\n")
+    return str(script)
+
+
+async def wait_for_messages(websocket, count):
+    for _ in range(200):
+        if len(websocket.sent) >= count:
+            return websocket.sent
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"got {websocket.sent}")
+
+
+def test_persistent_child_keeps_pumping_after_an_oversize_line(mcp_pipe, tmp_path):
+    child = mcp_pipe.MCPChild(echo_script(tmp_path, big_response(1)))
+
+    async def scenario():
+        websocket = FakeWebSocket()
+        await child.attach(websocket)
+        try:
+            await wait_for_messages(websocket, 1)
+            await child.write(b'{"jsonrpc": "2.0", "id": 2, "result": {}}')
+            return await wait_for_messages(websocket, 2), child.running
+        finally:
+            await child.stop()
+
+    (error, response), running = asyncio.run(scenario())
+    assert error["id"] == 1 and error["error"]["code"] == -32603
+    assert response["id"] == 2 and running
+
+
+def test_failed_pump_restarts_the_child(mcp_pipe, tmp_path, monkeypatch):
+    monkeypatch.setattr(mcp_pipe, "CHILD_RESTART_DELAY", 0.01)
+    child = mcp_pipe.MCPChild(echo_script(tmp_path, {"jsonrpc": "2.0", "method": "ready"}))
+    deliver = child._deliver
+    failures = []
+
+    async def failing_deliver(data):
+        if not failures:
+            failures.append(data)
+            raise RuntimeError("boom")
+        await deliver(data)
+
+    child._deliver = failing_deliver
+
+    async def scenario():
+        await child.ensure_running()
+        first = child.process
+        try:
+            for _ in range(200):
+                if child.process is not first and child.running:
+                    break
+                await asyncio.sleep(0.01)
+            websocket = FakeWebSocket()
+            await child.attach(websocket)
+            await child.write(b'{"jsonrpc": "2.0", "id": 3, "result": {}}')
+            return first.returncode, child.restarts, await wait_for_messages(websocket, 2)
+        finally:
+            await child.stop()
+
+    returncode, restarts, sent = asyncio.run(scenario())
+    assert returncode is not None and restarts == 1
+    assert sent == [{"jsonrpc": "2.0", "method": "ready"}, {"jsonrpc": "2.0", "id": 3, "result": {}}]
@@ -0,0 +1,52 @@
+import pytest
+
+from request_plan import compile_plan, field_specs
+
+
+def plan(request_format, **config):
+    return compile_plan({"api_name": "api", "api_url": "http://api.example/x", "method": "GET",
+                         "request_format": request_format, **config})
+
+
+def test_typed_arguments_are_coerced_and_defaults_filled():
+    p = plan({"city": "string", "days": "int", "hourly": "bool", "filter": "object"})
+    params, extra = p.bind({"days": "3", "hourly": "yes"})
+    assert params == {"city": "", "days": 3, "hourly": True, "filter": {}} and extra == ()
+
+
+def test_legacy_forms():
+    p = plan({"city": "string", "days": "number"})
+    assert p.bind({"kwargs": "北京, 2.5 extra"}) == ({"city": "北京", "days": 2.5}, ["extra"])
+    assert p.bind({"kwargs": {"city": "上海"}})[0] == {"city": "上海", "days": 0}
+    with pytest.raises(ValueError):
+        p.bind({"kwargs": 3})
+
+
+def test_bad_values_pass_through_unless_strict():
+    p = plan({"days": "integer"})
+    assert p.bind({"days": "soon"})[0] == {"days": "soon"}
+    with pytest.raises(ValueError, match="days"):
+        p.bind({"days": "soon"}, strict=True)
+
+
+def test_required_only_when_declared():
+    specs = field_specs({"a": "string", "b": {"type": "number", "required": True}, "c": {"default": "x"}})
+    assert [(s.name, s.required, s.default) for s in specs] == [("a", False, ""), ("b", True, 0), ("c", False, "x")]
+    signature = plan({"a": "string", "b": {"type": "number", "required": True}}).signature
+    assert signature.parameters["b"].default is signature.parameters["b"].empty
+
+
+def test_api_key_placement():
+    query = plan({}, api_url="http://api.example/x?lang=zh", api_key="k123", key_location="query", key_name="key")
+    assert query.url == "http://api.example/x?lang=zh&key=k123" and not query.headers
+    assert plan({}, api_key="k123").headers == {"Authorization": "Bearer k123"}
+    body = plan({"q": "string"}, method="POST", api_key="k123", key_location="body", key_name="token")
+    assert body.payload_arg == "json" and body.bind({"q": "x"})[0] == {"q": "x", "token": "k123"}
+
+
+def test_invalid_plans():
+    with pytest.raises(ValueError):
+        plan({}, method="DELETE")
+    assert plan({"not a name": "string"}).signature is None  # legacy kwargs only
+    with pytest.raises(AttributeError):
+        plan({}).url = "http://other.example"
@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+from resilience import APIGuard, CircuitBreaker, CircuitOpenError, HALF_OPEN, OPEN
+from tail_latency import DeadlineExceeded
+
+
+def open_guard():
+    guard = APIGuard("api", breaker=CircuitBreaker(1, reset_timeout=0.05))
+    guard.record(False, 0)
+    assert guard.breaker.state == OPEN
+    time.sleep(0.06)
+    return guard
+
+
+def test_cancelled_half_open_probe_is_released():
+    guard = open_guard()
+
+    async def scenario():
+        probe = asyncio.create_task(guard.acall(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        assert guard.breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            await guard.acall(lambda: asyncio.sleep(0))
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        # the next call is admitted as a new probe and closes the circuit
+        return await guard.acall(lambda: asyncio.sleep(0, "ok"))
+
+    assert asyncio.run(scenario()) == "ok"
+    assert guard.breaker.state == "closed"
+
+
+def test_failed_probe_reopens_the_circuit():
+    guard = open_guard()
+
+    def fail():
+        raise ConnectionError("upstream down")
+
+    with pytest.raises(ConnectionError):
+        guard.call(fail)
+    assert guard.breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        guard.call(lambda: "never sent")
+
+
+def test_deadline_exceeded_is_not_an_upstream_failure():
+    guard = APIGuard("api", breaker=CircuitBreaker(1))
+
+    def out_of_time():
+        raise DeadlineExceeded("deadline exceeded before the request was sent")
+
+    with pytest.raises(DeadlineExceeded):
+        guard.call(out_of_time)
+    assert guard.breaker.state == "closed"
+    assert guard.breaker.failures == 0
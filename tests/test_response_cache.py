@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+
+from disk_cache import DiskCache, DiskPartition
+from response_cache import CachePartition, ResponseCache
+
+
+def disk_partition(path):
+    disk = DiskCache(str(path), compact_interval=0)
+    return disk, DiskPartition(disk, "api", "fp")
+
+
+def test_async_path_keeps_sqlite_off_the_event_loop(tmp_path):
+    disk, part = disk_partition(tmp_path / "cache.db")
+    loop_threads = []
+    calls = []
+
+    def record(name, fn):
+        def wrapper(*args):
+            calls.append((name, threading.current_thread()))
+            return fn(*args)
+        return wrapper
+
+    part.get = record("get", part.get)
+    part.put = record("put", part.put)
+    cache = CachePartition("api", 60, disk=part)
+
+    async def scenario():
+        loop_threads.append(threading.current_thread())
+        assert await cache.aget({"q": 1}) == (False, None)
+        cache.put({"q": 1}, {"v": 1}, background=True)
+        assert await cache.aget({"q": 1}) == (True, {"v": 1})  # served from memory
+
+    asyncio.run(scenario())
+    disk.close()  # waits for the pending write
+    assert [name for name, _ in calls] == ["get", "put"]
+    assert all(thread is not loop_threads[0] for _, thread in calls)
+
+    # a fresh process finds the entry written in the background
+    disk, part = disk_partition(tmp_path / "cache.db")
+    assert CachePartition("api", 60, disk=part).get({"q": 1}) == (True, {"v": 1})
+    disk.close()
+
+
+def test_entries_expire_after_the_ttl():
+    cache = CachePartition("api", 0.05)
+    cache.put({"q": 1}, {"v": 1})
+    assert cache.get({"q": 1}) == (True, {"v": 1})
+    time.sleep(0.06)
+    assert cache.get({"q": 1}) == (False, None)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 0)
+
+
+def test_keys_ignore_parameter_order():
+    cache = CachePartition("api", 60)
+    cache.put({"a": 1, "b": 2}, "x")
+    assert cache.get({"b": 2, "a": 1}) == (True, "x")
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = CachePartition("api", 60, max_entries=2)
+    cache.put({"q": 1}, 1)
+    cache.put({"q": 2}, 2)
+    cache.get({"q": 1})  # now the most recently used
+    cache.put({"q": 3}, 3)
+    assert cache.get({"q": 2}) == (False, None)
+    assert cache.get({"q": 1}) == (True, 1) and cache.get({"q": 3}) == (True, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_are_bounded_by_size():
+    cache = CachePartition("api", 60, max_bytes=100)
+    cache.put({"q": "big"}, "x" * 200)  # larger than the whole partition
+    cache.put({"q": 1}, "y" * 60)
+    cache.put({"q": 2}, "z" * 60)  # pushes the first one out
+    assert cache.get({"q": "big"}) == (False, None)
+    assert cache.get({"q": 1}) == (False, None) and cache.get({"q": 2}) == (True, "z" * 60)
+    assert cache.stats()["bytes"] <= 100
+
+
+def test_partitions_follow_the_api_config():
+    registry = ResponseCache()
+    config = {"api_name": "api", "cache_ttl": 30}
+    partition = registry.partition(config)
+    assert registry.partition(config) is partition
+    assert registry.partition({**config, "cache_max_entries": 5}) is not partition
+    assert registry.partition({**config, "cache_ttl": 0}) is None and registry.stats() == {}
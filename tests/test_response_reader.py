@@ -0,0 +1,41 @@
+import io
+
+from response_reader import JSONBodyReader, read_json, salvage_json_prefix
+
+
+class FakeResponse:
+    def __init__(self, body, content_type="application/json"):
+        self.headers = {"Content-Type": content_type}
+        self._body = io.BytesIO(body)
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        return iter(lambda: self._body.read(chunk_size), b"")
+
+    def close(self):
+        self.closed = True
+
+
+def test_complete_body_is_not_truncated():
+    response = FakeResponse('{"city": "北京"}'.encode("gbk"), "application/json; charset=gbk")
+    assert read_json(response, max_bytes=100, chunk_size=4) == ({"city": "北京"}, False)
+    assert response.closed
+
+
+def test_body_over_the_cap_keeps_complete_members():
+    response = FakeResponse(b'[{"id": 1}, {"id": 2}, {"id": 3}]')
+    assert read_json(response, max_bytes=22, chunk_size=8) == ([{"id": 1}, {"id": 2}], True)
+    assert response.closed  # the rest of the body is not read
+
+
+def test_salvage_json_prefix():
+    assert salvage_json_prefix('{"a": 1, "b": [1, 2], "c": "cut') == {"a": 1, "b": [1, 2]}
+    assert salvage_json_prefix('{"a": 1, "b"') == {"a": 1}
+    assert salvage_json_prefix('[1, 2, 3]') == [1, 2, 3]
+    assert salvage_json_prefix('"just a string') is None
+
+
+def test_reader_salvages_a_cut_multibyte_character():
+    reader = JSONBodyReader()
+    reader.feed('["北京", "上海"]'.encode("utf-8")[:-4])
+    assert reader.finish(truncated=True) == ["北京"]
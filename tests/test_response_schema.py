@@ -0,0 +1,78 @@
+from response_schema import ResponseProjector, ResponseValidator, compile_extractor, compile_validator
+
+FORMAT = {"data": {"title": "string", "tags": ["string"]}, "items": [{"id": "number"}]}
+
+
+def test_projection_keeps_declared_fields_only():
+    extract = compile_extractor(FORMAT)
+    response = {
+        "data": {"title": "t", "tags": ["a", "b"], "body": "x" * 100},
+        "items": [{"id": 1, "raw": {}}, {"id": 2}],
+        "meta": {"page": 1},
+    }
+    assert extract(response) == {"data": {"title": "t", "tags": ["a", "b"]}, "items": [{"id": 1}, {"id": 2}]}
+    assert extract({"data": {}}) == {"data": {}}  # missing fields are not invented
+
+
+def test_caps_apply_to_declared_and_undeclared_values():
+    extract = compile_extractor({"items": ["string"], "extra": "object"}, max_items=2, max_string_length=3)
+    response = {"items": ["abcdef", "b", "c"], "extra": {"list": [1, 2, 3], "text": "long text"}}
+    assert extract(response) == {"items": ["abc", "b"], "extra": {"list": [1, 2], "text": "lon"}}
+
+
+def test_shape_mismatch_passes_through():
+    extract = compile_extractor(FORMAT)
+    assert extract({"data": "oops", "items": {"id": 1}}) == {"data": "oops", "items": {"id": 1}}
+    assert extract([1, 2]) == [1, 2]
+    assert compile_extractor({})({"anything": 1}) == {"anything": 1}
+
+
+def test_projector_counts_bytes_saved():
+    assert ResponseProjector.from_config({"response_format": FORMAT}) is None
+    projector = ResponseProjector.from_config({"response_format": FORMAT, "project_response": True, "max_items": "1"})
+    assert projector({"items": [{"id": 1}, {"id": 2}], "meta": "x" * 50}) == {"items": [{"id": 1}]}
+    stats = projector.stats()
+    assert stats["projected"] == 1
+    assert stats["projection_bytes_saved"] == stats["projection_bytes_in"] - stats["projection_bytes_out"] > 50
+
+
+def test_validator_reports_missing_fields_and_wrong_types():
+    validate = compile_validator(FORMAT)
+    assert validate({"data": {"title": "t", "tags": ["a"]}, "items": [{"id": 1}]}) == []
+    assert validate({"data": {"title": None, "tags": []}, "items": []}) == []  # nulls are accepted
+    assert validate({"data": {"title": 3, "tags": "a"}, "items": [{"id": "1"}, {}]}) == [
+        ("data.title", "string", "number"),
+        ("data.tags", "array", "string"),
+        ("items[0].id", "number", "string"),
+        ("items[1].id", "present", None),
+    ]
+    assert validate([]) == [("$", "object", "array")]
+
+
+def test_validator_checks_only_the_first_array_items():
+    validate = compile_validator([{"id": "integer"}], array_items=2)
+    assert validate([{"id": 1}, {"id": 2}, {"id": "x"}]) == []
+    assert validate([{"id": True}]) == [("[0].id", "integer", "boolean")]
+
+
+def test_drift_is_counted_per_field():
+    assert ResponseValidator.from_config({"response_format": FORMAT}) is None
+    validator = ResponseValidator.from_config({"response_format": {"temp": "number"}}, default_rate=1)
+    validator({"temp": 20})
+    validator({"temp": "20"})
+    validator({})
+    validator({})
+    assert validator.stats() == {
+        "validated": 4,
+        "schema_drift": 3,
+        "drift_fields": {"temp: 期望 number，实际为 string": 1, "temp: 缺少字段": 2},
+    }
+
+
+def test_drift_fields_are_bounded():
+    validator = ResponseValidator({"a": "string"}, 1.0)
+    validator.MAX_PATHS = 2
+    for value in (1, True, [], {}):
+        validator({"a": value})
+    assert list(validator.stats()["drift_fields"]) == ["a: 期望 string，实际为 number", "a: 期望 string，实际为 boolean"]
+    assert validator.stats()["schema_drift"] == 4
@@ -0,0 +1,42 @@
+import asyncio
+
+from singleflight import AsyncSingleFlight
+
+
+def test_cancelling_the_leader_does_not_cancel_followers():
+    async def scenario():
+        flight = AsyncSingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.1)
+            return "value"
+
+        leader = asyncio.create_task(flight.do(("api", "key"), fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do(("api", "key"), fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower, flight.coalesced["api"]
+
+    assert asyncio.run(scenario()) == ("value", 1)
+
+
+def test_shared_call_is_cancelled_when_every_caller_leaves():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        cancelled = asyncio.Event()
+
+        async def fetch():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        caller = asyncio.create_task(flight.do(("api", "key"), fetch))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return flight._calls
+
+    assert asyncio.run(scenario()) == {}
@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+
+from tail_latency import TimeoutPolicy
+
+
+def test_cancelled_hedged_call_cancels_the_primary():
+    async def scenario():
+        policy = TimeoutPolicy(hedge=True, hedge_delay=1.0)
+        started = []
+
+        async def request():
+            task = asyncio.current_task()
+            started.append(task)
+            await asyncio.sleep(10)
+
+        caller = asyncio.create_task(policy.arun_hedged(request, 1.0))
+        await asyncio.sleep(0.05)
+        caller.cancel()  # still inside the hedge delay
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+        return [task.cancelled() for task in started]
+
+    assert asyncio.run(scenario()) == [True]
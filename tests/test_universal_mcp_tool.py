@@ -0,0 +1,198 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("mcp")
+pytest.importorskip("httpx")
+
+import config_manager
+
+
+class StubAPI:
+    """Local upstream answering every path with ``body`` after ``delay`` seconds"""
+
+    def __init__(self):
+        self.delay = 0.0
+        self.body = b'{"ok": 1}'
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.delay)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(stub.body)))
+                self.end_headers()
+                self.wfile.write(stub.body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api"
+
+
+@pytest.fixture
+def stub():
+    api = StubAPI()
+    yield api
+    api.server.shutdown()
+
+
+@pytest.fixture
+def make_tool(tmp_path, monkeypatch, stub):
+    """Build a tool in ``tmp_path`` from base config overrides and per-API overrides"""
+    monkeypatch.chdir(tmp_path)
+    tools = []
+
+    def make(base=None, **api):
+        config_path = tmp_path / "base.json"
+        config_path.write_text(json.dumps({"MCP_ENDPOINT": "ws://127.0.0.1:1", "CONFIG_WATCH": False,
+                                           "LOG_SAMPLE_RATE": 0, **(base or {})}))
+        monkeypatch.setattr(config_manager, "CONFIG_PATH", config_path)
+        (tmp_path / "api_configs.json").write_text(json.dumps([{
+            "api_name": "a", "api_url": stub.url, "method": "GET", "request_format": {"q": "string"},
+            "response_format": {}, "description": "a", "coalesce": False, **api}]))
+        import universal_mcp_tool  # imported here so its log file lands in tmp_path
+        tool = universal_mcp_tool.UniversalMCPTool()
+        tools.append(tool)
+        return tool
+
+    yield make
+    for tool in tools:
+        tool.worker_pool.shutdown(wait=False)
+        tool.hedge_pool.shutdown(wait=False)
+
+
+def test_waiting_for_a_host_slot_is_not_an_upstream_failure(make_tool, stub):
+    stub.delay = 0.3
+    tool = make_tool({"EXECUTION_MODE": "async", "MAX_INFLIGHT_PER_HOST": 1},
+                     timeout=0.45, breaker_failure_threshold=2)
+
+    async def scenario():
+        return await asyncio.gather(*(tool.callers["a"](q=str(i)) for i in range(3)))
+
+    results = asyncio.run(scenario())
+    assert [r["success"] for r in results] == [True, True, True]
+    stats = tool._tool_stats()["a"]
+    assert stats["breaker_state"] == "closed" and stats["consecutive_failures"] == 0
+
+
+def test_slot_wait_is_bounded_by_the_call_deadline(make_tool, stub):
+    stub.delay = 0.3
+    tool = make_tool({"EXECUTION_MODE": "async", "MAX_INFLIGHT_PER_HOST": 1, "TOOL_CALL_TIMEOUT": 0.45},
+                     breaker_failure_threshold=1)
+
+    async def scenario():
+        return await asyncio.gather(*(tool.callers["a"](q=str(i)) for i in range(3)))
+
+    results = asyncio.run(scenario())
+    assert results[0]["success"]
+    assert all("deadline exceeded" in r["error"] for r in results[1:])
+    assert tool._tool_stats()["a"]["breaker_state"] == "closed"
+
+
+def test_call_many_reports_a_bad_timeout_on_its_item(make_tool):
+    tool = make_tool()
+    calls = [{"api_name": "a", "args": {"q": "1"}, "timeout": "soon"},
+             {"api_name": "a", "args": {"q": "2"}, "timeout": 0},
+             {"api_name": "a", "args": {"q": "3"}}]
+    results = asyncio.run(tool.call_many(calls))
+    assert [r["success"] for r in results] == [False, False, True]
+    assert "timeout" in results[0]["error"] and "timeout" in results[1]["error"]
+
+
+def serve_with(tool, monkeypatch, scenario):
+    """Run the tool with ``scenario`` in place of the stdio server; returns what it returned"""
+    outcome = []
+
+    async def serve():
+        outcome.append(await scenario())
+
+    monkeypatch.setattr(tool, "_serve_stdio", serve)
+    tool.run()
+    return outcome[0]
+
+
+def test_call_many_declares_its_items(make_tool, monkeypatch):
+    tool = make_tool()
+
+    async def scenario():
+        tools = {t.name: t for t in await tool.mcp.list_tools()}
+        result = await tool.mcp.call_tool("call_many", {"calls": [{"api_name": "a", "args": {"q": "1"}}]})
+        return tools["call_many"].inputSchema["properties"]["calls"], json.loads(result[0][0].text)
+
+    schema, result = serve_with(tool, monkeypatch, scenario)
+    assert schema["type"] == "array" and schema["items"]["type"] == "object"
+    assert result["success"] and result["results"][0]["result"] == {"ok": 1}
+
+
+def test_async_clients_are_closed_on_shutdown(make_tool, monkeypatch):
+    tool = make_tool({"EXECUTION_MODE": "async"})
+
+    async def scenario():
+        assert (await tool.callers["a"](q="1"))["success"]
+        result = await tool.mcp.call_tool("get_tool_stats", {})
+        return list(tool.async_pool._clients.values()), json.loads(result[0][0].text)
+
+    clients, stats = serve_with(tool, monkeypatch, scenario)
+    assert stats["inflight"]["max_per_host"] == 8 and stats["async_clients"]["clients"] == 1
+    assert clients and all(client.is_closed for client in clients)
+
+
+def test_tool_stats_report_pooled_sessions(make_tool, monkeypatch):
+    tool = make_tool()
+
+    async def scenario():
+        assert (await tool.callers["a"](q="1"))["success"]
+        return json.loads((await tool.mcp.call_tool("get_tool_stats", {}))[0][0].text)
+
+    sessions = serve_with(tool, monkeypatch, scenario)["sessions"]
+    assert len(sessions) == 1 and sessions[0]["in_use"] == 0
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_truncated_body_is_flagged_and_not_cached(make_tool, stub, mode):
+    stub.body = b'{"a": 1, "b": "' + b"x" * 200 + b'"}'
+    tool = make_tool({"EXECUTION_MODE": mode}, max_response_bytes=64, cache_ttl=60)
+
+    async def scenario():
+        return [await tool.callers["a"](q="1") for _ in range(2)]
+
+    results = asyncio.run(scenario())
+    assert all(r["truncated"] and r["result"] == {"a": 1} for r in results)
+    assert stub.requests == 2
+
+
+def test_schema_drift_is_reported_in_tool_stats(make_tool, stub):
+    tool = make_tool({"VALIDATE_SAMPLE_RATE": 1}, response_format={"ok": "string", "name": "string"})
+    result = asyncio.run(tool.callers["a"](q="1"))
+    assert result["success"] and result["result"] == {"ok": 1}  # drift is reported, not enforced
+    stats = tool._tool_stats()["a"]
+    assert stats["validated"] == 1 and stats["schema_drift"] == 1
+    assert set(stats["drift_fields"]) == {"ok: 期望 string，实际为 number", "name: 缺少字段"}
+
+
+def test_full_bulkhead_rejects_the_call(make_tool, stub):
+    stub.delay = 0.3
+    tool = make_tool(bulkhead_max_concurrent=1, bulkhead_max_queued=0)
+
+    async def scenario():
+        return await asyncio.gather(*(tool.callers["a"](q=str(i)) for i in range(2)))
+
+    first, second = asyncio.run(scenario())
+    assert first["success"]
+    assert not second["success"] and "bulkhead full" in second["error"]
+    assert stub.requests == 1
+    assert tool._tool_stats()["a"]["bulkhead_rejected"] == 1
@@ -7,6 +7,9 @@ import sys
 import tempfile
 import requests
 from config_manager import load_config, save_config
+from api_store import APIConfigStore
+from request_plan import compile_plan
+from response_schema import get_validator, describe_issue
 
 class APITestDialog:
     """API测试对话框"""
@@ -17,6 +20,7 @@ class APITestDialog:
         self.dialog.grab_set()  # 使对话框模态
         
         self.api_config = api_config
+        self.plan = compile_plan(api_config)
         self.params = {}
         
         self.create_widgets()
@@ -43,8 +47,9 @@ class APITestDialog:
         # 创建参数输入字段
         self.param_entries = {}
         row = 0
-        for param_name, param_type in self.api_config['request_format'].items():
-            ttk.Label(params_frame, text=f"{param_name} ({param_type}):").grid(row=row, column=0, sticky="w", padx=5, pady=5)
+        for spec in self.plan.specs:
+            param_name = spec.name
+            ttk.Label(params_frame, text=f"{param_name} ({spec.type}):").grid(row=row, column=0, sticky="w", padx=5, pady=5)
             entry = ttk.Entry(params_frame, width=40)
             entry.grid(row=row, column=1, sticky="ew", padx=5, pady=5)
             self.param_entries[param_name] = entry
@@ -73,47 +78,19 @@ class APITestDialog:
     
     def test_api(self):
         """测试API"""
-        # 收集参数
-        params = {}
+        # 收集参数：空值使用类型默认值，其余按声明类型转换（与MCP工具共用请求计划）
+        values = {}
         for param_name, entry in self.param_entries.items():
             value = entry.get().strip()
-            if not value and param_name in self.api_config['request_format']:
-                # 如果参数为空，判断类型后给一个默认值
-                param_type = self.api_config['request_format'][param_name]
-                if param_type == "string":
-                    value = ""
-                elif param_type == "number":
-                    value = 0
-                elif param_type == "boolean":
-                    value = False
-                elif param_type == "object":
-                    value = {}
-                elif param_type == "array":
-                    value = []
-                else:
-                    value = None
-            
-            # 尝试转换数据类型
-            try:
-                param_type = self.api_config['request_format'][param_name]
-                if param_type == "number":
-                    if value:  # 检查值不为空
-                        if '.' in value:
-                            value = float(value)
-                        else:
-                            value = int(value)
-                elif param_type == "boolean":
-                    if isinstance(value, str):
-                        value = value.lower() in ('true', 'yes', '1', 'y')
-                elif param_type in ("object", "array"):
-                    if value and isinstance(value, str):  # 如果不为空才解析JSON
-                        value = json.loads(value)
-            except (ValueError, json.JSONDecodeError) as e:
-                self.response_text.delete(1.0, tk.END)
-                self.response_text.insert(tk.END, f"参数错误: {param_name} - {str(e)}")
-                return
-            
-            params[param_name] = value
+            if value:
+                values[param_name] = value
+        plan = self.plan
+        try:
+            params, _ = plan.bind(values, strict=True)
+        except ValueError as e:
+            self.response_text.delete(1.0, tk.END)
+            self.response_text.insert(tk.END, f"参数错误: {str(e)}")
+            return
         
         # 清空之前的响应
         self.response_text.delete(1.0, tk.END)
@@ -122,32 +99,12 @@ class APITestDialog:
         
         # 发送请求
         try:
-            method = self.api_config['method']
-            url = self.api_config['api_url']
-            
-            # 检查API密钥
-            api_key = self.api_config.get('api_key', '')
-            headers = {}
-            
-            # 如果有API密钥，尝试解析密钥设置方法
-            if api_key:
-                key_location = self.api_config.get('key_location', 'header')
-                key_name = self.api_config.get('key_name', 'Authorization')
-                
-                if key_location == 'header':
-                    headers[key_name] = f"Bearer {api_key}" if key_name.lower() == 'authorization' else api_key
-                elif key_location == 'query':
-                    if '?' in url:
-                        url += f"&{key_name}={api_key}"
-                    else:
-                        url += f"?{key_name}={api_key}"
-                elif key_location == 'body':
-                    params[key_name] = api_key
-            
-            if method == 'GET':
-                response = requests.get(url, params=params, headers=headers, timeout=10)
+            # API密钥已由请求计划放入请求头、查询参数或请求体
+            headers = dict(plan.headers)
+            if plan.method == 'GET':
+                response = requests.get(plan.url, params=params, headers=headers, timeout=10)
             else:  # POST
-                response = requests.post(url, json=params, headers=headers, timeout=10)
+                response = requests.post(plan.url, json=params, headers=headers, timeout=10)
             
             # 显示响应状态
             status_text = f"Status Code: {response.status_code} ({response.reason})\n"
@@ -176,28 +133,20 @@ class APITestDialog:
             self.response_text.insert(tk.END, f"请求错误: {str(e)}")
     
     def _validate_response(self, response):
-        """验证响应是否符合预期格式"""
+        """验证响应是否符合预期格式（含嵌套字段和类型）"""
         try:
             json_response = response.json()
-            expected_format = self.api_config['response_format']
-            
-            # 检查响应格式
-            missing_fields = []
-            for field, expected_type in expected_format.items():
-                if field not in json_response:
-                    missing_fields.append(field)
-                else:
-                    # 可以进一步检查类型，但先简单检查字段存在性
-                    pass
-            
-            # 如果有缺少的字段，显示警告
-            if missing_fields:
-                self.response_text.insert(tk.END, "\n\n⚠️ 警告：响应缺少以下预期字段：\n")
-                for field in missing_fields:
-                    self.response_text.insert(tk.END, f"- {field}\n")
-            
         except (ValueError, json.JSONDecodeError, AttributeError):
             self.response_text.insert(tk.END, "\n\n⚠️ 警告：响应不是有效的JSON格式，无法验证")
+            return
+        
+        issues = get_validator(self.api_config.get('response_format', {}) or {})(json_response)
+        
+        # 如果有缺少或类型不符的字段，显示警告
+        if issues:
+            self.response_text.insert(tk.END, "\n\n⚠️ 警告：响应与预期格式不一致：\n")
+            for issue in issues:
+                self.response_text.insert(tk.END, f"- {describe_issue(issue)}\n")
 
 class UniversalMCPGUI:
     def __init__(self):
@@ -206,23 +155,19 @@ class UniversalMCPGUI:
         self.root.geometry("800x600")
         
         self.config = load_config()
+        self.store = APIConfigStore('api_configs.json')
         self.api_configs = self.load_api_configs()
         
         self.create_widgets()
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
     def load_api_configs(self):
-        """Load API configurations from file"""
+        """Load API configurations from the config store"""
         try:
-            with open('api_configs.json', 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
-            
-    def save_api_configs(self):
-        """Save API configurations to file"""
-        with open('api_configs.json', 'w', encoding='utf-8') as f:
-            json.dump(self.api_configs, f, indent=2, ensure_ascii=False)
+            self.store.refresh()
+        except OSError:
+            pass
+        return self.store.all()
     
     def create_widgets(self):
         # Create notebook (tabs)
@@ -370,11 +315,7 @@ class UniversalMCPGUI:
         api_name = self.api_tree.item(selected[0])["values"][0]
         
         # 查找API配置
-        api_config = None
-        for config in self.api_configs:
-            if config["api_name"] == api_name:
-                api_config = config
-                break
+        api_config = self.store.get(api_name)
         
         if not api_config:
             messagebox.showerror("错误", f"找不到API '{api_name}' 的配置")
@@ -403,9 +344,9 @@ class UniversalMCPGUI:
     def save_base_config(self):
         """Save MCP endpoint and API key"""
         self.log("正在保存基本配置...")
-        new_config = {
-            "MCP_ENDPOINT": str(self.mcp_entry.get())
-        }
+        # 保留其他配置项（如执行模式、并发上限），只更新MCP端点
+        new_config = dict(self.config)
+        new_config["MCP_ENDPOINT"] = str(self.mcp_entry.get())
         save_config(new_config)
         self.config = new_config
         messagebox.showinfo("保存成功", "基本配置已保存！")
@@ -457,22 +398,15 @@ class UniversalMCPGUI:
                 api_config["key_name"] = key_name
             
             # Check if API with this name already exists
-            for i, config in enumerate(self.api_configs):
-                if config["api_name"] == api_name:
-                    # Update existing config
-                    self.api_configs[i] = api_config
-                    self.save_api_configs()
-                    self.log(f"更新API配置: {api_name}")
-                    self.refresh_api_list()
-                    messagebox.showinfo("保存成功", f"API '{api_name}' 已更新")
-                    return
-            
-            # Add new API config
-            self.api_configs.append(api_config)
-            self.save_api_configs()
-            self.log(f"添加新API配置: {api_name}")
+            existed = api_name in self.store
+            self.store.put(api_config)
             self.refresh_api_list()
-            messagebox.showinfo("保存成功", f"API '{api_name}' 已添加")
+            if existed:
+                self.log(f"更新API配置: {api_name}")
+                messagebox.showinfo("保存成功", f"API '{api_name}' 已更新")
+            else:
+                self.log(f"添加新API配置: {api_name}")
+                messagebox.showinfo("保存成功", f"API '{api_name}' 已添加")
         
         except Exception as e:
             self.log(f"保存API配置出错: {str(e)}")
@@ -491,8 +425,7 @@ class UniversalMCPGUI:
         # Confirm deletion
         if messagebox.askyesno("确认删除", f"确定要删除API '{api_name}' 吗?"):
             # Remove API from config
-            self.api_configs = [config for config in self.api_configs if config["api_name"] != api_name]
-            self.save_api_configs()
+            self.store.delete(api_name)
             self.log(f"删除API配置: {api_name}")
             self.refresh_api_list()
     
@@ -507,11 +440,7 @@ class UniversalMCPGUI:
         api_name = self.api_tree.item(selected[0])["values"][0]
         
         # Find API config
-        api_config = None
-        for config in self.api_configs:
-            if config["api_name"] == api_name:
-                api_config = config
-                break
+        api_config = self.store.get(api_name)
         
         if not api_config:
             messagebox.showerror("错误", f"找不到API '{api_name}' 的配置")
@@ -598,6 +527,10 @@ class UniversalMCPGUI:
     
     def on_close(self):
         """Handle window close"""
+        try:
+            self.store.compact()
+        except OSError:
+            pass
         self.root.destroy()
     
     def run(self):
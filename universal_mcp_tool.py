@@ -4,27 +4,78 @@ import json
 import logging
 import sys
 import os
-from typing import Dict, Any
+import time
+import asyncio
+import threading
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
 from config_manager import load_config
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("universal_mcp.log", encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+from http_pool import SessionPool, AsyncClientPool, InflightLimiter
+from response_cache import ResponseCache, normalize_params, NOT_MODIFIED, response_validators, conditional_headers
+from disk_cache import DEFAULT_DB_PATH, DEFAULT_COMPACT_INTERVAL
+from singleflight import SingleFlight, AsyncSingleFlight
+from config_watcher import ConfigWatcher
+from api_store import APIConfigStore
+from request_plan import compile_plan
+from response_schema import ResponseProjector, ResponseValidator, describe_issue
+from response_reader import read_json, aread_json, DEFAULT_MAX_RESPONSE_BYTES
+from log_utils import setup_logging, add_secret, brief, DEFAULT_MAX_CHARS
+from resilience import APIGuard, CircuitOpenError, RateLimitExceeded
+from tail_latency import (TimeoutPolicy, DeadlineExceeded, deadline_scope, deadline_passed,
+                          time_left, without_deadline, within_deadline)
+from bulkhead import Bulkhead, BulkheadFull, DEFAULT_WORKERS
+
+# Setup logging (queue-based, secrets redacted, large messages truncated)
+setup_logging("universal_mcp.log",
+              max_chars=int(load_config().get("LOG_MAX_CHARS", DEFAULT_MAX_CHARS)))
 logger = logging.getLogger('universal_mcp')
 
 
 class UniversalMCPTool:
     def __init__(self):
         self.mcp = FastMCP("universal_mcps")
-        self.api_configs = []
+        self.store = APIConfigStore('api_configs.json')
+        self.http_pool = SessionPool()
+        self.singleflight = SingleFlight()
+        self.async_singleflight = AsyncSingleFlight()
+        self.guards = {}
+        self.projectors = {}
+        self.validators = {}
+        self.timeouts = {}
+        self.bulkheads = {}
+        self.callers = {}  # api_name -> 已注册工具的调用函数，供 call_many 使用
+        self._registered = {}  # api_name -> 当前已注册工具对应的配置
+        self._reload_lock = threading.RLock()
+        self._loop = None  # MCP 服务所在的事件循环，热加载在其中执行
+        self._session = None  # 当前客户端会话，用于发送工具列表变更通知
         self.config = load_config()
         logger.info(f"配置加载完成，MCP端点: {self.config.get('MCP_ENDPOINT', '未设置')}")
+        # 内存缓存；开启 cache_persist 的API另有磁盘缓存，子进程重启后仍可命中
+        self.response_cache = ResponseCache(
+            disk_path=self.config.get("CACHE_DB", DEFAULT_DB_PATH),
+            persist=bool(self.config.get("CACHE_PERSIST", False)),
+            compact_interval=float(self.config.get("CACHE_DB_COMPACT_INTERVAL", DEFAULT_COMPACT_INTERVAL)),
+        )
+        # 单次工具调用的总时限（秒），0 表示不限制；上游请求超时不会超过剩余时间
+        self.call_timeout = float(self.config.get("TOOL_CALL_TIMEOUT", 0))
+        # 同步模式下工具调用在独立的工作线程池中执行，不阻塞事件循环（线程按需创建）
+        self.worker_threads = int(self.config.get("WORKER_THREADS", DEFAULT_WORKERS))
+        self.worker_pool = ThreadPoolExecutor(max_workers=self.worker_threads, thread_name_prefix="tool")
+        # 同步模式下对冲请求使用的线程池（线程按需创建）
+        self.hedge_pool = ThreadPoolExecutor(max_workers=int(self.config.get("HEDGE_WORKERS", 16)),
+                                             thread_name_prefix="hedge")
+
+        # 异步执行模式：工具注册为协程，使用异步HTTP客户端并限制并发
+        self.async_mode = self.config.get("EXECUTION_MODE", "sync") == "async"
+        self.async_pool = AsyncClientPool()
+        self.inflight = InflightLimiter(
+            max_inflight=int(self.config.get("MAX_INFLIGHT", 64)),
+            max_per_host=int(self.config.get("MAX_INFLIGHT_PER_HOST", 8)),
+        )
+        if self.async_mode:
+            logger.info(f"已启用异步执行模式 (全局并发上限 {self.inflight.max_inflight}, "
+                        f"单主机并发上限 {self.inflight.max_per_host})")
 
         self._setup_mcp_environment()
         self._load_api_configs()
@@ -39,19 +90,16 @@ class UniversalMCPTool:
             logger.error("未找到MCP_ENDPOINT配置，请先在GUI中配置")
             raise ValueError("MCP_ENDPOINT未配置")
 
+    @property
+    def api_configs(self):
+        return self.store.all()
+
     def _load_api_configs(self):
         try:
-            with open('api_configs.json', 'r', encoding='utf-8') as f:
-                self.api_configs = json.load(f)
-                logger.info(f"加载 {len(self.api_configs)} 个 API 配置")
-        except (FileNotFoundError, json.JSONDecodeError):
-            logger.warning("未找到有效的 api_configs.json 文件")
-            self.api_configs = []
-
-    def _save_api_configs(self):
-        with open('api_configs.json', 'w', encoding='utf-8') as f:
-            json.dump(self.api_configs, f, indent=2, ensure_ascii=False)
-        logger.info(f"已保存 {len(self.api_configs)} 个 API 配置")
+            self.store.refresh()
+            logger.info(f"加载 {len(self.store)} 个 API 配置")
+        except OSError as e:
+            logger.warning(f"读取 api_configs.json 失败: {e}")
 
     def add_api(self, api_name: str, api_url: str, method: str,
                 request_format: Dict[str, Any], response_format: Dict[str, Any],
@@ -65,24 +113,14 @@ class UniversalMCPTool:
             "description": description
         }
 
-        for i, config in enumerate(self.api_configs):
-            if config["api_name"] == api_name:
-                self.api_configs[i] = api_config
-                logger.info(f"更新 API 配置: {api_name}")
-                self._save_api_configs()
-                return True
-
-        self.api_configs.append(api_config)
-        logger.info(f"新增 API 配置: {api_name}")
-        self._save_api_configs()
+        existed = api_name in self.store
+        self.store.put(api_config)
+        logger.info(f"{'更新' if existed else '新增'} API 配置: {api_name}")
         return True
 
     def remove_api(self, api_name: str):
-        initial_length = len(self.api_configs)
-        self.api_configs = [cfg for cfg in self.api_configs if cfg["api_name"] != api_name]
-        if len(self.api_configs) < initial_length:
+        if self.store.delete(api_name):
             logger.info(f"已删除 API 配置: {api_name}")
-            self._save_api_configs()
             return True
         logger.warning(f"未找到 API: {api_name}")
         return False
@@ -91,102 +129,484 @@ class UniversalMCPTool:
         return self.api_configs
 
     def _register_apis_as_tools(self):
+        self.store.take_changes()
         for cfg in self.api_configs:
-            self._register_single_api(cfg)
+            try:
+                self._register_single_api(cfg)
+                self._registered[cfg["api_name"]] = cfg
+            except Exception as e:
+                logger.error(f"注册 API 工具失败: {cfg.get('api_name')} - {e}", exc_info=True)
+
+    def _unregister_single_api(self, api_name):
+        manager = self.mcp._tool_manager
+        if hasattr(manager, "remove_tool"):
+            try:
+                manager.remove_tool(api_name)
+            except Exception:
+                pass
+        else:
+            manager._tools.pop(api_name, None)
+        self.response_cache.drop(api_name)
+        self.guards.pop(api_name, None)
+        self.projectors.pop(api_name, None)
+        self.validators.pop(api_name, None)
+        self.timeouts.pop(api_name, None)
+        self.bulkheads.pop(api_name, None)
+        self.callers.pop(api_name, None)
+        logger.info(f"🗑️ 已注销 API 工具: {api_name}")
 
     def _register_single_api(self, api_config):
         api_name = api_config["api_name"]
         api_url = api_config["api_url"]
-        method = api_config["method"].upper()
-        request_format = api_config.get("request_format", {})
         description = api_config.get("description", "")
 
-        api_key = api_config.get("api_key", "")
-        key_location = api_config.get("key_location", "header")
-        key_name = api_config.get("key_name", "Authorization")
-
-        def api_caller(**kwargs):
-            logger.info(f"调用 API: {api_name}")
-            try:
-                fields = list(request_format.keys())
-                params = {}
-                extra = []
-
-                if "kwargs" in kwargs:
-                    value = kwargs["kwargs"]
-                    if isinstance(value, str):
-                        # 支持空格或逗号分隔
-                        parts = [p.strip() for p in value.replace(",", " ").split()]
-                        for i, field in enumerate(fields):
-                            if i < len(parts):
-                                params[field] = parts[i]
+        # 注册时预编译请求计划，调用时只需绑定参数并发送
+        plan = compile_plan(api_config)
+        method = plan.method
+        cache = self.response_cache.partition(api_config)
+        # 默认只合并幂等的 GET 请求，POST 需显式开启 coalesce
+        coalesce = bool(api_config.get("coalesce", method == "GET"))
+        guard = APIGuard.from_config(api_config)
+        if guard is not None:
+            self.guards[api_name] = guard
+        else:
+            self.guards.pop(api_name, None)
+        # 按 response_format 裁剪返回内容（可选）
+        project = ResponseProjector.from_config(api_config)
+        if project is not None:
+            self.projectors[api_name] = project
+        else:
+            self.projectors.pop(api_name, None)
+        # 抽样校验响应是否符合 response_format，统计上游格式漂移
+        validate = ResponseValidator.from_config(
+            api_config, float(self.config.get("VALIDATE_SAMPLE_RATE", 0)))
+        if validate is not None:
+            self.validators[api_name] = validate
+        else:
+            self.validators.pop(api_name, None)
+
+        # 请求超时（可按近期 p95 自适应）与慢请求对冲
+        policy = TimeoutPolicy.from_config(api_config, self.config)
+        if policy.hedge and method != "GET":
+            logger.warning("对冲请求仅适用于幂等的 GET 请求，已忽略 hedge: %s", api_name)
+            policy.hedge = False
+        self.timeouts[api_name] = policy
+
+        def check_schema(result):
+            issues = validate(result)
+            if issues:
+                logger.warning("API 响应与 response_format 不一致: %s - %s",
+                               api_name, "; ".join(describe_issue(issue) for issue in issues[:5]))
+        # 单次响应读取上限，防止异常上游占满内存
+        max_response_bytes = int(api_config.get(
+            "max_response_bytes", self.config.get("MAX_RESPONSE_BYTES", DEFAULT_MAX_RESPONSE_BYTES)))
+        # 按比例采样记录请求/响应详情，错误日志始终记录
+        log_sample_rate = float(api_config.get("log_sample_rate", self.config.get("LOG_SAMPLE_RATE", 1.0)))
+        add_secret(api_config.get("api_key", ""))
+
+        def should_log():
+            if not logger.isEnabledFor(logging.INFO):
+                return False
+            return log_sample_rate >= 1 or random.random() < log_sample_rate
+
+        def prepare_request(kwargs, verbose):
+            params, extra = plan.bind(kwargs)
+            if verbose:
+                if extra:
+                    logger.info("额外参数被忽略: %s", extra)
+                logger.info("请求 URL: %s", plan.url)
+                logger.info("请求参数: %s", brief(params))
+                logger.info("请求头: %s", list(plan.headers))
+            return params
+
+        if self.async_mode:
+            async def request(params, headers):
+                # 配置重载后不再使用的连接池会在请求结束后关闭
+                async with self.async_pool.use(api_config) as client, \
+                        client.stream(method, plan.url, headers=headers, **{plan.payload_arg: params}) as response:
+                    if response.status_code == 304:
+                        return NOT_MODIFIED, False, response_validators(response.headers)
+                    response.raise_for_status()
+                    # 流式读取，超过上限即中止并返回截断结果
+                    result, truncated = await aread_json(response, max_response_bytes)
+                    return result, truncated, response_validators(response.headers)
+
+            async def send_once(params, validators):
+                headers = plan.headers if not validators else {**plan.headers, **conditional_headers(validators)}
+                # 等待全局及单主机并发名额只受调用总时限约束，不占用请求超时、不计入延迟统计，
+                # 等不到名额属于本地资源不足，不计为上游故障
+                acquired = False
+                try:
+                    async with self.inflight.limit(api_url, time_left()):
+                        acquired = True
+                        # 拿到名额后才开始计时，连接与读取整体受超时约束
+                        timeout = policy.budget()
+                        start = time.monotonic()
+                        try:
+                            result = await asyncio.wait_for(request(params, headers), timeout)
+                        except asyncio.TimeoutError:
+                            raise TimeoutError(f"request timed out after {timeout:.1f}s") from None
+                        policy.record(time.monotonic() - start)
+                        return result
+                except TimeoutError:
+                    if not acquired:
+                        raise policy.exceeded("deadline exceeded while waiting for an in-flight slot") from None
+                    raise
+
+            async def send(params, validators):
+                delay = policy.hedge_delay(policy.budget())
+                try:
+                    if delay is None:
+                        return await send_once(params, validators)
+                    # 超过对冲延迟仍未返回时再发一份，取先返回的结果
+                    return await policy.arun_hedged(lambda: send_once(params, validators), delay)
+                except TimeoutError as e:
+                    # 请求超时被调用总时限截短时，属于本次调用时间用尽，不计为上游故障
+                    if deadline_passed():
+                        raise policy.exceeded(f"call deadline exceeded: {e}") from e
+                    raise
+
+            async def fetch(params, stale=None):
+                result, truncated, validators = await guarded_send(params, stale and stale[1])
+                if result is NOT_MODIFIED:
+                    # 上游确认未变化，直接复用缓存中已解析的结果
+                    return stale[0], False, validators or stale[1], True
+                if validate is not None and not truncated:
+                    check_schema(result)
+                if project is not None and result is not None:
+                    result = project(result)
+                return result, truncated, validators, False
+
+            async def guarded_send(params, validators):
+                if guard is None:
+                    return await send(params, validators)
+                # 熔断检查与限流令牌，熔断打开或超出限流时立即失败；调用被取消时归还半开探测名额
+                return await guard.acall(lambda: send(params, validators))
+
+            async def api_caller(**kwargs):
+                verbose = should_log()
+                if verbose:
+                    logger.info("调用 API: %s", api_name)
+                # 整个调用受总时限约束，上游请求超时不超过剩余时间
+                with deadline_scope(self.call_timeout):
+                    try:
+                        params = prepare_request(kwargs, verbose)
+                        stale = None
+                        if cache is not None:
+                            hit, cached = await cache.aget(params)
+                            if hit:
+                                if verbose:
+                                    logger.info("缓存命中: %s", api_name)
+                                return {"success": True, "result": cached}
+                            # 已过期但带 ETag/Last-Modified 的缓存，用条件请求向上游确认是否变化
+                            stale = cache.stale(params)
+
+                        if coalesce:
+                            # 相同参数的并发调用共享同一个上游请求；共享请求不受某一调用方截止时间的约束，
+                            # 各调用方按自己的剩余时间等待，某一方超时或被取消不影响其他调用方
+                            key = (api_name, normalize_params(params))
+                            result, truncated, validators, not_modified = await within_deadline(
+                                self.async_singleflight.do(key, lambda: fetch(params, stale),
+                                                           context=without_deadline()))
+                        else:
+                            result, truncated, validators, not_modified = await fetch(params, stale)
+
+                        if verbose:
+                            logger.info("响应结果: %s", brief(result))
+                        if truncated:
+                            logger.warning("API 响应超过 %d 字节，已截断: %s", max_response_bytes, api_name)
+                            return {"success": True, "result": result, "truncated": True}
+                        if cache is not None:
+                            # 内存缓存立即更新，磁盘缓存交给后台写线程，不阻塞事件循环
+                            if not_modified:
+                                cache.refresh(params, result, validators, background=True)
                             else:
-                                params[field] = request_format.get(field, "")
-                        if len(parts) > len(fields):
-                            extra = parts[len(fields):]
-                    elif isinstance(value, dict):
-                        params.update(value)
+                                cache.put(params, result, validators, background=True)
+                        return {"success": True, "result": result}
+
+                    except (CircuitOpenError, RateLimitExceeded, DeadlineExceeded) as e:
+                        logger.warning("API 调用被拒绝: %s", e)
+                        return {"success": False, "error": str(e)}
+                    except Exception as e:
+                        logger.error("API 调用错误: %s - %s", api_name, e, exc_info=True)
+                        return {"success": False, "error": str(e)}
+        else:
+            def send_once(params, deadline, validators):
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    raise policy.exceeded("deadline exceeded before the request was sent")
+                headers = plan.headers if not validators else {**plan.headers, **conditional_headers(validators)}
+                start = time.monotonic()
+                # 执行请求（复用按主机共享的长连接会话，请求进行中的会话不会被回收）
+                with self.http_pool.use(api_url, api_config) as session, \
+                        session.request(method, plan.url, headers=headers, stream=True,
+                                        timeout=timeout, **{plan.payload_arg: params}) as response:
+                    if response.status_code == 304:
+                        result = NOT_MODIFIED, False, response_validators(response.headers)
                     else:
-                        return {"success": False, "error": f"Unsupported kwargs type: {type(value).__name__}"}
-
-                # 补全剩余字段
-                for field in fields:
-                    if field not in params:
-                        params[field] = request_format.get(field, "")
-
-                if extra:
-                    logger.info(f"额外参数被忽略: {extra}")
-
-                headers = {}
-                url = api_url
-
-                # 处理 API Key
-                if api_key:
-                    if key_location == "header":
-                        headers[key_name] = f"Bearer {api_key}" if key_name.lower() == "authorization" else api_key
-                    elif key_location == "query":
-                        url += f"?{key_name}={api_key}" if "?" not in url else f"&{key_name}={api_key}"
-                    elif key_location == "body":
-                        params[key_name] = api_key
-
-                logger.info(f"请求 URL: {url}")
-                logger.info(f"请求参数: {params}")
-                logger.info(f"请求头: {headers}")
-
-                # 执行请求
-                if method == "GET":
-                    response = requests.get(url, params=params, headers=headers)
-                elif method == "POST":
-                    response = requests.post(url, json=params, headers=headers)
-                else:
-                    return {"success": False, "error": f"Unsupported method: {method}"}
-
-                response.raise_for_status()
-                result = response.json()
-                logger.info(f"响应结果: {result}")
-                return {"success": True, "result": result}
-
-            except Exception as e:
-                logger.error(f"API 调用错误: {e}", exc_info=True)
-                return {"success": False, "error": str(e)}
+                        response.raise_for_status()
+                        # 流式读取，超过上限即中止并返回截断结果
+                        value, truncated = read_json(response, max_response_bytes, deadline=deadline)
+                        result = value, truncated, response_validators(response.headers)
+                policy.record(time.monotonic() - start)
+                return result
+
+            def send(params, deadline, validators):
+                delay = policy.hedge_delay(deadline - time.monotonic())
+                try:
+                    if delay is None:
+                        return send_once(params, deadline, validators)
+                    # 超过对冲延迟仍未返回时再发一份，取先返回的结果
+                    return policy.run_hedged(lambda: send_once(params, deadline, validators), delay, self.hedge_pool)
+                except (TimeoutError, requests.Timeout, requests.ConnectionError) as e:
+                    # 请求超时被调用总时限截短时，属于本次调用时间用尽，不计为上游故障
+                    # （流式读取中的读超时由 requests 包装为 ConnectionError）
+                    if deadline_passed():
+                        raise policy.exceeded(f"call deadline exceeded: {e}") from e
+                    raise
+
+            def fetch(params, stale=None):
+                deadline = time.monotonic() + policy.budget()
+                result, truncated, validators = guarded_send(params, deadline, stale and stale[1])
+                if result is NOT_MODIFIED:
+                    # 上游确认未变化，直接复用缓存中已解析的结果
+                    return stale[0], False, validators or stale[1], True
+                if validate is not None and not truncated:
+                    check_schema(result)
+                if project is not None and result is not None:
+                    result = project(result)
+                return result, truncated, validators, False
+
+            def guarded_send(params, deadline, validators):
+                if guard is None:
+                    return send(params, deadline, validators)
+                # 熔断检查与限流令牌，熔断打开或超出限流时立即失败
+                return guard.call(lambda: send(params, deadline, validators))
+
+            def api_caller(**kwargs):
+                verbose = should_log()
+                if verbose:
+                    logger.info("调用 API: %s", api_name)
+                # 整个调用受总时限约束，上游请求超时不超过剩余时间
+                with deadline_scope(self.call_timeout):
+                    try:
+                        params = prepare_request(kwargs, verbose)
+                        stale = None
+                        if cache is not None:
+                            hit, cached = cache.get(params)
+                            if hit:
+                                if verbose:
+                                    logger.info("缓存命中: %s", api_name)
+                                return {"success": True, "result": cached}
+                            # 已过期但带 ETag/Last-Modified 的缓存，用条件请求向上游确认是否变化
+                            stale = cache.stale(params)
+
+                        if coalesce:
+                            # 相同参数的并发调用共享同一个上游请求
+                            key = (api_name, normalize_params(params))
+                            try:
+                                result, truncated, validators, not_modified = self.singleflight.do(
+                                    key, lambda: fetch(params, stale))
+                            except DeadlineExceeded:
+                                if deadline_passed():
+                                    raise
+                                # 共享请求因发起方的时限用尽而失败，本调用仍有剩余时间，自行重新请求
+                                result, truncated, validators, not_modified = fetch(params, stale)
+                        else:
+                            result, truncated, validators, not_modified = fetch(params, stale)
+
+                        if verbose:
+                            logger.info("响应结果: %s", brief(result))
+                        if truncated:
+                            logger.warning("API 响应超过 %d 字节，已截断: %s", max_response_bytes, api_name)
+                            return {"success": True, "result": result, "truncated": True}
+                        if cache is not None:
+                            if not_modified:
+                                cache.refresh(params, result, validators)
+                            else:
+                                cache.put(params, result, validators)
+                        return {"success": True, "result": result}
+
+                    except (CircuitOpenError, RateLimitExceeded, DeadlineExceeded) as e:
+                        logger.warning("API 调用被拒绝: %s", e)
+                        return {"success": False, "error": str(e)}
+                    except Exception as e:
+                        logger.error("API 调用错误: %s - %s", api_name, e, exc_info=True)
+                        return {"success": False, "error": str(e)}
+
+            # 每个API独立的隔离舱：限制并发与排队数，满时立即拒绝，慢上游不会拖垮其他工具
+            blocking_caller = api_caller
+            bulkhead = Bulkhead.from_config(api_config, self.config, self.worker_threads)
+            self.bulkheads[api_name] = bulkhead
+
+            async def api_caller(**kwargs):
+                # 排队时间同样计入调用总时限
+                with deadline_scope(self.call_timeout):
+                    try:
+                        return await bulkhead.run(self.worker_pool, blocking_caller, **kwargs)
+                    except BulkheadFull as e:
+                        logger.warning("API 调用被拒绝: %s", e)
+                        return {"success": False, "error": str(e)}
 
         api_caller.__name__ = api_name
         api_caller.__doc__ = description
+        # 按 request_format 发布带类型的参数，FastMCP 据此生成输入 schema
+        if api_config.get("typed_signature", self.config.get("TYPED_SIGNATURES", True)):
+            if plan.signature is not None:
+                api_caller.__signature__ = plan.signature
+            else:
+                logger.warning("字段名不能作为参数名，%s 仍使用 kwargs 传参", api_name)
         self.mcp.tool()(api_caller)
+        self.callers[api_name] = api_caller
         logger.info(f"✅ 已注册 API 工具: {api_name}")
 
+    def _tool_stats(self):
+        stats = {}
+        for counters in (self.singleflight.coalesced, self.async_singleflight.coalesced):
+            for api_name, count in counters.items():
+                stats.setdefault(api_name, {}).setdefault("coalesced", 0)
+                stats[api_name]["coalesced"] += count
+        for api_name, guard in self.guards.items():
+            stats.setdefault(api_name, {}).update(guard.stats())
+        for api_name, projector in self.projectors.items():
+            stats.setdefault(api_name, {}).update(projector.stats())
+        for api_name, validator in self.validators.items():
+            stats.setdefault(api_name, {}).update(validator.stats())
+        for api_name, policy in self.timeouts.items():
+            stats.setdefault(api_name, {}).update(policy.stats())
+        for api_name, bulkhead in self.bulkheads.items():
+            stats.setdefault(api_name, {}).update(bulkhead.stats())
+        return stats
+
+    async def call_many(self, calls, max_concurrency=8, timeout=30.0):
+        """Run several registered API tools concurrently and return their results in input order"""
+        max_calls = int(self.config.get("CALL_MANY_MAX_CALLS", 50))
+        if len(calls) > max_calls:
+            raise ValueError(f"单次最多 {max_calls} 个调用，实际 {len(calls)} 个")
+        limit = max(1, min(int(max_concurrency), int(self.config.get("CALL_MANY_MAX_CONCURRENCY", 16))))
+        semaphore = asyncio.Semaphore(limit)
+
+        async def call_one(item):
+            if not isinstance(item, dict) or "api_name" not in item:
+                return {"success": False, "error": "每项需为包含 api_name 的对象"}
+            api_name = item["api_name"]
+            caller = self.callers.get(api_name)
+            if caller is None:
+                return {"api_name": api_name, "success": False, "error": f"未找到 API: {api_name}"}
+            args = item.get("args")
+            kwargs = {} if args is None else {"kwargs": args}
+            try:
+                item_timeout = float(item.get("timeout", timeout))
+                if not item_timeout > 0:
+                    raise ValueError
+            except (TypeError, ValueError):
+                return {"api_name": api_name, "success": False, "error": f"无效的 timeout: {item.get('timeout')!r}"}
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    # 每项的超时作为截止时间传给上游请求（同步模式下随上下文带入工作线程）
+                    with deadline_scope(item_timeout):
+                        result = await asyncio.wait_for(caller(**kwargs), item_timeout)
+                except asyncio.TimeoutError:
+                    logger.warning("call_many 子调用超时: %s (%.1f秒)", api_name, item_timeout)
+                    result = {"success": False, "error": f"调用超时（{item_timeout:g}秒）"}
+                except asyncio.CancelledError:
+                    if asyncio.current_task().cancelling():
+                        raise  # 整个批量调用被取消
+                    # 只有该子调用被取消时，不影响同批次的其他调用
+                    logger.warning("call_many 子调用被取消: %s", api_name)
+                    result = {"success": False, "error": "调用被取消"}
+                elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+            return {"api_name": api_name, "elapsed_ms": elapsed_ms, **result}
+
+        return await asyncio.gather(*(call_one(item) for item in calls))
+
     def reload_apis(self):
-        self._load_api_configs()
-        self._register_apis_as_tools()
-        return True
+        """Re-read api_configs.json and apply only the differences to the registered tools"""
+        with self._reload_lock:
+            self._load_api_configs()
+            changes = self.store.take_changes()
+            configs = self.store.as_dict()
+            # 只比较日志中出现过的 API；快照被整体替换时才全量比较
+            candidates = set(configs) | set(self._registered) if changes is None else changes
+            added = [name for name in candidates if name in configs and name not in self._registered]
+            removed = [name for name in candidates if name in self._registered and name not in configs]
+            updated = [name for name in candidates
+                       if name in configs and name in self._registered and configs[name] != self._registered[name]]
+
+            for name in removed + updated:
+                self._unregister_single_api(name)
+                self._registered.pop(name, None)
+            for name in updated + added:
+                try:
+                    self._register_single_api(configs[name])
+                    self._registered[name] = configs[name]
+                except Exception as e:
+                    logger.error(f"注册 API 工具失败: {name} - {e}", exc_info=True)
+
+            if added or updated or removed:
+                logger.info(f"API 配置已重新加载: 新增 {len(added)}，更新 {len(updated)}，删除 {len(removed)}")
+            return {"added": added, "updated": updated, "removed": removed}
+
+    async def _reload_and_notify(self):
+        changes = self.reload_apis()
+        if any(changes.values()):
+            await self.async_pool.retain(self.store.all())
+            await self._notify_tools_changed()
+        return changes
+
+    async def _notify_tools_changed(self):
+        """Send notifications/tools/list_changed to the connected client"""
+        if self._session is None:
+            return
+        try:
+            await self._session.send_tool_list_changed()
+        except Exception as e:
+            logger.warning(f"发送工具列表变更通知失败: {e}")
+
+    def _reload_from_watcher(self):
+        # 工具注册表及各统计字典只在事件循环线程中修改，避免与正在执行的工具并发读写
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return self.reload_apis()
+        return asyncio.run_coroutine_threadsafe(self._reload_and_notify(), loop).result()
+
+    async def _serve_stdio(self):
+        """Run the MCP server over stdio, announcing tool list changes to the client"""
+        from mcp.server.lowlevel import NotificationOptions
+        from mcp.server.stdio import stdio_server
+
+        self._loop = asyncio.get_running_loop()
+        server = self.mcp._mcp_server
+
+        @server.list_tools()
+        async def list_tools():
+            # 客户端连接后总会先列出工具，借此记下会话以便之后推送变更通知
+            self._session = server.request_context.session
+            return await self.mcp.list_tools()
+
+        try:
+            async with stdio_server() as (read_stream, write_stream):
+                await server.run(read_stream, write_stream,
+                                 server.create_initialization_options(NotificationOptions(tools_changed=True)))
+        finally:
+            self._loop = None
+            self._session = None
+
+    async def _serve(self):
+        try:
+            await self._serve_stdio()
+        finally:
+            # 异步客户端须在事件循环结束前关闭
+            await self.async_pool.aclose()
 
     def run(self):
         @self.mcp.tool()
-        def register_api(api_name: str, api_url: str, method: str,
-                         request_format: str, response_format: str,
-                         description: str, api_key: str = "",
-                         key_location: str = "header",
-                         key_name: str = "Authorization") -> Dict[str, Any]:
+        async def register_api(api_name: str, api_url: str, method: str,
+                               request_format: str, response_format: str,
+                               description: str, api_key: str = "",
+                               key_location: str = "header",
+                               key_name: str = "Authorization") -> Dict[str, Any]:
             try:
                 req_fmt = json.loads(request_format)
                 resp_fmt = json.loads(response_format)
@@ -204,14 +624,8 @@ class UniversalMCPTool:
                         "key_location": key_location,
                         "key_name": key_name
                     })
-                for i, cfg in enumerate(self.api_configs):
-                    if cfg["api_name"] == api_name:
-                        self.api_configs[i] = api_cfg
-                        break
-                else:
-                    self.api_configs.append(api_cfg)
-                self._save_api_configs()
-                self.reload_apis()
+                self.store.put(api_cfg)
+                await self._reload_and_notify()
                 return {"success": True, "message": f"API {api_name} 注册成功"}
             except Exception as e:
                 logger.error(f"注册 API 失败: {e}")
@@ -222,17 +636,67 @@ class UniversalMCPTool:
             return {"success": True, "apis": self.list_apis()}
 
         @self.mcp.tool()
-        def remove_registered_api(api_name: str) -> Dict[str, Any]:
+        async def remove_registered_api(api_name: str) -> Dict[str, Any]:
             result = self.remove_api(api_name)
-            self.reload_apis()
+            await self._reload_and_notify()
             return {"success": result, "message": f"API {api_name} 已移除" if result else "未找到该 API"}
 
+        @self.mcp.tool()
+        async def call_many(calls: List[Dict[str, Any]], max_concurrency: int = 8,
+                            timeout: float = 30.0) -> Dict[str, Any]:
+            """一次并发调用多个已注册的API，结果按输入顺序返回。
+            calls 为数组，每项形如 {"api_name": "weather", "args": "北京"}，
+            args 也可以是对象，可选 timeout 覆盖该项的超时秒数"""
+            try:
+                results = await self.call_many(calls, max_concurrency, timeout)
+                return {"success": True, "results": results}
+            except Exception as e:
+                logger.error(f"批量调用失败: {e}")
+                return {"success": False, "error": str(e)}
+
+        @self.mcp.tool()
+        async def get_cache_stats() -> Dict[str, Any]:
+            """查看各API响应缓存的命中/未命中次数及占用情况"""
+            # 统计磁盘缓存需要查询 SQLite，放到工作线程执行
+            result = {"success": True, "cache": await asyncio.to_thread(self.response_cache.stats)}
+            disk = self.response_cache.disk_stats()
+            if disk is not None:
+                result["disk"] = disk
+            return result
+
+        @self.mcp.tool()
+        def get_tool_stats() -> Dict[str, Any]:
+            """查看各API工具的运行统计（请求合并次数、限流与熔断状态、裁剪节省字节数等）"""
+            result = {"success": True, "stats": self._tool_stats()}
+            if not self.async_mode:
+                # 同步模式下各主机共享的长连接会话
+                result["sessions"] = self.http_pool.stats()
+            else:
+                # 异步模式下各主机进行中的上游请求数及连接池数量
+                result["inflight"] = self.inflight.stats()
+                result["async_clients"] = self.async_pool.stats()
+            return result
+
         logger.info("🚀 启动 Universal MCP Tool 服务中...")
+        self.http_pool.start_reaper()
+        watcher = None
+        if self.config.get("CONFIG_WATCH", True):
+            # GUI 修改 api_configs.json 后自动增量生效
+            watcher = ConfigWatcher(
+                [self.store.path, self.store.journal_path], self._reload_from_watcher,
+                interval=float(self.config.get("CONFIG_WATCH_INTERVAL", 1.0)),
+                debounce=float(self.config.get("CONFIG_WATCH_DEBOUNCE", 0.5)),
+            )
+            watcher.start()
         try:
-            self.mcp.run(transport="stdio")
+            asyncio.run(self._serve())
         except Exception as e:
             logger.error(f"MCP 启动失败: {e}", exc_info=True)
             raise
+        finally:
+            if watcher is not None:
+                watcher.stop()
+            self.http_pool.close()
 
     def test_api(self, api_name, api_url, method, params):
         try: